@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC file format support.
+
+Compact binary form of RSRC file content.
+
+Stores blocks and their sections as a length-prefixed record stream, which
+is much faster to write and load than XML export. Objects which XML export
+stores as separate elements - Type Descriptors, Default Fills and heap
+nodes - get a record each. Every such record contains the object in the
+binary form it has within RSRC file, so it is prepared and loaded by the
+same code which handles RSRC files. Other sections are stored as decoded
+raw data.
+
+Stream layout:
+- magic b'LVBX' and format version byte,
+- records, each is record type byte, varint length of body, and the body;
+  the stream ends with RECORD_TYPE.End record.
+
+Integers are unsigned LEB128 varints, unless stated otherwise. Records:
+- Head - RSRC type (4 bytes), dataset Int1 and Int2 (u32 BE each) and text
+  encoding name; it is the first record,
+- Block - block ident (4 bytes); followed by Section records of the block,
+- Section - section index (s32 BE), Int5 (u32 BE), name flag byte and name
+  text; followed by records with content of the section, which are either
+  SectionData with the decoded raw data, or object records:
+- TypeDesc - one Type Descriptor of VCTP, with its header,
+- TopLevel - VCTP list of top level types, as u16 BE count and values,
+- DataFill - one Default Fill of DFDS,
+- HeapNode - one entry of FPHb/BDHb heap.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import enum
+
+
+BINMODEL_MAGIC = b'LVBX'
+BINMODEL_VERSION = 2
+
+
+class RECORD_TYPE(enum.IntEnum):
+    End = 0
+    Head = 1		# Properties of the whole file
+    Block = 2		# Start of a block
+    Section = 3		# Start of a section within block
+    SectionData = 4	# Decoded raw data of a section
+    TypeDesc = 5	# Type Descriptor within VCTP section
+    TopLevel = 6	# List of top level types within VCTP section
+    DataFill = 7	# Default Fill within DFDS section
+    HeapNode = 8	# Heap entry within FPHb/BDHb section
+
+
+def prepareVarint(val):
+    data_buf = bytearray()
+    while val >= 0x80:
+        data_buf.append((val & 0x7f) | 0x80)
+        val >>= 7
+    data_buf.append(val)
+    return bytes(data_buf)
+
+
+class BinModelWriter(object):
+    def __init__(self, fh):
+        """ Creates writer of compact binary records into given file handle
+
+        Records are gathered in memory, and written by writeEnd().
+        """
+        self.fh = fh
+        self.buf = bytearray(BINMODEL_MAGIC + bytes([BINMODEL_VERSION]))
+
+    def writeRecord(self, rec_type, body):
+        buf = self.buf
+        buf.append(rec_type)
+        buf += prepareVarint(len(body))
+        buf += body
+
+    def writeHead(self, rsrc_type_id, dataset_int1, dataset_int2, text_encoding):
+        body = bytes(rsrc_type_id) + \
+          int(dataset_int1).to_bytes(4, byteorder='big') + \
+          int(dataset_int2).to_bytes(4, byteorder='big') + \
+          text_encoding.encode('ascii')
+        self.writeRecord(RECORD_TYPE.Head, body)
+
+    def writeBlock(self, ident):
+        self.writeRecord(RECORD_TYPE.Block, bytes(ident))
+
+    def writeSection(self, section_idx, int5, name_text):
+        body = int(section_idx).to_bytes(4, byteorder='big', signed=True) + \
+          int(int5).to_bytes(4, byteorder='big')
+        if name_text is None:
+            body += b'\0'
+        else:
+            body += b'\1' + name_text
+        self.writeRecord(RECORD_TYPE.Section, body)
+
+    def writeEnd(self):
+        self.writeRecord(RECORD_TYPE.End, b'')
+        self.fh.write(self.buf)
+        self.buf = bytearray()
+
+
+class BinModelReader(object):
+    def __init__(self, data_buf):
+        """ Creates reader of compact binary records from given bytes
+        """
+        if data_buf[:4] != BINMODEL_MAGIC:
+            raise AttributeError("Compact binary file has invalid magic")
+        if data_buf[4] != BINMODEL_VERSION:
+            raise NotImplementedError("Unsupported compact binary file version {:d}".format(data_buf[4]))
+        self.buf = memoryview(data_buf)
+        self.pos = 5
+
+    def readVarint(self):
+        buf = self.buf
+        pos = self.pos
+        val = buf[pos]
+        pos += 1
+        if val >= 0x80:
+            val &= 0x7f
+            shift = 7
+            while True:
+                b = buf[pos]
+                pos += 1
+                val |= (b & 0x7f) << shift
+                if b < 0x80: break
+                shift += 7
+        self.pos = pos
+        return val
+
+    def readRecord(self):
+        """ Reads one record; returns its type and body
+        """
+        rec_type = self.buf[self.pos]
+        self.pos += 1
+        rec_len = self.readVarint()
+        rec_end = self.pos + rec_len
+        if rec_end > len(self.buf):
+            raise EOFError("Compact binary record type {:d} exceeds file size".format(rec_type))
+        body = self.buf[self.pos:rec_end]
+        self.pos = rec_end
+        return rec_type, body
+
+    def readModel(self):
+        """ Reads all records, grouped by blocks and sections
+
+        Returns tuple of Head properties, and list of blocks; each block is
+        a tuple of ident and list of sections; each section is a tuple of
+        index, Int5, name text and list of content records.
+        """
+        rec_type, body = self.readRecord()
+        if rec_type != RECORD_TYPE.Head:
+            raise AttributeError("Compact binary file does not start with Head record")
+        head = (bytes(body[0:4]), int.from_bytes(body[4:8], byteorder='big', signed=False), \
+          int.from_bytes(body[8:12], byteorder='big', signed=False), bytes(body[12:]).decode('ascii'),)
+        blocks = []
+        records = None
+        while True:
+            rec_type, body = self.readRecord()
+            if rec_type == RECORD_TYPE.End:
+                break
+            elif rec_type == RECORD_TYPE.Block:
+                sections = []
+                blocks.append( (bytes(body), sections,) )
+                records = None
+            elif rec_type == RECORD_TYPE.Section:
+                if len(blocks) < 1:
+                    raise AttributeError("Compact binary file has Section record outside of block")
+                records = []
+                name_text = bytes(body[9:]) if body[8] != 0 else None
+                sections.append( (int.from_bytes(body[0:4], byteorder='big', signed=True), \
+                  int.from_bytes(body[4:8], byteorder='big', signed=False), name_text, records,) )
+            elif records is not None:
+                records.append( (rec_type, body,) )
+            else:
+                raise AttributeError("Compact binary file has record type {:d} outside of section".format(rec_type))
+        return head, blocks
+
+
+def readBinModel(fh):
+    """ Reads compact binary records from file handle
+
+    Returns Head properties and list of blocks, as BinModelReader.readModel().
+    """
+    reader = BinModelReader(fh.read())
+    return reader.readModel()
@@ -16,7 +16,6 @@ import re
 import io
 import os
 
-from PIL import Image
 from hashlib import md5
 from types import SimpleNamespace
 from zlib import compress, decompress
@@ -24,12 +23,16 @@ from ctypes import *
 
 from LVmisc import *
 import LVxml as ET
+import LVstore
+import LVbinmodel
 from LVdatatype import *
 from LVinstrument import *
-import LVclasses
-import LVdatafill
-import LVlinkinfo
-import LVheap
+LVclasses = lazyImport('LVclasses')
+LVdatafill = lazyImport('LVdatafill')
+LVlinkinfo = lazyImport('LVlinkinfo')
+LVheap = lazyImport('LVheap')
+LVheapquery = lazyImport('LVheapquery')
+LVdiff = lazyImport('LVdiff')
 import LVrsrcontainer
 
 class BLOCK_CODING(enum.Enum):
@@ -92,7 +95,11 @@ class BlockSectionData(RSRCStructure):
         return ret
 
 
-class Section(object):
+class Section(SlotsRecord):
+    # Blocks add their own properties to sections, these are kept in dict
+    __slots__ = ('vi', 'po', 'start', 'raw_data', 'raw_data_updated', 'parsed_data_updated', \
+      'block_pos', 'name_text', 'name_obj', '__dict__',)
+
     def __init__(self, vi, po):
         """ Creates new Section object, represention one of possible contents of a Block.
 
@@ -115,6 +122,37 @@ class Section(object):
         self.name_obj = None
 
 
+class SectionProperty(object):
+    """ Descriptor giving Block access to a property of its active section
+
+    Installed on Block classes for each property of a section created by
+    createSection(), so that accessing these is a plain attribute lookup.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, block, owner=None):
+        if block is None:
+            return self
+        section = block.sections.get(block.active_section_num)
+        if section is None:
+            # No active section - behave like a normal attribute
+            try:
+                return block.__dict__[self.name]
+            except KeyError:
+                raise AttributeError("Block {} has no active section with '{}'".format(type(block).__name__,self.name))
+        return getattr(section, self.name)
+
+    def __set__(self, block, value):
+        section = block.sections.get(block.active_section_num)
+        if section is None:
+            block.__dict__[self.name] = value
+            return
+        setattr(section, self.name, value)
+
+
 class Block(object):
     """ Generic block
     """
@@ -136,6 +174,25 @@ class Block(object):
         else:
             self.full_name = ""
 
+    def newSection(self):
+        """ Creates a new section using createSection(), without adding it to block
+
+        On first use within a class, also installs SectionProperty descriptors
+        for properties of the section, so that the block exposes them.
+        """
+        section = self.createSection()
+        cls = type(self)
+        if '_section_properties' not in cls.__dict__:
+            props = []
+            for name in section.fieldNames():
+                # Properties of the block itself, and names already in class, take precedence
+                if name in self.__dict__ or hasattr(cls, name):
+                    continue
+                setattr(cls, name, SectionProperty(name))
+                props.append(name)
+            cls._section_properties = tuple(props)
+        return section
+
     def createSection(self):
         """ Creates a new section, without adding it to block
 
@@ -168,7 +225,7 @@ class Block(object):
 
         self.sections = {}
         for i in range(header.count + 1):
-            section = self.createSection()
+            section = self.newSection()
             if fh.readinto(section.start) != sizeof(section.start):
                 raise EOFError("Could not read BlockSectionStart data")
             if self.po.file_map:
@@ -208,18 +265,22 @@ class Block(object):
                 raise IOError("Block {} section {:d} Name position exceeds RSRC Info size".format(self.ident,snum))
             fh.seek(names_start + section.start.name_offset)
             name_text_len = int.from_bytes(fh.read(1), byteorder='big', signed=False)
-            section.name_text = fh.read(name_text_len)
+            self.initSectionName(section, fh.read(name_text_len))
             if self.po.file_map:
                 self.vi.rsrc_map.append( (fh.tell(), 1+name_text_len, \
                   "{}[{},{}]".format("NameOfSection",pretty_ident,section.start.section_idx),) )
-            section.name_obj = None
-            if len(section.name_text) >= 12 and section.name_text[0:4] == b'PTH0':
-                totlen = int.from_bytes(section.name_text[4:8], byteorder='big', signed=False)
-                if len(section.name_text) >= totlen + 4 + 4:
-                    section.name_obj = LVclasses.LVPath0(self.vi, self.po)
-                    bldata = io.BytesIO(section.name_text)
-                    section.name_obj.parseRSRCData(bldata)
 
+    def initSectionName(self, section, name_text):
+        """ Sets name of the section, and its path object if the name is a path
+        """
+        section.name_text = name_text
+        section.name_obj = None
+        if len(section.name_text) >= 12 and section.name_text[0:4] == b'PTH0':
+            totlen = int.from_bytes(section.name_text[4:8], byteorder='big', signed=False)
+            if len(section.name_text) >= totlen + 4 + 4:
+                section.name_obj = LVclasses.LVPath0(self.vi, self.po)
+                bldata = io.BytesIO(section.name_text)
+                section.name_obj.parseRSRCData(bldata)
 
     def initWithXMLSection(self, section, section_elem):
         """ Imports section data from XML
@@ -237,13 +298,7 @@ class Block(object):
             if (self.po.verbose > 2):
                 print("{:s}: For Block {} section {:d}, reading BIN file '{}'"\
                   .format(self.vi.src_fname,self.ident,snum,section_elem.get("File")))
-            bin_path = os.path.dirname(self.vi.src_fname)
-            if len(bin_path) > 0:
-                bin_fname = bin_path + '/' + section_elem.get("File")
-            else:
-                bin_fname = section_elem.get("File")
-            with open(bin_fname, "rb") as bin_fh:
-                data_buf = bin_fh.read()
+            data_buf = LVstore.readImportFile(self.vi, self.po, section_elem.get("File"))
             self.setData(data_buf, section_num=snum)
         else:
             raise NotImplementedError("Unsupported Block {} Section {:d} Format '{}'".format(self.ident,snum,fmt))
@@ -268,7 +323,7 @@ class Block(object):
             block_int5 = section_elem.get("Int5")
             name_text = section_elem.get("Name")
 
-            section = self.createSection()
+            section = self.newSection()
             section.start.section_idx = snum
             if block_int5 is not None:
                 section.start.int5 = int(block_int5, 0)
@@ -308,6 +363,63 @@ class Block(object):
         """
         pass
 
+    def initWithBinSection(self, section, records):
+        """ Imports section data from compact binary records
+
+            Generic code, used when section is stored as raw data. Blocks which
+            store their objects as separate records overload it, join the records
+            into section data and then call this. The objects are created when
+            the data is parsed, the same way as for RSRC file.
+        """
+        snum = section.start.section_idx
+        if len(records) != 1 or records[0][0] != LVbinmodel.RECORD_TYPE.SectionData:
+            raise AttributeError("Block {} section {:d} should be stored as single SectionData record"\
+              .format(self.ident,snum))
+        self.setData(bytes(records[0][1]), section_num=snum)
+
+    def initWithBinEarly(self, ident, sections):
+        """ Early part of block loading from compact binary file
+
+        At the point it is executed, other blocks and sections are inaccessible.
+
+        :param bytes ident: Ident of this block
+        :param list sections: Tuples of index, Int5, name text and content records
+        """
+        self.ident = ident
+        self.header = BlockHeader(self.po)
+        self.header.ident = (c_ubyte * 4).from_buffer_copy(self.ident)
+        self.active_section_num = None
+
+        self.sections = {}
+        for snum, block_int5, name_text, records in sections:
+            section = self.newSection()
+            section.start.section_idx = snum
+            section.start.int5 = block_int5
+            if name_text is not None:
+                self.initSectionName(section, name_text)
+            if section.start.section_idx in self.sections:
+                raise IOError("BlockSectionStart of given section_idx exists twice")
+            self.sections[section.start.section_idx] = section
+
+            self.active_section_num = snum
+            self.initWithBinSection(section, records)
+            self.active_section_num = None
+
+        self.header.count = len(self.sections) - 1
+
+        self.setActiveSectionNum( self.defaultSectionNumber() )
+
+        if (self.po.verbose > 2):
+            print("{:s}: Block {} has {:d} sections".format(self.vi.src_fname,self.ident,len(self.sections)))
+
+    def initWithBinLate(self):
+        """ Late part of block loading from compact binary file
+
+        All sections hold raw data at this point, like sections stored
+        as binary files in XML export; so the same late loading applies.
+        """
+        self.initWithXMLLate()
+
     def setSizeFromBlocks(self):
         """ Set data size of this block
 
@@ -440,7 +552,7 @@ class Block(object):
             section_num = self.active_section_num
         # Insert empty structure if the requested section is missing
         if section_num not in self.sections:
-            section = self.createSection()
+            section = self.newSection()
             section.start.section_idx = section_num
             self.sections[section_num] = section
         # Replace the target section
@@ -548,6 +660,37 @@ class Block(object):
         ret = True
         return ret
 
+    def diffSection(self, other, section_num):
+        """ Compares section of this block with the same section of other block
+
+        Returns list of LVdiff.DiffEntry with differences found.
+        """
+        diffs = []
+        section = self.sections[section_num]
+        other_section = other.sections[section_num]
+        if section.name_text != other_section.name_text:
+            diffs.append(LVdiff.DiffEntry('~', self.ident, section_num, "Name", \
+              section.name_text, other_section.name_text))
+        if section.start.int5 != other_section.start.int5:
+            diffs.append(LVdiff.DiffEntry('~', self.ident, section_num, "Int5", \
+              "0x{:08x}".format(section.start.int5), "0x{:08x}".format(other_section.start.int5)))
+        diffs.extend(self.diffSectionData(other, section_num))
+        return diffs
+
+    def diffSectionData(self, other, section_num):
+        """ Compares data of given section with the same section of other block
+
+        Generic version compares decoded bytes, and points at first difference.
+        To be overloaded by blocks which can point at specific items.
+        """
+        data_a = self.getData(section_num=section_num).read()
+        data_b = other.getData(section_num=section_num).read()
+        if data_a == data_b:
+            return []
+        offs = LVdiff.firstDifference(data_a, data_b)
+        return [LVdiff.DiffEntry('~', self.ident, section_num, "Data at 0x{:x}".format(offs), \
+          "{:d} bytes".format(len(data_a)), "{:d} bytes".format(len(data_b)))]
+
     def getData(self, section_num=None, use_coding=BLOCK_CODING.NONE):
         """ Retrieve file stream with raw data of specific section of this block
 
@@ -670,11 +813,20 @@ class Block(object):
         bldata = self.getData(section_num=snum)
         if (self.po.verbose > 1):
             print("{}: Writing block {} section {} to '{}'".format(self.vi.src_fname,self.ident,snum,block_fname))
-        with open(block_fname, "wb") as block_fd:
-            block_fd.write(bldata.read())
+        stored_fname = LVstore.writeExportFile(self.vi, self.po, block_fname, bldata.read())
 
         section_elem.set("Format", "bin")
-        section_elem.set("File", os.path.basename(block_fname))
+        section_elem.set("File", stored_fname)
+
+    def exportBinSection(self, writer, snum, section):
+        """ Export one section into compact binary records
+
+        This should be overloaded by specific blocks implementation to store
+        objects as separate records, instead of the raw data which the base
+        function stores.
+        """
+        bldata = self.getData(section_num=snum)
+        writer.writeRecord(LVbinmodel.RECORD_TYPE.SectionData, bldata.read())
 
     def exportFilesBase(self, snum, section):
         """ Prepare a base for file names of any files created by data export
@@ -751,6 +903,88 @@ class Block(object):
 
         return elem
 
+    def exportBinRecords(self, writer, simple_bin=False):
+        """ Export the block into compact binary records
+
+        All sections are exported by this method.
+        """
+        writer.writeBlock(self.ident)
+        for snum, section in self.sections.items():
+            if section.name_obj is not None:
+                name_text = section.name_obj.prepareRSRCData()
+            else:
+                name_text = section.name_text
+            writer.writeSection(snum, section.start.int5, name_text)
+
+            if not simple_bin:
+                self.exportBinSection(writer, snum, section)
+            else:
+                Block.exportBinSection(self, writer, snum, section)
+
+    def exportDictFromElement(self, elem):
+        """ Converts XML element created by export into dict of plain values
+
+        Files referenced by the element are replaced by their payloads.
+        """
+        d = { 'tag': elem.tag }
+        if len(elem.attrib) > 0:
+            d['attribs'] = dict(elem.attrib)
+            payload = self.vi.xml_payloads.get(elem.get("File"))
+            if isinstance(payload, bytes):
+                d['data'] = payload
+            elif payload is not None:
+                d['data'] = self.exportDictFromElement(payload)
+        if elem.text is not None and len(elem.text.strip()) > 0:
+            d['text'] = elem.text.strip()
+        childs = [self.exportDictFromElement(subelem) for subelem in elem if subelem.tag is not ET.Comment]
+        if len(childs) > 0:
+            d['childs'] = childs
+        return d
+
+    def exportDictSection(self, snum, section, fname_base):
+        """ Export one section into dict of plain values
+
+        This should be overloaded by specific blocks implementation to provide
+        objects in their parsed form. The base function makes XML export in memory,
+        and converts the elements; files which the export would create are included
+        as payloads.
+        """
+        section_elem = ET.Element("Section")
+        self.exportXMLSection(section_elem, snum, section, fname_base)
+        elem_dict = self.exportDictFromElement(section_elem)
+        d = { 'format': section_elem.get("Format") }
+        if 'data' in elem_dict:
+            d['data'] = elem_dict['data']
+        attribs = { k: v for k, v in section_elem.attrib.items() if k not in ("Format", "File",) }
+        if len(attribs) > 0:
+            d['attribs'] = attribs
+        if 'childs' in elem_dict:
+            d['childs'] = elem_dict['childs']
+        return d
+
+    def exportDict(self):
+        """ Export the block properties into dict of plain values
+
+        All sections are exported by this method. Files are not written;
+        VI.to_dict() sets the VI to keep any exported files as payloads.
+        """
+        sections = []
+        for snum, section in self.sections.items():
+            section_dict = { 'index': snum }
+            if section.name_obj is not None:
+                section_dict['nameObject'] = exportDictValue(section.name_obj)
+            elif section.name_text is not None:
+                section_dict['name'] = section.name_text.decode(self.vi.textEncoding)
+            if self.vi.ftype == LVrsrcontainer.FILE_FMT_TYPE.LLB:
+                section_dict['int5'] = section.start.int5
+
+            fname_base = self.exportFilesBase(snum, section)
+            section_dict.update(self.exportDictSection(snum, section, fname_base))
+            sections.append(section_dict)
+
+        return { 'ident': getPrettyStrFromRsrcType(self.ident), 'name': self.full_name, \
+          'sections': sections }
+
     def defaultSectionNumber(self):
         """ Gives section index of a default section.
 
@@ -773,29 +1007,17 @@ class Block(object):
         self.active_section_num = section_num
 
     def __getattr__(self, name):
-        """ Access to active section properties
-        """
-        try:
-            section_num = object.__getattribute__(self,'active_section_num')
-            section = object.__getattribute__(self,'sections')[section_num]
-            if hasattr(section, name):
-                return getattr(section, name)
-        except:
-            pass
-        return super().__getattr__(name)
+        """ Access to active section properties not declared by createSection()
 
-    def __setattr__(self, name, value):
-        """ Setting of active section properties
+        Properties declared there are accessed through SectionProperty descriptors
+        instead; this is only reached if normal attribute lookup fails.
         """
-        try:
-            section_num = object.__getattribute__(self,'active_section_num')
-            section = object.__getattribute__(self,'sections')[section_num]
-            if hasattr(section, name):
-                setattr(section, name, value)
-                return
-        except:
-            pass
-        super().__setattr__(name, value)
+        sections = self.__dict__.get('sections')
+        if sections is not None:
+            section = sections.get(self.__dict__.get('active_section_num'))
+            if section is not None and hasattr(section, name):
+                return getattr(section, name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__,name))
 
     def __repr__(self):
         bldata = self.getData()
@@ -927,6 +1149,38 @@ class CompleteBlock(Block):
                     self.setData(coded_data.read(), section_num=snum)
         super().initWithXMLLate()
 
+    def initWithBinSection(self, section, records):
+        # Data is parsed later, as if it was read from BIN file
+        section.parse_failed = True
+        Block.initWithBinSection(self, section, records)
+
+    def prepareBinSectionRecords(self, section_num):
+        raise NotImplementedError("Binary records export is not implemented")
+
+    def exportBinSectionRecords(self, writer, section_num, section):
+        """ Export one section as compact binary records of its objects
+
+        To be used by blocks which implement prepareBinSectionRecords();
+        if the section was not parsed, it is stored as raw data.
+        """
+        self.parseData(section_num=section_num)
+
+        if section.parse_failed:
+            Block.exportBinSection(self, writer, section_num, section)
+            return
+
+        try:
+            records = self.prepareBinSectionRecords(section_num)
+        except Exception as e:
+            eprint("{:s}: Warning: Block {} section {} binary records export exception: {}."\
+                .format(self.vi.src_fname,self.ident,section_num,str(e)))
+            #raise # useful for debug
+            Block.exportBinSection(self, writer, section_num, section)
+            return
+
+        for rec_type, body in records:
+            writer.writeRecord(rec_type, body)
+
     def exportXMLSectionData(self, section_elem, section_num, section, fname_base):
         raise NotImplementedError("Export is not implemented")
 
@@ -1799,6 +2053,8 @@ class DFDS(CompleteBlock):
         section = super().createSection()
         section.parse_failed = False
         section.content = []
+        # Index of fills within section data, used to parse single fill without parsing the section
+        section.fill_index = None
         return section
 
     def setDefaultEncoding(self):
@@ -1812,50 +2068,136 @@ class DFDS(CompleteBlock):
     def isSpecialDSTMCluster(self, tmItm):
         return (tmItm.flags & (0x0010|0x0020|0x0040|0x0004)) != 0
 
-    def parseRSRCSectionData(self, section_num, bldata):
-        section = self.sections[section_num]
+    def getFillTypeMap(self):
+        """ Returns Type Map entries which have Default Fill, in order of the fills
+
+        Each item is a tuple of Type Map entry and flag marking Special DSTM Cluster.
+        """
         TM = self.vi.get_one_of('TM80', 'DSTM')
         ver = self.vi.getFileVersion()
-
-        section.content = []
         if TM is None:
             raise RuntimeError("No type map block to put default data into types")
-        elif isGreaterOrEqVersion(ver, 8,0,0,1):
-            TypeMap = TM.getTypeMap()
-
-            for tmEntry in TypeMap:
-                df = None
-                if (tmEntry.flags & 0x0008) != 0 or \
-                   (tmEntry.flags & 0x0800) != 0 or \
-                   (tmEntry.flags & 0x0400) != 0:
-                    continue
-                if (tmEntry.flags & 0x2000) != 0 or \
-                   (tmEntry.flags & 0x0001) != 0:
-                    try:
-                        df = LVdatafill.newDataFillObjectWithTD(self.vi, tmEntry.index, tmEntry.flags, tmEntry.td, self.po)
-                        section.content.append(df)
-                        df.initWithRSRC(bldata)
-                    except Exception as e:
-                        tdType = tmEntry.td.fullType()
-                        raise RuntimeError("Data type {}: {}".format(enumOrIntToName(tdType), str(e)))
-                    pass
-                elif tmEntry.td.fullType() == TD_FULL_TYPE.Cluster and self.isSpecialDSTMCluster(tmEntry):
-                    # This is Special DSTM Cluster
-                    try:
-                        df = LVdatafill.newSpecialDSTMClusterWithTD(self.vi, tmEntry.index, tmEntry.flags, tmEntry.td, self.po)
-                        section.content.append(df)
-                        df.initWithRSRC(bldata)
-                    except Exception as e:
-                        tdType = tmEntry.td.fullType()
-                        raise RuntimeError("Special DSTM {}: {}".format(enumOrIntToName(tdType), str(e)))
-                    pass
-                else:
-                    # No default value for this TD
-                    pass
-        else:
+        elif not isGreaterOrEqVersion(ver, 8,0,0,1):
             raise NotImplementedError("No support for the LV7.1 default data format")
+
+        fillTypeMap = []
+        for tmEntry in TM.getTypeMap():
+            if (tmEntry.flags & 0x0008) != 0 or \
+               (tmEntry.flags & 0x0800) != 0 or \
+               (tmEntry.flags & 0x0400) != 0:
+                continue
+            if (tmEntry.flags & 0x2000) != 0 or \
+               (tmEntry.flags & 0x0001) != 0:
+                fillTypeMap.append((tmEntry, False,))
+            elif tmEntry.td.fullType() == TD_FULL_TYPE.Cluster and self.isSpecialDSTMCluster(tmEntry):
+                # This is Special DSTM Cluster
+                fillTypeMap.append((tmEntry, True,))
+            else:
+                # No default value for this TD
+                pass
+        return fillTypeMap
+
+    def newDataFillForEntry(self, tmEntry, isSpecial):
+        if isSpecial:
+            return LVdatafill.newSpecialDSTMClusterWithTD(self.vi, tmEntry.index, tmEntry.flags, tmEntry.td, self.po)
+        return LVdatafill.newDataFillObjectWithTD(self.vi, tmEntry.index, tmEntry.flags, tmEntry.td, self.po)
+
+    def dataFillError(self, tmEntry, isSpecial, e):
+        tdType = tmEntry.td.fullType()
+        return RuntimeError("{} {}: {}".format("Special DSTM" if isSpecial else "Data type",\
+          enumOrIntToName(tdType), str(e)))
+
+    def parseRSRCSectionData(self, section_num, bldata):
+        section = self.sections[section_num]
+
+        section.content = []
+        for tmEntry, isSpecial in self.getFillTypeMap():
+            try:
+                df = self.newDataFillForEntry(tmEntry, isSpecial)
+                section.content.append(df)
+                df.initWithRSRC(bldata)
+            except Exception as e:
+                raise self.dataFillError(tmEntry, isSpecial, e)
         pass
 
+    def prepareFillIndex(self, bldata, fillTypeMap):
+        """ Finds position of each Default Fill within section data, without parsing the values
+
+        Returns dict which maps Type Map index to tuple of offset and length of the fill.
+        """
+        fill_index = {}
+        # Skipping does not depend on Type Map index, so one Data Fill can skip all fills of a TD
+        skip_fills = {}
+        for tmEntry, isSpecial in fillTypeMap:
+            offset = bldata.tell()
+            try:
+                skip_key = (id(tmEntry.td), tmEntry.flags, isSpecial,)
+                df = skip_fills.get(skip_key)
+                if df is None:
+                    df = self.newDataFillForEntry(tmEntry, isSpecial)
+                    skip_fills[skip_key] = df
+                df.skipRSRCData(bldata)
+            except Exception as e:
+                raise self.dataFillError(tmEntry, isSpecial, e)
+            fill_index[tmEntry.index] = (offset, bldata.tell() - offset,)
+        endpos = bldata.tell()
+        bldata.seek(0, io.SEEK_END)
+        if endpos != bldata.tell():
+            raise RuntimeError("Block {} size is {} and does not match indexed size {}"\
+              .format(self.ident, bldata.tell(), endpos))
+        return fill_index
+
+    def getFillIndex(self, section_num=None):
+        """ Returns index of Default Fills within given section data
+
+        The index maps Type Map index to tuple of offset and length of the fill
+        within decoded section data. It is created on first use, and re-created
+        if raw data of the section changes.
+        """
+        if section_num is None:
+            section_num = self.active_section_num
+        section = self.sections[section_num]
+        raw_data = self.getRawData(section_num)
+        if section.fill_index is None or section.fill_index.raw_data is not raw_data:
+            bldata = self.getData(section_num=section_num)
+            fill_index = SimpleNamespace()
+            fill_index.raw_data = raw_data
+            fill_index.data_buf = bldata.getvalue()
+            fillTypeMap = self.getFillTypeMap()
+            fill_index.types = { tmEntry.index: (tmEntry, isSpecial,) for tmEntry, isSpecial in fillTypeMap }
+            fill_index.offsets = self.prepareFillIndex(bldata, fillTypeMap)
+            section.fill_index = fill_index
+        return section.fill_index.offsets
+
+    def getDataFill(self, index, section_num=None):
+        """ Returns Default Fill for Type Map entry of given index, or None if there's no such fill
+
+        If the section was not parsed yet, only data of the requested fill is parsed,
+        found through index of the section; the section itself stays unparsed.
+        """
+        if section_num is None:
+            section_num = self.active_section_num
+        section = self.sections[section_num]
+        if self.vi.dataSource != "rsrc" or not self.needParseData(section_num=section_num):
+            self.parseData(section_num=section_num)
+            for df in section.content:
+                if df.index == index:
+                    return df
+            return None
+
+        fill_offsets = self.getFillIndex(section_num=section_num)
+        if index not in fill_offsets:
+            return None
+        offset, length = fill_offsets[index]
+        tmEntry, isSpecial = section.fill_index.types[index]
+        bldata = io.BytesIO(section.fill_index.data_buf[offset:offset+length])
+        try:
+            df = self.newDataFillForEntry(tmEntry, isSpecial)
+            df.initWithRSRC(bldata)
+        except Exception as e:
+            raise self.dataFillError(tmEntry, isSpecial, e)
+        return df
+
     def prepareRSRCData(self, section_num):
         section = self.sections[section_num]
         data_buf = b''
@@ -1863,6 +2205,54 @@ class DFDS(CompleteBlock):
             data_buf += df.prepareRSRCData()
         return data_buf
 
+    def prepareBinSectionRecords(self, section_num):
+        section = self.sections[section_num]
+        return [(LVbinmodel.RECORD_TYPE.DataFill, df.prepareRSRCData(),) for df in section.content]
+
+    def exportBinSection(self, writer, snum, section):
+        self.exportBinSectionRecords(writer, snum, section)
+
+    def initWithBinSection(self, section, records):
+        if len(records) == 1 and records[0][0] == LVbinmodel.RECORD_TYPE.SectionData:
+            super().initWithBinSection(section, records)
+            return
+        # Fills are stored one after another; they are created when the data is parsed
+        for rec_type, body in records:
+            if rec_type != LVbinmodel.RECORD_TYPE.DataFill:
+                raise AttributeError("Block {} section {:d} contains unexpected record type {:d}"\
+                  .format(self.ident,section.start.section_idx,rec_type))
+        data_buf = b''.join([body for rec_type, body in records])
+        super().initWithBinSection(section, [(LVbinmodel.RECORD_TYPE.SectionData, data_buf,)])
+
+    def diffSectionData(self, other, section_num):
+        """ Compares Data Fill items of given section with the same section of other block
+        """
+        self.parseData(section_num=section_num)
+        other.parseData(section_num=section_num)
+        section = self.sections[section_num]
+        other_section = other.sections[section_num]
+
+        def dfText(df):
+            text = enumOrIntToName(df.tdType)
+            if isinstance(df.value, (int, float, bool, str, bytes,)):
+                text += " " + repr(df.value)
+            return text
+
+        def describe(df):
+            return ("DataFill {:d}".format(df.index), dfText(df),)
+
+        def describeChange(df_a, df_b):
+            if df_a.index != df_b.index:
+                return None
+            item = "DataFill {:d}".format(df_a.index)
+            text_a, text_b = dfText(df_a), dfText(df_b)
+            if text_a == text_b:
+                item += " data at 0x{:x}".format(LVdiff.firstDifference(df_a.prepareRSRCData(), df_b.prepareRSRCData()))
+            return (item, text_a, text_b,)
+
+        return LVdiff.diffSequences(self.ident, section_num, section.content, other_section.content, \
+          lambda df: df.prepareRSRCData(), describe, describeChange)
+
     def initWithXMLSectionData(self, section, section_elem):
         section.content = []
 
@@ -1882,6 +2272,9 @@ class DFDS(CompleteBlock):
 
     def initWithXMLLate(self):
         super().initWithXMLLate()
+        # Sections which are stored raw will get TDs while parsing; skip Type Map if all are raw
+        if all(section.parse_failed for section in self.sections.values()):
+            return
         ver = self.vi.getFileVersion()
         TM = self.vi.get_one_of('TM80', 'DSTM')
         if TM is None:
@@ -1932,6 +2325,12 @@ class DFDS(CompleteBlock):
             df.exportXML(subelem, fname_base)
         pass
 
+    def exportDictSection(self, snum, section, fname_base):
+        self.parseData(section_num=snum)
+        if section.parse_failed:
+            return Block.exportDictSection(self, snum, section, fname_base)
+        return { 'format': "inline", 'content': [df.exportDict() for df in section.content] }
+
 
 class GCDI(Block):
     def createSection(self):
@@ -2458,48 +2857,14 @@ class LVSR(CompleteBlock):
         section = self.sections[section_num]
 
         # Size of the data increses with further versions
-        # Data before byte 68 does not move - so it's always safe to read
-        data = LVSRData(self.po)
-        dataLen = bldata.readinto(data)
-        if dataLen not in [68, 120, 136, 137, sizeof(LVSRData)]:
-            raise EOFError("Data block length {} too small for parsing {} data".format(dataLen, self.ident))
-
-        section.version = decodeVersion(data.version)
-        section.protected = ((data.execFlags & VI_EXEC_FLAGS.LibProtected.value) != 0)
-        section.execFlags = data.execFlags & (~VI_EXEC_FLAGS.LibProtected.value)
-        section.field08 = int(data.field08)
-        section.field0C = int(data.field0C)
-        section.flags10 = int(data.flags10)
-        section.field12 = int(data.field12)
-        section.buttonsHidden = int(data.buttonsHidden)
-        section.frontpFlags = int(data.frontpFlags)
-        section.instrState = int(data.instrState)
-        section.execState = int(data.execState)
-        section.execPrio = int(data.execPrio)
-        section.viType = int(data.viType)
-        section.field24 = int(data.field24)
-        section.field28 = int(data.field28)
-        section.field2C = int(data.field2C)
-        section.field30 = int(data.field30)
-        section.viSignature = bytes(data.viSignature)
-        # Additional data, exists only in newer versions
         # sizeof(LVSR) per version: 8.6b7->120 9.0b25->120 9.0->120 10.0b84->120 10.0->136 11.0.1->136 12.0->136 13.0->136 14.0->137
-        if isGreaterOrEqVersion(section.version, 6,0):
-            section.field44 = int(data.field44)
-            section.field48 = int(data.field48)
-            section.field4C = int(data.field4C)
-            section.field4E = int(data.field4E)
-            section.field50_md5 = bytes(data.field50_md5)
-            section.libpass_md5 = bytes(data.libpass_md5)
-            section.libpass_text = None
-            section.field70 = int(data.field70)
-            section.field74 = int(data.field74)
-        if isGreaterOrEqVersion(section.version, 10,0, stage='release'):
-            section.field78_md5 = bytes(data.field78_md5)
-        if isGreaterOrEqVersion(section.version, 14,0):
-            section.inlineStg = int(data.inlineStg)
-        if isGreaterOrEqVersion(section.version, 15,0):
-            section.field8C = int(data.field8C)
+        # Data before byte 68 does not move; fields after it depend on the version stored at start
+        section.version = decodeVersion(int.from_bytes(bldata.read(4), byteorder='big', signed=False))
+        LVSR_DATA_SCHEMA.parse(bldata, section.version, section)
+
+        section.protected = ((section.execFlags & VI_EXEC_FLAGS.LibProtected.value) != 0)
+        section.execFlags = section.execFlags & (~VI_EXEC_FLAGS.LibProtected.value)
+        section.libpass_text = None
         # Any data added in future versions
         section.field90 = bldata.read()
 
@@ -2509,53 +2874,16 @@ class LVSR(CompleteBlock):
         data_buf += int(encodeVersion(section.version)).to_bytes(4, byteorder='big')
         data_execFlags = (section.execFlags & (~VI_EXEC_FLAGS.LibProtected.value)) | \
           (VI_EXEC_FLAGS.LibProtected.value if section.protected else 0)
-        data_buf += int(data_execFlags).to_bytes(4, byteorder='big')
-        data_buf += int(section.field08).to_bytes(4, byteorder='big')
-        data_buf += int(section.field0C).to_bytes(4, byteorder='big')
-        data_buf += int(section.flags10).to_bytes(2, byteorder='big')
-        data_buf += int(section.field12).to_bytes(2, byteorder='big')
-        data_buf += int(section.buttonsHidden).to_bytes(2, byteorder='big')
-        data_buf += int(section.frontpFlags).to_bytes(2, byteorder='big')
-        data_buf += int(section.instrState).to_bytes(4, byteorder='big')
-        data_buf += int(section.execState).to_bytes(4, byteorder='big')
-        data_buf += int(section.execPrio).to_bytes(2, byteorder='big')
-        data_buf += int(section.viType).to_bytes(2, byteorder='big')
-        data_buf += int(section.field24).to_bytes(4, byteorder='big', signed=True)
-        data_buf += int(section.field28).to_bytes(4, byteorder='big')
-        data_buf += int(section.field2C).to_bytes(4, byteorder='big')
-        data_buf += int(section.field30).to_bytes(4, byteorder='big')
-        data_buf += section.viSignature
-        if isGreaterOrEqVersion(section.version, 6,0):
-            data_buf += int(section.field44).to_bytes(4, byteorder='big')
-            data_buf += int(section.field48).to_bytes(4, byteorder='big')
-            data_buf += int(section.field4C).to_bytes(2, byteorder='big')
-            data_buf += int(section.field4E).to_bytes(2, byteorder='big')
-            data_buf += section.field50_md5
-            if section.libpass_text is not None:
-                pass #TODO re-compute md5 from pass
-            data_buf += section.libpass_md5
-            data_buf += int(section.field70).to_bytes(4, byteorder='big')
-            data_buf += int(section.field74).to_bytes(4, byteorder='big', signed=True)
-        if isGreaterOrEqVersion(section.version, 10,0, stage='release'):
-            data_buf += section.field78_md5
-        if isGreaterOrEqVersion(section.version, 14,0):
-            data_buf += int(section.inlineStg).to_bytes(1, byteorder='big')
-        if isGreaterOrEqVersion(section.version, 15,0):
-            data_buf += b'\0' * 3
-            data_buf += int(section.field8C).to_bytes(4, byteorder='big')
+        if section.libpass_text is not None:
+            pass #TODO re-compute md5 from pass
+        data_buf += LVSR_DATA_SCHEMA.prepare(section.version, section, len(data_buf), execFlags=data_execFlags)
         data_buf += section.field90
         return data_buf
 
     def expectedRSRCSize(self, section_num):
         section = self.sections[section_num]
         ver = self.vi.getFileVersion()
-        exp_whole_len = 120
-        if isGreaterOrEqVersion(section.version, 10,0, stage='release'):
-            exp_whole_len += 16 # total 136
-        if isGreaterOrEqVersion(section.version, 14,0):
-            exp_whole_len += 1 # total 137
-        if isGreaterOrEqVersion(section.version, 15,0):
-            exp_whole_len += 3 + 4
+        exp_whole_len = 4 + LVSR_DATA_SCHEMA.size(section.version, 4)
         exp_whole_len += len(section.field90)
         return exp_whole_len
 
@@ -2631,13 +2959,7 @@ class LVSR(CompleteBlock):
                     section.field8C = int(field8C, 0)
 
             elif (subelem.tag == "Field90"):
-                bin_path = os.path.dirname(self.vi.src_fname)
-                if len(bin_path) > 0:
-                    bin_fname = bin_path + '/' + subelem.get("File")
-                else:
-                    bin_fname = subelem.get("File")
-                with open(bin_fname, "rb") as part_fh:
-                    section.field90 = part_fh.read()
+                section.field90 = LVstore.readImportFile(self.vi, self.po, subelem.get("File"))
             else:
                 raise AttributeError("Section contains unexpected tag")
         pass
@@ -2701,11 +3023,10 @@ class LVSR(CompleteBlock):
 
             part_fname = "{:s}_{:s}.{:s}".format(fname_base,subelem.tag,"bin")
             if (self.po.verbose > 1):
-                print("{}: Writing block {} section {} part to '{}'".format(self.vi.src_fname,self.ident,snum,part_fname))
-            with open(part_fname, "wb") as part_fd:
-                part_fd.write(section.field90)
+                print("{}: Writing block {} section {} part to '{}'".format(self.vi.src_fname,self.ident,section_num,part_fname))
+            stored_fname = LVstore.writeExportFile(self.vi, self.po, part_fname, section.field90)
             subelem.set("Format", "bin")
-            subelem.set("File", os.path.basename(part_fname))
+            subelem.set("File", stored_fname)
         pass
 
     def getVersion(self, section_num=None):
@@ -2851,12 +3172,10 @@ class ICON(Block):
         section.height = 32
         section.bpp = 1
         section.icon = None
+        section.icon_data = None
         return section
 
-    def parseRSRCData(self, section_num, bldata):
-        section = self.sections[section_num]
-
-        icon = Image.new("P", (section.width, section.height))
+    def getIconPalette(self, section):
         img_palette = [ 0 ] * (3*256)
         if section.bpp == 8:
             lv_color_palette = LABVIEW_COLOR_PALETTE_256
@@ -2868,63 +3187,47 @@ class ICON(Block):
             img_palette[3*i+0] = (rgb >> 16) & 0xFF
             img_palette[3*i+1] = (rgb >>  8) & 0xFF
             img_palette[3*i+2] = (rgb >>  0) & 0xFF
-        icon.putpalette(img_palette, rawmode='RGB')
-        img_data = bldata.read(int(section.width * section.height * section.bpp / 8))
-        if section.bpp == 8:
-            pass
-        elif section.bpp == 4:
-            img_data8 = bytearray(section.width * section.height)
-            for i, px in enumerate(img_data):
-                img_data8[2*i+0] = (px >> 4) & 0xF
-                img_data8[2*i+1] = (px >> 0) & 0xF
-            img_data = img_data8
-        elif section.bpp == 1:
-            img_data8 = bytearray(section.width * section.height)
-            for i, px in enumerate(img_data):
-                img_data8[8*i+0] = (px >> 7) & 0x1
-                img_data8[8*i+1] = (px >> 6) & 0x1
-                img_data8[8*i+2] = (px >> 5) & 0x1
-                img_data8[8*i+3] = (px >> 4) & 0x1
-                img_data8[8*i+4] = (px >> 3) & 0x1
-                img_data8[8*i+5] = (px >> 2) & 0x1
-                img_data8[8*i+6] = (px >> 1) & 0x1
-                img_data8[8*i+7] = (px >> 0) & 0x1
-            img_data = img_data8
-        else:
+        return img_palette
+
+    def parseRSRCData(self, section_num, bldata):
+        section = self.sections[section_num]
+
+        if section.bpp not in (1, 4, 8,):
             raise ValueError("Unsupported icon BPP")
+        img_data = bldata.read(int(section.width * section.height * section.bpp / 8))
+        # Store one byte per pixel; the image object is only created when needed
+        section.icon_data = unpackPixelsToBytes(img_data, section.bpp)
+        section.icon = None
 
-        icon.putdata(img_data)
-        # Pixel-by-pixel method, for reference (slower than all-at-once)
-        #for y in range(0, section.height):
-        #    for x in range(0, section.width):
-        #        icon.putpixel((x, y), bldata.read(1))
-        section.icon = icon
+    def getIcon(self, section_num=None):
+        """ Returns PIL Image with the icon, creating it if needed
+        """
+        from PIL import Image
+        if section_num is None:
+            section_num = self.active_section_num
+        section = self.sections[section_num]
+
+        if section.icon is None:
+            icon = Image.new("P", (section.width, section.height))
+            icon.putpalette(self.getIconPalette(section), rawmode='RGB')
+            icon.putdata(section.icon_data)
+            section.icon = icon
+        return section.icon
 
     def updateSectionData(self, section_num=None):
         if section_num is None:
             section_num = self.active_section_num
         section = self.sections[section_num]
 
-        data_buf = bytes(section.icon.getdata())
+        if section.icon is not None:
+            data_buf = bytes(section.icon.getdata())
+        else:
+            data_buf = section.icon_data
         data_len = (section.width * section.height * section.bpp) // 8
 
-        if section.bpp == 8:
-            pass
-        elif section.bpp == 4:
-            data_buf8 = bytearray(data_len)
-            for i in range(data_len):
-                data_buf8[i] = (data_buf[2*i+0] << 4) | (data_buf[2*i+1] << 0)
-            data_buf = data_buf8
-        elif section.bpp == 1:
-            data_buf8 = bytearray(data_len)
-            for i in range(data_len):
-                data_buf8[i] = (data_buf[8*i+0] << 7) | (data_buf[8*i+1] << 6) | \
-                    (data_buf[8*i+2] << 5) | (data_buf[8*i+3] << 4) | \
-                    (data_buf[8*i+4] << 3) | (data_buf[8*i+5] << 2) | \
-                    (data_buf[8*i+6] << 1) | (data_buf[8*i+7] << 0)
-            data_buf = data_buf8
-        else:
+        if section.bpp not in (1, 4, 8,):
             raise ValueError("Unsupported icon BPP")
+        data_buf = packBytesToPixels(data_buf, section.bpp)
 
         if len(data_buf) < data_len:
             data_buf += b'\0' * (data_len - len(data_buf))
@@ -2939,36 +3242,34 @@ class ICON(Block):
 
     def loadIcon(self):
         self.parseData()
-        return self.icon
+        return self.getIcon()
 
     def exportXMLSection(self, section_elem, section_num, section, fname_base):
         block_fname = "{:s}.{:s}".format(fname_base,"png")
 
         self.parseData(section_num=section_num)
-        with open(block_fname, "wb") as block_fd:
-            if (self.po.verbose > 1):
-                print("{}: Writing block {} section {} image to '{}'".format(self.vi.src_fname,self.ident,section_num,block_fname))
-            section.icon.save(block_fd, format="PNG")
+        icon = self.getIcon(section_num=section_num)
+        if (self.po.verbose > 1):
+            print("{}: Writing block {} section {} image to '{}'".format(self.vi.src_fname,self.ident,section_num,block_fname))
+        bldata = io.BytesIO()
+        icon.save(bldata, format="PNG")
+        stored_fname = LVstore.writeExportFile(self.vi, self.po, block_fname, bldata.getvalue())
 
         section_elem.set("Format", "png")
-        section_elem.set("File", os.path.basename(block_fname))
+        section_elem.set("File", stored_fname)
 
     def initWithXMLSection(self, section, section_elem):
         snum = section.start.section_idx
         fmt = section_elem.get("Format")
         if fmt == "png": # Format="png" - the content is stored separately as image file
+            from PIL import Image
             if (self.po.verbose > 2):
                 print("{:s}: For Block {} section {:d}, reading PNG file '{}'"\
                   .format(self.vi.src_fname,self.ident,snum,section_elem.get("File")))
-            bin_path = os.path.dirname(self.vi.src_fname)
-            if len(bin_path) > 0:
-                bin_fname = bin_path + '/' + section_elem.get("File")
-            else:
-                bin_fname = section_elem.get("File")
-            with open(bin_fname, "rb") as png_fh:
-                icon = Image.open(png_fh)
-                section.icon = icon
-                icon.getdata() # to make sure the file gets loaded
+            data_buf = LVstore.readImportFile(self.vi, self.po, section_elem.get("File"))
+            icon = Image.open(io.BytesIO(data_buf))
+            section.icon = icon
+            icon.getdata() # to make sure the image gets loaded
         else:
             Block.initWithXMLSection(self, section, section_elem)
         pass
@@ -3508,6 +3809,8 @@ class HeapVerb(Block):
     def createSection(self):
         section = super().createSection()
         section.objects = []
+        # Index of entries within section data, used to parse single subtree without parsing the section
+        section.heap_index = None
         return section
 
     def getTopClassEn(self, section, obj_idx):
@@ -3530,7 +3833,7 @@ class HeapVerb(Block):
         i = obj_idx[-1]
         return section.objects[i]
 
-    def parseRSRCHeap(self, section, bldata, parentNode):
+    def parseRSRCHeap(self, section, bldata, parentNode, raw_buf=None):
         startPos = bldata.tell()
         cmd = bldata.read(2)
 
@@ -3557,9 +3860,9 @@ class HeapVerb(Block):
             parentNode = obj
         dataLen = bldata.tell() - startPos
 
-        # TODO Should we re-read the bytes and set raw data inside the obj?
-        #bldata.seek(startPos)
-        #dataBuf = bldata.read(dataLen)
+        # Keep original bytes of the node, so that unmodified nodes do not need to be re-created
+        if raw_buf is not None:
+            obj.setData(raw_buf[startPos:startPos+dataLen])
 
         return parentNode, dataLen
 
@@ -3568,11 +3871,13 @@ class HeapVerb(Block):
 
         section.objects = []
         content_len = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
+        # Nodes store slices of this view instead of copies of their data
+        raw_buf = bldata.getbuffer().toreadonly()
 
         parentNode = None
         tot_len = 0
         while tot_len < content_len:
-            parentNode, entry_len = self.parseRSRCHeap(section, bldata, parentNode)
+            parentNode, entry_len = self.parseRSRCHeap(section, bldata, parentNode, raw_buf)
             if entry_len <= 0:
                 print("{:s}: Block {} section {:d}, has not enough data for complete heap"\
                   .format(self.vi.src_fname,self.ident,section_num))
@@ -3588,14 +3893,12 @@ class HeapVerb(Block):
             section_num = self.active_section_num
         section = self.sections[section_num]
 
+        # Only modified nodes are re-created; the rest keeps bytes read from RSRC
         for obj in section.objects:
-            if not obj.raw_data_updated:
+            if obj.needUpdateData():
                 obj.updateData()
 
-        data_buf = b''
-        for i, obj in enumerate(section.objects):
-            bldata = obj.getData()
-            data_buf += bldata.read()
+        data_buf = b''.join([obj.raw_data for obj in section.objects])
 
         data_buf = int(len(data_buf)).to_bytes(4, byteorder='big') + data_buf
 
@@ -3609,6 +3912,129 @@ class HeapVerb(Block):
         exp_whole_len = None
         return exp_whole_len
 
+    def diffSectionData(self, other, section_num):
+        """ Compares heap nodes of given section with the same section of other block
+        """
+        self.parseData(section_num=section_num)
+        other.parseData(section_num=section_num)
+        section = self.sections[section_num]
+        other_section = other.sections[section_num]
+
+        def nodeKey(obj):
+            if obj.needUpdateData():
+                obj.updateData()
+            return bytes(obj.raw_data)
+
+        def nodeText(obj):
+            text = " ".join("{}=\"{}\"".format(LVheap.attributeIdToName(atId), \
+              LVheap.attributeValueIntOrEnToStr(atId, atVal, obj.parent)) for atId, atVal in obj.attribs.items())
+            tagText = obj.prepareContentXML("")
+            if tagText is not None:
+                text = (text + " " + tagText).strip()
+            return text
+
+        def describe(obj):
+            if obj.getScopeInfo() == LVheap.NODE_SCOPE.TagClose:
+                return None
+            return ("/".join(obj.getTagPath()), nodeText(obj),)
+
+        def describeChange(obj_a, obj_b):
+            if obj_a.getScopeInfo() == LVheap.NODE_SCOPE.TagClose or \
+              obj_a.getScopeInfo() != obj_b.getScopeInfo():
+                return None
+            path = obj_a.getTagPath()
+            if path != obj_b.getTagPath():
+                return None
+            return ("/".join(path), nodeText(obj_a), nodeText(obj_b),)
+
+        return LVdiff.diffSequences(self.ident, section_num, section.objects, other_section.objects, \
+          nodeKey, describe, describeChange)
+
+    def queryHeap(self, query, section_num=None):
+        """ Yields heap entries of given section which match the query
+
+        Works on raw data of the section, without parsing it into HeapNodes.
+        The query is either LVheapquery.HeapQuery or its text expression.
+        """
+        if section_num is None:
+            section_num = self.active_section_num
+        section = self.sections[section_num]
+        if not isinstance(query, LVheapquery.HeapQuery):
+            query = LVheapquery.HeapQuery(query)
+        # Modified nodes need to be stored in raw data first
+        if section.parsed_data_updated:
+            self.updateSectionData(section_num=section_num)
+        bldata = self.getData(section_num=section_num)
+        data_buf = bldata.getbuffer()
+        content_len = int.from_bytes(data_buf[:4], byteorder='big', signed=False)
+        yield from query.iterMatches(self.vi, self.po, data_buf[4:4+content_len], \
+          block_ident=self.ident, section_num=section_num)
+
+    def getHeapIndex(self, section_num=None):
+        """ Returns index of heap entries within given section data
+
+        The index is LVheapquery.HeapIndex, with entry numbers the same as
+        in objects list of parsed section. It is created on first use, and
+        re-created if raw data of the section changes.
+        """
+        if section_num is None:
+            section_num = self.active_section_num
+        section = self.sections[section_num]
+        # Modified nodes need to be stored in raw data first
+        if section.parsed_data_updated:
+            self.updateSectionData(section_num=section_num)
+        raw_data = self.getRawData(section_num)
+        if section.heap_index is None or section.heap_index.raw_data is not raw_data:
+            data_buf = self.getData(section_num=section_num).getvalue()
+            content_len = int.from_bytes(data_buf[:4], byteorder='big', signed=False)
+            heap_index = LVheapquery.HeapIndex(data_buf[4:4+content_len])
+            heap_index.raw_data = raw_data
+            section.heap_index = heap_index
+        return section.heap_index
+
+    def getHeapSubtree(self, index, section_num=None):
+        """ Returns list of HeapNodes of heap entry with given index, and its subtree
+
+        If the section was not parsed yet, only the requested entries are parsed,
+        found through index of the section, with their parent entries which are
+        needed to recognize the tags; the section itself stays unparsed.
+        """
+        if section_num is None:
+            section_num = self.active_section_num
+        section = self.sections[section_num]
+        if self.vi.dataSource != "rsrc" or not self.needParseData(section_num=section_num):
+            self.parseData(section_num=section_num)
+            depth = 0
+            for end in range(index, len(section.objects)):
+                scopeInfo = section.objects[end].getScopeInfo()
+                if scopeInfo == LVheap.NODE_SCOPE.TagOpen:
+                    depth += 1
+                elif scopeInfo == LVheap.NODE_SCOPE.TagClose:
+                    depth -= 1
+                if depth <= 0:
+                    break
+            return section.objects[index:end+1]
+
+        heap_index = self.getHeapIndex(section_num=section_num)
+        bldata = io.BytesIO(heap_index.data_buf)
+        raw_buf = memoryview(heap_index.data_buf)
+        subtree = SimpleNamespace(objects=[])
+        parentNode = None
+        enclosing = heap_index.ancestorIndexes(index)
+        # Closing tag ends its opening tag, so that one needs to be parsed as well
+        if heap_index.entryScope(index) == LVheap.NODE_SCOPE.TagClose:
+            opening = heap_index.openingIndex(index)
+            if opening >= 0:
+                enclosing.append(opening)
+        for i in enclosing:
+            bldata.seek(heap_index.offsets[i])
+            parentNode, entry_len = self.parseRSRCHeap(subtree, bldata, parentNode, raw_buf)
+        subtree.objects = []
+        bldata.seek(heap_index.offsets[index])
+        for i in range(index, heap_index.ends[index] + 1):
+            parentNode, entry_len = self.parseRSRCHeap(subtree, bldata, parentNode, raw_buf)
+        return subtree.objects
+
     def initWithXMLHeap(self, section, elem, parentNode):
         tagEn = LVheap.tagNameToEnum(elem.tag, parentNode)
         if tagEn is None:
@@ -3636,14 +4062,9 @@ class HeapVerb(Block):
             if (self.po.verbose > 2):
                 print("{:s}: For Block {} section {:d}, reading separate XML file '{}'"\
                   .format(self.vi.src_fname,self.ident,snum,section_elem.get("File")))
-            xml_path = os.path.dirname(self.vi.src_fname)
-            if len(xml_path) > 0:
-                xml_fname = xml_path + '/' + section_elem.get("File")
-            else:
-                xml_fname = section_elem.get("File")
-            tree = ET.parse(xml_fname)
+            heap_root = LVstore.readImportXML(self.vi, self.po, section_elem.get("File"))
             section.objects = []
-            self.initWithXMLHeap(section, tree.getroot(), None)
+            self.initWithXMLHeap(section, heap_root, None)
         else:
             Block.initWithXMLSection(self, section, section_elem)
         pass
@@ -3674,18 +4095,60 @@ class HeapVerb(Block):
             if scopeInfo == LVheap.NODE_SCOPE.TagOpen:
                 parent_elems.append(elem)
 
-        ET.pretty_element_tree_heap(root)
+        if not self.vi.export_to_payloads:
+            ET.pretty_element_tree_heap(root)
 
         if (self.po.verbose > 1):
             print("{}: Writing XML for block {}".format(self.vi.src_fname, self.ident))
-        tree = ET.ElementTree(root)
-        with open(block_fname, "wb") as block_fd:
-            if (self.po.verbose > 1):
-                print("{}: Writing block {} section {} xml to '{}'".format(self.vi.src_fname,self.ident,snum,block_fname))
-            tree.write(block_fd, encoding='utf-8', xml_declaration=True)
+        if (self.po.verbose > 1):
+            print("{}: Writing block {} section {} xml to '{}'".format(self.vi.src_fname,self.ident,snum,block_fname))
+        stored_fname = LVstore.writeExportXML(self.vi, self.po, block_fname, root)
 
         section_elem.set("Format", "xml")
-        section_elem.set("File", os.path.basename(block_fname))
+        section_elem.set("File", stored_fname)
+
+    def exportDictSection(self, snum, section, fname_base):
+        self.parseData(section_num=snum)
+        # Same tree building as in exportXMLSection(), but with dicts
+        root = None
+        parent_nodes = []
+        for obj in section.objects:
+            scopeInfo = obj.getScopeInfo()
+            if root is None:
+                node = obj.exportDict()
+                root = node
+                parent_nodes.append(root)
+            elif scopeInfo == LVheap.NODE_SCOPE.TagClose:
+                parent_nodes.pop()
+                continue
+            else:
+                node = obj.exportDict()
+                parent_nodes[-1].setdefault('childs', []).append(node)
+            if scopeInfo == LVheap.NODE_SCOPE.TagOpen:
+                node.setdefault('childs', [])
+                parent_nodes.append(node)
+        return { 'format': "inline", 'root': root }
+
+    def initWithBinSection(self, section, records):
+        if len(records) == 1 and records[0][0] == LVbinmodel.RECORD_TYPE.SectionData:
+            Block.initWithBinSection(self, section, records)
+            return
+        # Entries are joined into heap content; HeapNodes are created when the data is parsed
+        for rec_type, body in records:
+            if rec_type != LVbinmodel.RECORD_TYPE.HeapNode:
+                raise AttributeError("Block {} section {:d} contains unexpected record type {:d}"\
+                  .format(self.ident,section.start.section_idx,rec_type))
+        data_buf = b''.join([body for rec_type, body in records])
+        data_buf = int(len(data_buf)).to_bytes(4, byteorder='big') + data_buf
+        Block.initWithBinSection(self, section, [(LVbinmodel.RECORD_TYPE.SectionData, data_buf,)])
+
+    def exportBinSection(self, writer, snum, section):
+        self.parseData(section_num=snum)
+        # Only modified nodes are re-created, like in updateSectionData()
+        for obj in section.objects:
+            if obj.needUpdateData():
+                obj.updateData()
+            writer.writeRecord(LVbinmodel.RECORD_TYPE.HeapNode, obj.raw_data)
 
     def getData(self, section_num=None, use_coding=BLOCK_CODING.ZLIB):
         bldata = super().getData(section_num=section_num, use_coding=use_coding)
@@ -3849,6 +4312,66 @@ class UCRF(Block):
     def setData(self, data_buf, section_num=None, use_coding=BLOCK_CODING.NONE):
         super().setData(data_buf, section_num=section_num, use_coding=use_coding)
 
+    def initWithFiles(self, member_fnames):
+        """ Prepares the block to store given files, without reading their content
+
+        Each file becomes a section named after the file; the content is copied
+        directly to output by saveRSRCDataFromFiles().
+        """
+        self.ident = b'UCRF'
+        self.header = BlockHeader(self.po)
+        self.header.ident = (c_ubyte * 4).from_buffer_copy(self.ident)
+        self.sections = {}
+        self.member_fnames = {}
+        for snum, fname in enumerate(member_fnames):
+            section = self.newSection()
+            section.start.section_idx = snum
+            section.start.int5 = 0
+            section.name_text = os.path.basename(fname).encode(self.vi.textEncoding)
+            self.sections[snum] = section
+            self.member_fnames[snum] = fname
+        self.active_section_num = self.defaultSectionNumber() if len(self.sections) > 0 else None
+
+    def saveRSRCDataFromFiles(self, fh, section_names, chunk_size=64*1024):
+        """ Save content of member files as sections data to the RSRC file
+
+        Works like saveRSRCData(), but content of each section is copied from its
+        file in chunks, through one buffer; so memory use does not depend on sizes
+        of the files.
+        """
+        rsrc_head = self.vi.rsrc_headers[-1]
+        chunk_buf = bytearray(chunk_size)
+        chunk_view = memoryview(chunk_buf)
+        sect_starts = []
+        for snum, section in self.sections.items():
+            fname = self.member_fnames[snum]
+            if (self.po.verbose > 1):
+                print("{}: Writing block {} section {} from '{}'".format(self.vi.src_fname,self.ident,snum,fname))
+            section.start.data_offset = fh.tell() - rsrc_head.rsrc_data_offset
+            section.start.name_offset = len(section_names)
+            section_names.extend( preparePStr(section.name_text, 1, self.po) )
+            if not section.start.checkSanity():
+                raise IOError("BlockSectionStart data sanity check failed in block {} section {}".format(self.ident,snum))
+
+            with open(fname, "rb") as member_fh:
+                blksect = BlockSectionData(self.po)
+                blksect.size = os.fstat(member_fh.fileno()).st_size
+                fh.write((c_ubyte * sizeof(blksect)).from_buffer_copy(blksect))
+                data_pos = fh.tell()
+                while True:
+                    chunk_len = member_fh.readinto(chunk_buf)
+                    if chunk_len < 1:
+                        break
+                    fh.write(chunk_view[:chunk_len])
+            if fh.tell() - data_pos != blksect.size:
+                raise IOError("Block {} section {} file '{}' changed size while being copied"\
+                  .format(self.ident,snum,fname))
+            if blksect.size % 4 > 0:
+                padding_len = 4 - (blksect.size % 4)
+                fh.write((b'\0' * padding_len))
+            sect_starts.append(section.start)
+        return sect_starts
+
     def exportXMLSection(self, section_elem, snum, section, fname_base):
         fext = "rsrc"
         if self.po.keep_names:
@@ -3862,13 +4385,12 @@ class UCRF(Block):
                 fext = fext_try
         block_fname = "{:s}.{:s}".format(fname_base,fext)
         bldata = self.getData(section_num=snum)
-        with open(block_fname, "wb") as block_fd:
-            if (self.po.verbose > 1):
-                print("{}: Writing block {} section {} to '{}'".format(self.vi.src_fname,self.ident,snum,block_fname))
-            block_fd.write(bldata.read())
+        if (self.po.verbose > 1):
+            print("{}: Writing block {} section {} to '{}'".format(self.vi.src_fname,self.ident,snum,block_fname))
+        stored_fname = LVstore.writeExportFile(self.vi, self.po, block_fname, bldata.read())
 
         section_elem.set("Format", "bin")
-        section_elem.set("File", os.path.basename(block_fname))
+        section_elem.set("File", stored_fname)
 
     def exportFilesBase(self, snum, section):
         block_fpath = os.path.dirname(self.po.xml)
@@ -3928,6 +4450,8 @@ class VCTP(CompleteBlock):
         section = super().createSection()
         section.content = []
         section.topLevel = []
+        # TDs which were not in process-wide cache, and should be added after parsing
+        section.uncached = []
         return section
 
     def setDefaultEncoding(self):
@@ -3945,15 +4469,23 @@ class VCTP(CompleteBlock):
             eprint("{:s}: Warning: TypeDesc {:d} type 0x{:02x} data size {:d} too small to be valid"\
               .format(self.vi.src_fname, len(section.content), obj_type, obj_len))
             obj_type = TD_FULL_TYPE.Void
-        obj = newTDObject(self.vi, len(section.content), obj_flags, obj_type, self.po)
-
-        clientTD = SimpleNamespace()
+        obj = None
+        if typeDescCache.isEnabled():
+            bldata.seek(pos)
+            cache_key = typeDescCache.makeKey(self.vi, bldata.read(obj_len))
+            obj = typeDescCache.get(self.vi, len(section.content), cache_key, self.po)
+        if obj is None:
+            obj = newTDObject(self.vi, len(section.content), obj_flags, obj_type, self.po)
+            bldata.seek(pos)
+            obj.initWithRSRC(bldata, obj_len) # No need to set topTypeList within VCTP
+            if typeDescCache.isEnabled():
+                section.uncached.append( (cache_key, obj,) )
+
+        clientTD = TDClient()
         clientTD.index = -1 # Nested clients have index -1
         clientTD.flags = 0 # Only Type Mapped entries have it non-zero
         clientTD.nested = obj
         section.content.append(clientTD)
-        bldata.seek(pos)
-        obj.initWithRSRC(bldata, obj_len) # No need to set topTypeList within VCTP
         return obj.index, obj_len
 
     def parseRSRCSectionData(self, section_num, bldata):
@@ -3977,6 +4509,46 @@ class VCTP(CompleteBlock):
         exp_whole_len = None
         return exp_whole_len
 
+    def diffSectionData(self, other, section_num):
+        """ Compares Type Descriptors of given section with the same section of other block
+        """
+        self.parseData(section_num=section_num)
+        other.parseData(section_num=section_num)
+        section = self.sections[section_num]
+        other_section = other.sections[section_num]
+
+        def tdKey(clientTD):
+            td = clientTD.nested
+            if td.raw_data is None or td.parsed_data_updated:
+                td.updateData()
+            return bytes(td.raw_data)
+
+        def tdText(td):
+            text = enumOrIntToName(td.fullType())
+            if td.label is not None:
+                text += " \"{}\"".format(td.label.decode(self.vi.textEncoding))
+            return text
+
+        def describe(clientTD):
+            return ("TypeDesc {:d}".format(clientTD.nested.index), tdText(clientTD.nested),)
+
+        def describeChange(clientTD_a, clientTD_b):
+            td_a, td_b = clientTD_a.nested, clientTD_b.nested
+            if td_a.index != td_b.index:
+                return None
+            item = "TypeDesc {:d}".format(td_a.index)
+            text_a, text_b = tdText(td_a), tdText(td_b)
+            if text_a == text_b:
+                item += " data at 0x{:x}".format(LVdiff.firstDifference(tdKey(clientTD_a), tdKey(clientTD_b)))
+            return (item, text_a, text_b,)
+
+        diffs = LVdiff.diffSequences(self.ident, section_num, section.content, other_section.content, \
+          tdKey, describe, describeChange)
+        if section.topLevel != other_section.topLevel:
+            diffs.append(LVdiff.DiffEntry('~', self.ident, section_num, "TopLevel", \
+              section.topLevel, other_section.topLevel))
+        return diffs
+
     def initWithXMLSectionData(self, section, section_elem):
         section.content = []
         section.topLevel = []
@@ -3988,7 +4560,7 @@ class VCTP(CompleteBlock):
                 obj_type = valFromEnumOrIntString(TD_FULL_TYPE, subelem.get("Type"))
                 obj_flags = importXMLBitfields(TYPEDESC_FLAGS, subelem)
                 obj = newTDObject(self.vi, obj_idx, obj_flags, obj_type, self.po)
-                clientTD = SimpleNamespace()
+                clientTD = TDClient()
                 clientTD.index = -1 # Nested clients have index -1
                 clientTD.flags = 0 # Only Type Mapped entries have it non-zero
                 clientTD.nested = obj
@@ -4036,6 +4608,42 @@ class VCTP(CompleteBlock):
             data_buf += int(val).to_bytes(2, byteorder='big')
         return data_buf
 
+    def prepareBinSectionRecords(self, section_num):
+        section = self.sections[section_num]
+        records = []
+        for clientTD in section.content:
+            td = clientTD.nested
+            # Unmodified TDs keep bytes read from RSRC, with header included
+            if td.raw_data is None or td.parsed_data_updated:
+                td.updateData()
+            records.append( (LVbinmodel.RECORD_TYPE.TypeDesc, td.raw_data,) )
+        data_buf = int(len(section.topLevel)).to_bytes(2, byteorder='big')
+        for val in section.topLevel:
+            data_buf += int(val).to_bytes(2, byteorder='big')
+        records.append( (LVbinmodel.RECORD_TYPE.TopLevel, data_buf,) )
+        return records
+
+    def exportBinSection(self, writer, snum, section):
+        self.exportBinSectionRecords(writer, snum, section)
+
+    def initWithBinSection(self, section, records):
+        if len(records) == 1 and records[0][0] == LVbinmodel.RECORD_TYPE.SectionData:
+            super().initWithBinSection(section, records)
+            return
+        # Join the records into section data, in the form prepareRSRCData() creates
+        type_descs = []
+        top_level = b''
+        for rec_type, body in records:
+            if rec_type == LVbinmodel.RECORD_TYPE.TypeDesc:
+                type_descs.append(body)
+            elif rec_type == LVbinmodel.RECORD_TYPE.TopLevel:
+                top_level = body
+            else:
+                raise AttributeError("Block {} section {:d} contains unexpected record type {:d}"\
+                  .format(self.ident,section.start.section_idx,rec_type))
+        data_buf = len(type_descs).to_bytes(4, byteorder='big') + b''.join(type_descs) + top_level
+        super().initWithBinSection(section, [(LVbinmodel.RECORD_TYPE.SectionData, data_buf,)])
+
     def exportXMLSectionData(self, section_elem, section_num, section, fname_base):
         for clientTD in section.content:
             if len(clientTD.nested.full_name) > 0:
@@ -4067,6 +4675,13 @@ class VCTP(CompleteBlock):
             subelem.set("FlatTypeID", "{:d}".format(val))
         pass
 
+    def exportDictSection(self, snum, section, fname_base):
+        self.parseData(section_num=snum)
+        if section.parse_failed:
+            return Block.exportDictSection(self, snum, section, fname_base)
+        return { 'format': "inline", 'content': [clientTD.nested.exportDict() for clientTD in section.content], \
+          'topLevel': list(section.topLevel) }
+
     def parseData(self, section_num=None):
         if section_num is None:
             section_num = self.active_section_num
@@ -4076,6 +4691,10 @@ class VCTP(CompleteBlock):
         Block.parseData(self, section_num=section_num)
         for clientTD in section.content:
             clientTD.nested.parseData()
+        # Share the newly parsed TDs with other VIs
+        for cache_key, obj in section.uncached:
+            typeDescCache.put(cache_key, obj)
+        section.uncached = []
 
     def checkSanity(self, section_num=None):
         if section_num is None:
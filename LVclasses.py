@@ -81,6 +81,16 @@ class LVObject:
         ret = True
         return ret
 
+    def exportDict(self):
+        """ Returns properties of the object as dict of plain values
+        """
+        d = { 'class': type(self).__name__ }
+        for name, val in self.__dict__.items():
+            if name in ('vi', 'po',):
+                continue
+            d[name] = exportDictValue(val)
+        return d
+
     def __repr__(self):
         d = self.__dict__.copy()
         del d['vi']
@@ -263,15 +273,20 @@ class LVVariant(LVObject):
             eprint("{:s}: Warning: {:s} {:d} sub-object {:d} type 0x{:02x} data size {:d} too small to be valid"\
               .format(self.vi.src_fname, type(self).__name__, self.index, len(self.clients2), obj_type, obj_len))
             obj_type = LVdatatype.TD_FULL_TYPE.Void
-        obj = LVdatatype.newTDObject(self.vi, -1, obj_flags, obj_type, self.po)
-        clientTD = SimpleNamespace()
+        bldata.seek(pos)
+        # Identical TD might have already been parsed; if so, share it
+        obj = self.vi.typeDescPool.lookup(bldata.read(obj_len))
+        if obj is None:
+            obj = LVdatatype.newTDObject(self.vi, -1, obj_flags, obj_type, self.po)
+            bldata.seek(pos)
+            obj.setOwningList(self.clients2)
+            obj.initWithRSRC(bldata, obj_len)
+            obj = self.vi.typeDescPool.intern(obj)
+        clientTD = LVdatatype.TDClient()
         clientTD.index = -1 # Nested clients have index -1
         clientTD.flags = 0 # Only Type Mapped entries have it non-zero
         clientTD.nested = obj
         self.clients2.append(clientTD)
-        bldata.seek(pos)
-        obj.setOwningList(self.clients2)
-        obj.initWithRSRC(bldata, obj_len)
         return obj.index, obj_len
 
     def parseRSRCAttribs(self, bldata):
@@ -286,7 +301,7 @@ class LVVariant(LVObject):
             attrib.index = -1
             attrib.name = bldata.read(text_len)
             # And now - inception. LVVariant has attributes of type LVVariant. Hopefully won't loop forever.
-            attrib.nested = LVdatatype.newTDObject(self.vi, -1, 0, LVdatatype.TD_FULL_TYPE.LVVariant, self.po)
+            attrib.nested = self.vi.typeDescPool.typeOnlyTD(self.vi, LVdatatype.TD_FULL_TYPE.LVVariant, self.po)
             # Note that we won't parse the type itself, it is generic and not stored with the attributes; just use it to make data
             # We have type of the attribute, now read the value
             attrib.value = LVdatafill.newDataFillObjectWithTD(self.vi, attrib.index, attrib.flags, attrib.nested, self.po)
@@ -385,6 +400,8 @@ class LVVariant(LVObject):
             for clientTD in self.clients2:
                 if clientTD.index != -1:
                     continue
+                if not avoid_recompute:
+                    LVdatatype.writableTDClient(clientTD) # Recomputing replaces raw data of the TD
                 clientTD.nested.updateData(avoid_recompute=avoid_recompute)
                 data_buf += clientTD.nested.raw_data
             hasvaritem2 = self.hasvaritem2
@@ -473,7 +490,7 @@ class LVVariant(LVObject):
                 obj_flags = importXMLBitfields(LVdatatype.TYPEDESC_FLAGS, subelem)
                 obj = LVdatatype.newTDObject(self.vi, obj_idx, obj_flags, obj_type, self.po)
                 # Grow the list if needed (the connectors may be in wrong order)
-                clientTD = SimpleNamespace()
+                clientTD = LVdatatype.TDClient()
                 clientTD.flags = 0
                 clientTD.index = -1
                 clientTD.nested = obj
@@ -488,7 +505,7 @@ class LVVariant(LVObject):
                     attrib.index = -1
                     name_str = attr_elem.get("Name")
                     attrib.name = name_str.encode(encoding=self.vi.textEncoding)
-                    attrib.nested = LVdatatype.newTDObject(self.vi, -1, 0, LVdatatype.TD_FULL_TYPE.LVVariant, self.po)
+                    attrib.nested = self.vi.typeDescPool.typeOnlyTD(self.vi, LVdatatype.TD_FULL_TYPE.LVVariant, self.po)
                     attrib.value = LVdatafill.newDataFillObjectWithTD(self.vi, attrib.index, attrib.flags, attrib.nested, self.po)
                     attrib.value.initWithXML(attr_elem)
                     if (self.po.verbose > 2):
@@ -15,7 +15,7 @@ import enum
 import struct
 
 from hashlib import md5
-from io import BytesIO
+from io import BytesIO, SEEK_CUR
 from types import SimpleNamespace
 from ctypes import *
 
@@ -27,6 +27,8 @@ import LVdatatyperef
 
 
 class DataFill:
+    __slots__ = ('vi', 'po', 'tdType', 'tdSubType', 'index', 'tm_flags', 'td', 'value', 'skip_fills',)
+
     def __init__(self, vi, tdType, tdSubType, po):
         """ Creates new DataFill object, capable of handling generic data.
         """
@@ -38,6 +40,8 @@ class DataFill:
         self.tm_flags = None
         self.td = None
         self.value = None
+        # Data Fills for clients of the TD, used only for skipping data
+        self.skip_fills = None
 
     def isRefnumTag(self, td):
         """ Returns if given refnum td is a tag type.
@@ -86,6 +90,14 @@ class DataFill:
         typeName = enumOrIntToName(self.tdType)
         return { 'type': typeName, 'value': self.value }
 
+    def exportDict(self):
+        """ Returns the Data Fill as dict of plain values, with nested fills converted
+        """
+        d = exportDictValue(self.prepareDict())
+        if self.index >= 0:
+            d['index'] = self.index
+        return d
+
     def __repr__(self):
         d = self.prepareDict()
         from pprint import pformat
@@ -109,6 +121,40 @@ class DataFill:
               .format(self.vi.src_fname,str(self),bldata.tell()))
         pass
 
+    def getFixedRSRCSize(self):
+        """ Returns size of the Data Fill within RSRC, if it does not depend on the value
+
+        Returns None if the size can only be known by reading the data.
+        To be overloaded in classes for specific Data Fill types.
+        """
+        return None
+
+    def prepareSkipFills(self):
+        """ Returns Data Fills for clients of the TD, to be used for skipping their data
+        """
+        if self.skip_fills is None:
+            self.skip_fills = []
+            for cli_idx, td_idx, sub_td, td_flags in self.td.clientsEnumerate():
+                sub_df = newDataFillObjectWithTD(self.vi, td_idx, self.tm_flags, sub_td, self.po)
+                self.skip_fills.append(sub_df)
+        return self.skip_fills
+
+    def skipRSRCData(self, bldata):
+        """ Moves the stream past data of this Data Fill, without storing the value
+
+        Only the TD needs to be set before the call; properties of this object are
+        not changed, so one object can be used to skip many values of the same type.
+        Classes for specific Data Fill types overload this to avoid creating objects;
+        the generic version parses the value into a temporary Data Fill.
+        """
+        size = self.getFixedRSRCSize()
+        if size is not None:
+            bldata.seek(size, SEEK_CUR)
+            return
+        df = type(self)(self.vi, self.tdType, self.tdSubType, self.po)
+        df.setTD(self.td, self.index, self.tm_flags)
+        df.initWithRSRCParse(bldata)
+
     def prepareRSRCData(self, avoid_recompute=False):
         """ Returns part of the Data Fill re-created from properties.
 
@@ -139,9 +185,14 @@ class DataFill:
 
 
 class DataFillVoid(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         self.value = None
 
+    def getFixedRSRCSize(self):
+        return 0
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         return data_buf
@@ -154,6 +205,8 @@ class DataFillVoid(DataFill):
 
 
 class DataFillInt(DataFill):
+    __slots__ = ('base', 'size', 'signed',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.base = 10
@@ -198,6 +251,9 @@ class DataFillInt(DataFill):
     def initWithRSRCParse(self, bldata):
         self.value = int.from_bytes(bldata.read(self.size), byteorder='big', signed=self.signed)
 
+    def getFixedRSRCSize(self):
+        return self.size
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = int(self.value).to_bytes(self.size, byteorder='big', signed=self.signed)
         return data_buf
@@ -210,6 +266,8 @@ class DataFillInt(DataFill):
 
 
 class DataFillFloat(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         from LVdatatype import TD_FULL_TYPE
         if self.tdType in (TD_FULL_TYPE.NumFloat32,TD_FULL_TYPE.UnitFloat32,):
@@ -222,6 +280,16 @@ class DataFillFloat(DataFill):
             raise RuntimeError("Class {} used for unexpected type {}"\
               .format(type(self).__name__, self.getXMLTagName()))
 
+    def getFixedRSRCSize(self):
+        from LVdatatype import TD_FULL_TYPE
+        if self.tdType in (TD_FULL_TYPE.NumFloat32,TD_FULL_TYPE.UnitFloat32,):
+            return 4
+        elif self.tdType in (TD_FULL_TYPE.NumFloat64,TD_FULL_TYPE.UnitFloat64,):
+            return 8
+        elif self.tdType in (TD_FULL_TYPE.NumFloatExt,TD_FULL_TYPE.UnitFloatExt,):
+            return 16
+        return None
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         from LVdatatype import TD_FULL_TYPE
@@ -247,6 +315,8 @@ class DataFillFloat(DataFill):
 
 
 class DataFillComplex(DataFill):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = (None,None,)
@@ -263,6 +333,16 @@ class DataFillComplex(DataFill):
             raise RuntimeError("Class {} used for unexpected type {}"\
               .format(type(self).__name__, self.getXMLTagName()))
 
+    def getFixedRSRCSize(self):
+        from LVdatatype import TD_FULL_TYPE
+        if self.tdType in (TD_FULL_TYPE.NumComplex64,TD_FULL_TYPE.UnitComplex64,):
+            return 8
+        elif self.tdType in (TD_FULL_TYPE.NumComplex128,TD_FULL_TYPE.UnitComplex128,):
+            return 16
+        elif self.tdType in (TD_FULL_TYPE.NumComplexExt,TD_FULL_TYPE.UnitComplexExt,):
+            return 32
+        return None
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         from LVdatatype import TD_FULL_TYPE
@@ -293,6 +373,8 @@ class DataFillComplex(DataFill):
 
 
 class DataFillBool(DataFill):
+    __slots__ = ('size',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.size = None
@@ -318,6 +400,10 @@ class DataFillBool(DataFill):
         self.initVersion()
         self.value = int.from_bytes(bldata.read(self.size), byteorder='big', signed=False)
 
+    def getFixedRSRCSize(self):
+        self.initVersion()
+        return self.size
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += int(self.value).to_bytes(self.size, byteorder='big', signed=False)
@@ -335,12 +421,18 @@ class DataFillBool(DataFill):
 
 
 class DataFillString(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         strlen = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
         #if self.td.prop1 != 0xffffffff: # in such case part of the value might be irrelevant, as only
         # part to the size (self.td.prop1 & 0x7fffffff) is used; but the length stored is still valid
         self.value = bldata.read(strlen)
 
+    def skipRSRCData(self, bldata):
+        strlen = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
+        bldata.seek(strlen, SEEK_CUR)
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += len(self.value).to_bytes(4, byteorder='big', signed=False)
@@ -361,6 +453,8 @@ class DataFillString(DataFill):
 
 
 class DataFillPath(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         startPos = bldata.tell()
         clsident = bldata.read(4)
@@ -401,10 +495,15 @@ class DataFillPath(DataFill):
 
 
 class DataFillCString(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         # No idea why sonething which looks like string type stores 32-bit value instead
         self.value = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
 
+    def getFixedRSRCSize(self):
+        return 4
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += int(self.value).to_bytes(4, byteorder='big', signed=False)
@@ -420,6 +519,8 @@ class DataFillCString(DataFill):
 
 
 class DataFillArray(DataFill):
+    __slots__ = ('dimensions',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = []
@@ -470,6 +571,24 @@ class DataFillArray(DataFill):
                 raise RuntimeError("Data type {}: {}".format(enumOrIntToName(sub_td.fullType()), str(e)))
         pass
 
+    def skipRSRCData(self, bldata):
+        totItems = 1
+        for dim in self.td.dimensions:
+            totItems *= int.from_bytes(bldata.read(4), byteorder='big', signed=False) & 0x7fffffff
+        if len(self.td.clients) < 1:
+            raise RuntimeError("TD {} used for DataFill before being initialized".format(enumOrIntToName(self.td.fullType())))
+        if totItems > self.po.array_data_limit:
+                raise RuntimeError("Data type {} claims to contain {} fields, expected below {}"\
+                  .format(self.getXMLTagName(), totItems, self.po.array_data_limit))
+        # We expect exactly one client within Array
+        sub_df = self.prepareSkipFills()[-1]
+        size = sub_df.getFixedRSRCSize()
+        if size is not None:
+            bldata.seek(totItems * size, SEEK_CUR)
+            return
+        for i in range(totItems):
+            sub_df.skipRSRCData(bldata)
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         for dim in self.dimensions:
@@ -507,9 +626,14 @@ class DataFillArray(DataFill):
 
 
 class DataFillArrayDataPtr(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         self.value = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
 
+    def getFixedRSRCSize(self):
+        return 4
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += int(self.value).to_bytes(4, byteorder='big', signed=False)
@@ -525,6 +649,8 @@ class DataFillArrayDataPtr(DataFill):
 
 
 class DataFillCluster(DataFill):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = []
@@ -548,6 +674,19 @@ class DataFillCluster(DataFill):
                 raise RuntimeError("Data type {}: {}".format(enumOrIntToName(sub_td.fullType()), str(e)))
         pass
 
+    def getFixedRSRCSize(self):
+        size = 0
+        for sub_df in self.prepareSkipFills():
+            sub_size = sub_df.getFixedRSRCSize()
+            if sub_size is None:
+                return None
+            size += sub_size
+        return size
+
+    def skipRSRCData(self, bldata):
+        for sub_df in self.prepareSkipFills():
+            sub_df.skipRSRCData(bldata)
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         for sub_df in self.value:
@@ -575,6 +714,8 @@ class DataFillCluster(DataFill):
 
 
 class DataFillLVVariant(DataFill):
+    __slots__ = ('useConsolidatedTypes',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.useConsolidatedTypes = True
@@ -611,6 +752,8 @@ class DataFillLVVariant(DataFill):
 
 
 class DataFillMeasureData(DataFill):
+    __slots__ = ('containedTd',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.containedTd = None
@@ -740,6 +883,8 @@ class DataFillMeasureData(DataFill):
 
 
 class DataFillComplexFixedPt(DataFill):
+    __slots__ = ('vflags',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = 2 * [None]
@@ -760,6 +905,9 @@ class DataFillComplexFixedPt(DataFill):
                 self.vflags[i] = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
         pass
 
+    def getFixedRSRCSize(self):
+        return 2 * (9 if self.td.allocOv else 8)
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         for i in range(2):
@@ -793,6 +941,8 @@ class DataFillComplexFixedPt(DataFill):
 
 
 class DataFillFixedPoint(DataFill):
+    __slots__ = ('vflags',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.vflags = None
@@ -804,6 +954,9 @@ class DataFillFixedPoint(DataFill):
         else:
             self.vflags = None
 
+    def getFixedRSRCSize(self):
+        return 9 if self.td.allocOv else 8
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += int(self.value).to_bytes(8, byteorder='big', signed=False)
@@ -828,9 +981,14 @@ class DataFillFixedPoint(DataFill):
 
 
 class DataFillBlock(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         self.value = bldata.read(self.td.blkSize)
 
+    def getFixedRSRCSize(self):
+        return self.td.blkSize
+
     def prepareRSRCData(self, avoid_recompute=False):
         if len(self.value) != self.td.blkSize:
             eprint("{:s}: Length of value ({}) is different than expected block size ({})"\
@@ -854,6 +1012,8 @@ class DataFillBlock(DataFill):
 
 
 class DataFillRepeatedBlock(DataFill):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = []
@@ -886,6 +1046,25 @@ class DataFillRepeatedBlock(DataFill):
                 raise RuntimeError("Data type {}: {}".format(enumOrIntToName(sub_td.fullType()), str(e)))
         pass
 
+    def getFixedRSRCSize(self):
+        # We expect exactly one client within RepeatedBlock
+        sub_size = self.prepareSkipFills()[-1].getFixedRSRCSize()
+        if sub_size is None:
+            return None
+        return self.td.numRepeats * sub_size
+
+    def skipRSRCData(self, bldata):
+        if self.td.numRepeats > self.po.array_data_limit:
+            raise RuntimeError("Data type {} claims to contain {} fields, expected below {}"\
+              .format(self.getXMLTagName(), self.td.numRepeats, self.po.array_data_limit))
+        sub_df = self.prepareSkipFills()[-1]
+        size = sub_df.getFixedRSRCSize()
+        if size is not None:
+            bldata.seek(self.td.numRepeats * size, SEEK_CUR)
+            return
+        for i in range(self.td.numRepeats):
+            sub_df.skipRSRCData(bldata)
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         for sub_df in self.value:
@@ -917,6 +1096,8 @@ class DataFillSimpleRefnum(DataFill):
 
     Used for "normal" ref types, which only contain 4 byte value.
     """
+    __slots__ = ()
+
     def prepareDict(self):
         refName = enumOrIntToName(self.tdSubType)
         d = super().prepareDict()
@@ -927,6 +1108,9 @@ class DataFillSimpleRefnum(DataFill):
         # The format seem to be different for LV6.0.0 and older, but still 4 bytes
         self.value = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
 
+    def getFixedRSRCSize(self):
+        return 4
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += int(self.value).to_bytes(4, byteorder='big', signed=False)
@@ -946,6 +1130,8 @@ class DataFillIORefnum(DataFill):
 
     Used for ref types which represent IORefnum.
     """
+    __slots__ = ()
+
     def prepareDict(self):
         refName = enumOrIntToName(self.tdSubType)
         d = super().prepareDict()
@@ -1006,6 +1192,8 @@ class DataFillUDRefnum(DataFill):
 
     Used for ref types which represent Non-tag subtypes of UDRefnum.
     """
+    __slots__ = ()
+
     def prepareDict(self):
         refName = enumOrIntToName(self.tdSubType)
         d = super().prepareDict()
@@ -1034,6 +1222,8 @@ class DataFillUDTagRefnum(DataFill):
 
     Used for ref types which represent Tag subtypes of UDRefnum.
     """
+    __slots__ = ('usrdef1', 'usrdef2', 'usrdef3', 'usrdef4',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.usrdef1 = None
@@ -1125,6 +1315,8 @@ class DataFillUDTagRefnum(DataFill):
 class DataFillUDClassInst(DataFill):
     """ Data Fill for UDClassInst Refnum types.
     """
+    __slots__ = ('libName',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = []
@@ -1189,6 +1381,8 @@ class DataFillUDClassInst(DataFill):
 
 
 class DataFillPtr(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         ver = self.vi.getFileVersion()
         if isSmallerVersion(ver, 8,6,0,1):
@@ -1196,6 +1390,12 @@ class DataFillPtr(DataFill):
         else:
             self.value = None
 
+    def getFixedRSRCSize(self):
+        ver = self.vi.getFileVersion()
+        if isSmallerVersion(ver, 8,6,0,1):
+            return 4
+        return 0
+
     def prepareRSRCData(self, avoid_recompute=False):
         ver = self.vi.getFileVersion()
         data_buf = b''
@@ -1216,9 +1416,14 @@ class DataFillPtr(DataFill):
 
 
 class DataFillPtrTo(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         self.value = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
 
+    def getFixedRSRCSize(self):
+        return 4
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         data_buf += int(self.value).to_bytes(4, byteorder='big', signed=False)
@@ -1234,6 +1439,8 @@ class DataFillPtrTo(DataFill):
 
 
 class DataFillExtData(DataFill):
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         self.value = None # TODO implement reading ExtData
         raise NotImplementedError("ExtData default value read is not implemented")
@@ -1247,6 +1454,8 @@ class DataFillUnexpected(DataFill):
 
     Types which reference this class would cause silently ignored error in LV14.
     """
+    __slots__ = ()
+
     def initWithRSRCParse(self, bldata):
         self.value = None
         eprint("{:s}: Warning: Data fill asks to read default value of {} type, this should never happen."\
@@ -1267,6 +1476,8 @@ class DataFillUnexpected(DataFill):
 
 
 class DataFillTypeDef(DataFill):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = []
@@ -1293,6 +1504,19 @@ class DataFillTypeDef(DataFill):
                 raise RuntimeError("Data type {}: {}".format(enumOrIntToName(client.nested.fullType()), str(e)))
         pass
 
+    def getFixedRSRCSize(self):
+        size = 0
+        for sub_df in self.prepareSkipFills():
+            sub_size = sub_df.getFixedRSRCSize()
+            if sub_size is None:
+                return None
+            size += sub_size
+        return size
+
+    def skipRSRCData(self, bldata):
+        for sub_df in self.prepareSkipFills():
+            sub_df.skipRSRCData(bldata)
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         for sub_df in self.value:
@@ -1320,6 +1544,8 @@ class DataFillTypeDef(DataFill):
 
 
 class SpecialDSTMCluster(DataFillCluster):
+    __slots__ = ()
+
     def getXMLTagName(self):
         return "SpecialDSTMCluster"
 
@@ -1358,6 +1584,20 @@ class SpecialDSTMCluster(DataFillCluster):
             pass
         pass
 
+    def prepareSkipFills(self):
+        if self.skip_fills is None:
+            self.skip_fills = []
+            skipNextEntry = ((self.tm_flags & 0x0200) != 0)
+            for cli_idx, td_idx, sub_td, td_flags in self.td.clientsEnumerate():
+                if not self.isSpecialDSTMClusterElement(cli_idx, self.tm_flags):
+                    continue
+                if skipNextEntry:
+                    skipNextEntry = False
+                    continue
+                sub_df = newDataFillObjectWithTD(self.vi, td_idx, self.tm_flags, sub_td, self.po)
+                self.skip_fills.append(sub_df)
+        return self.skip_fills
+
     def prepareRSRCData(self, avoid_recompute=False):
         data_buf = b''
         for sub_df in self.value:
@@ -12,18 +12,24 @@
 # For a copy, see <https://opensource.org/licenses/MIT>.
 
 
+import os
 import enum
+import copy
+import hmac
+import pickle
 import struct
 
-from hashlib import md5
+from hashlib import md5, sha1, sha256
 from io import BytesIO
+from collections import OrderedDict
 from types import SimpleNamespace
 from ctypes import *
 
 from LVmisc import *
 from LVblock import *
-import LVclasses
-import LVheap
+import LVstore
+LVclasses = lazyImport('LVclasses')
+LVheap = lazyImport('LVheap')
 import LVdatatyperef
 from LVdatatyperef import REFNUM_TYPE
 
@@ -197,7 +203,7 @@ class NUMBER_UNIT(enum.IntEnum):
     Invalid =	9
 
 
-class LV_INTERNAL_TD_NAMES(LVheap.ENUM_TAGS):
+class LV_INTERNAL_TD_NAMES(ENUM_TAGS):
     """ Names of types from LV
 
     This maps the names of types this tool uses to names LV uses internally.
@@ -265,7 +271,7 @@ class LV_INTERNAL_TD_NAMES(LVheap.ENUM_TAGS):
     #DAQChannel = TD_FULL_TYPE.Void
 
 
-class LV_INTERNAL_MEAS_FLAVOR_NAMES(LVheap.ENUM_TAGS):
+class LV_INTERNAL_MEAS_FLAVOR_NAMES(ENUM_TAGS):
     """ Names of MeasureData flavors from LV
 
     This maps the names of MeasureData flavors this tool uses to names LV uses
@@ -292,7 +298,20 @@ class LV_INTERNAL_MEAS_FLAVOR_NAMES(LVheap.ENUM_TAGS):
     U64Waveform =	MEASURE_DATA_FLAVOR.UInt64Waveform
 
 
+class TDClient(SlotsRecord):
+    """ Client entry of a Type Descriptor, or entry of TD list
+
+    Either references TD by index, or keeps the TD as nested object.
+    Some TD types store additional fields with each client.
+    """
+    __slots__ = ('index', 'flags', 'nested', 'thrallSources', 'cfield0', 'cfield2', 'cfield4',)
+
+
 class TDObject:
+    # Properties which exportDict() does not include as parsed values
+    EXPORT_DICT_SKIP = ('vi', 'po', 'index', 'oflags', 'otype', 'label', 'label_pos', 'size', \
+      'full_name', 'raw_data', 'raw_data_updated', 'parsed_data_updated', 'shared', \
+      'topTypeList', 'ref_obj',)
 
     def __init__(self, vi, idx, obj_flags, obj_type, po):
         """ Creates new Type Descriptor object, capable of handling generic TD data.
@@ -306,6 +325,8 @@ class TDObject:
         # Dependencies to other types are either indexes in Consolidated List, or locally stored topTypeList
         self.topTypeList = None
         self.label = None
+        # Position of the label within raw_data, if known
+        self.label_pos = None
         self.size = None
 
         if self.__doc__:
@@ -318,8 +339,12 @@ class TDObject:
         self.raw_data_updated = False
         # Whether any properties have been updated and preparation of new RAW data is required
         self.parsed_data_updated = False
+        # Whether the object is interned in TDObjectPool, and possibly used in many places
+        self.shared = False
 
     def setOwningList(self, typeList=None):
+        if self.shared:
+            return # Shared TDs are self-contained, and do not belong to any list
         self.topTypeList = typeList
         for clientTD in self.clients:
             if clientTD.index == -1:
@@ -372,13 +397,7 @@ class TDObject:
             if (self.oflags & TYPEDESC_FLAGS.HasLabel.value) != 0:
                 self.label = b""
 
-            bin_path = os.path.dirname(self.vi.src_fname)
-            if len(bin_path) > 0:
-                bin_fname = bin_path + '/' + conn_elem.get("File")
-            else:
-                bin_fname = conn_elem.get("File")
-            with open(bin_fname, "rb") as bin_fh:
-                data_buf = bin_fh.read()
+            data_buf = LVstore.readImportFile(self.vi, self.po, conn_elem.get("File"))
             data_head = int(len(data_buf)+4).to_bytes(2, byteorder='big')
             data_head += int(self.oflags).to_bytes(1, byteorder='big')
             data_head += int(self.otype).to_bytes(1, byteorder='big')
@@ -418,19 +437,33 @@ class TDObject:
         self.parseRSRCDataFinish(bldata)
 
     @staticmethod
-    def validLabelLength(whole_data, i):
+    def findLabelPosition(whole_data):
+        """ Finds position of Pascal string label at end of given data
+
+        The label may only be followed by one padding byte, and must consist of
+        printable characters. The data should be smaller than 256 bytes, so only
+        positions within last 256 bytes are checked; lowest valid position is returned.
+        Returns tuple of position and label length, or (None, 0) if no label was found.
+        """
+        data_len = len(whole_data)
         # Strip padding at the end
-        #whole_data = whole_data.rstrip(b'\0')
-        ending_zeros = 0
-        if whole_data[-1] == 0:
-            ending_zeros += 1
-        if ending_zeros > 0:
-            whole_data = whole_data[:-ending_zeros]
-        # Check if this position can be a label start
-        label_len = int.from_bytes(whole_data[i:i+1], byteorder='big', signed=False)
-        if (len(whole_data)-i == label_len+1) and all((bt in b'\r\n\t') or (bt >= 32) for bt in whole_data[i+1:]):
-            return label_len
-        return 0
+        end_pos = data_len
+        if data_len > 0 and whole_data[-1] == 0:
+            end_pos -= 1
+        min_pos = max(data_len-256, 0)
+        # Single backward pass, finding where the printable characters at the end start
+        txt_pos = end_pos
+        while txt_pos > min_pos:
+            bt = whole_data[txt_pos-1]
+            if bt < 32 and bt not in (0x0d, 0x0a, 0x09):
+                break
+            txt_pos -= 1
+        # The label length byte can be placed just before the printable part, or within it
+        for i in range(max(txt_pos-1, min_pos), end_pos):
+            label_len = whole_data[i]
+            if label_len > 0 and label_len == end_pos-i-1:
+                return i, label_len
+        return None, 0
 
     def parseRSRCDataFinish(self, bldata):
         """ Does generic part of RSRC Type Descriptor parsing and marks the parse as finished
@@ -443,12 +476,11 @@ class TDObject:
             min_pos = bldata.tell() # We receive the file with pos set at minimal - the label can't start before it
             # The data should be smaller than 256 bytes; but it is still wise to make some restriction on it
             whole_data = bldata.read(1024*1024)
-            # Find a proper position to read the label; try the current position first (if the data after current is not beyond 255)
-            for i in range(max(len(whole_data)-256,0), len(whole_data)):
-                label_len = TDObject.validLabelLength(whole_data, i)
-                if label_len > 0:
-                    self.label = whole_data[i+1:i+label_len+1]
-                    break
+            # Find a proper position to read the label
+            i, label_len = TDObject.findLabelPosition(whole_data)
+            if i is not None:
+                self.label = whole_data[i+1:i+label_len+1]
+                self.label_pos = min_pos + i
             if self.label is None:
                 if (self.po.verbose > 0):
                     eprint("{:s}: Warning: TypeDesc {:d} type 0x{:02x} label text not found"\
@@ -506,15 +538,14 @@ class TDObject:
         else:
             data_buf = b''
 
-        # Remove label from the end - use the algorithm from parseRSRCDataFinish() for consistency
+        # Remove label from the end - use position found by parseRSRCDataFinish(), or the same algorithm
         if (self.oflags & TYPEDESC_FLAGS.HasLabel.value) != 0:
-            whole_data = data_buf
-            # Find a proper position to read the label; try the current position first (if the data after current is not beyond 255)
-            for i in range(max(len(whole_data)-256,0), len(whole_data)):
-                label_len = TDObject.validLabelLength(whole_data, i)
-                if label_len > 0:
+            if self.label_pos is not None:
+                data_buf = data_buf[:self.label_pos-4]
+            else:
+                i, label_len = TDObject.findLabelPosition(data_buf)
+                if i is not None:
                     data_buf = data_buf[:i]
-                    break
         # Done - got the data part only
         return data_buf
 
@@ -550,8 +581,11 @@ class TDObject:
 
         if avoid_recompute and self.raw_data_updated:
             return # If we have strong raw data, and new one will be weak, then leave the strong buffer
+        if avoid_recompute and self.shared:
+            return # Shared TDs are never modified, so their raw data is up to date
 
         data_buf = self.prepareRSRCData(avoid_recompute=avoid_recompute)
+        label_pos = 4 + len(data_buf)
         data_buf += self.prepareRSRCDataFinish()
 
         data_head = int(len(data_buf)+4).to_bytes(2, byteorder='big')
@@ -559,6 +593,8 @@ class TDObject:
         data_head += int(self.otype).to_bytes(1, byteorder='big')
 
         self.setData(data_head+data_buf, incomplete=avoid_recompute)
+        if self.label is not None:
+            self.label_pos = label_pos
 
     def exportXML(self, conn_elem, fname_base):
         self.parseData()
@@ -577,11 +613,10 @@ class TDObject:
                   .format(self.vi.src_fname,self.index,os.path.basename(part_fname)))
             bldata = self.getData()
             bldata.read(4) # The data includes 4-byte header
-            with open(part_fname, "wb") as part_fd:
-                part_fd.write(bldata.read())
+            stored_fname = LVstore.writeExportFile(self.vi, self.po, part_fname, bldata.read())
 
             conn_elem.set("Format", "bin")
-            conn_elem.set("File", os.path.basename(part_fname))
+            conn_elem.set("File", stored_fname)
 
     def exportXMLFinish(self, conn_elem):
         # Now fat chunk of code for handling Type Descriptor label
@@ -602,13 +637,36 @@ class TDObject:
                 conn_elem.set("Label", "{:s}".format(label_text))
         pass
 
+    def exportDict(self):
+        """ Returns properties of the Type Descriptor as dict of plain values
+
+        Besides the common properties, includes everything the specific TD type
+        has parsed. Types which data format isn't known include raw data instead.
+        """
+        self.parseData()
+        d = { 'index': self.index, 'type': stringFromValEnumOrInt(TD_FULL_TYPE, self.otype), \
+          'flags': self.oflags }
+        if self.label is not None:
+            d['label'] = self.label.decode(self.vi.textEncoding)
+        for name, val in self.__dict__.items():
+            if name in TDObject.EXPORT_DICT_SKIP:
+                continue
+            d[name] = exportDictValue(val)
+        if type(self).prepareRSRCData is TDObject.prepareRSRCData:
+            d['data'] = bytes(self.prepareRSRCData())
+        return d
+
     def getData(self):
         bldata = BytesIO(self.raw_data)
         return bldata
 
     def setData(self, data_buf, incomplete=False):
+        if self.shared:
+            raise RuntimeError("Type Descriptor type 0x{:02x} is shared; use writableTDClient() before modifying it"\
+              .format(self.otype))
         self.raw_data = data_buf
         self.size = len(self.raw_data)
+        self.label_pos = None
         if not incomplete:
             self.raw_data_updated = True
 
@@ -628,9 +686,7 @@ class TDObject:
             return TD_MAIN_TYPE(self.otype >> 4)
 
     def fullType(self):
-        if self.otype not in set(item.value for item in TD_FULL_TYPE):
-            return self.otype
-        return TD_FULL_TYPE(self.otype)
+        return enumOrIntFromVal(TD_FULL_TYPE, self.otype)
 
     def isNumber(self):
         return ( \
@@ -652,6 +708,30 @@ class TDObject:
     def hasClients(self):
         return (len(self.clients) > 0)
 
+    def isSelfContained(self):
+        """ Returns whether the Type Descriptor does not reference other TDs by index
+
+        Such TD has the same meaning regardless of list it is placed in.
+        """
+        for clientTD in self.clients:
+            if clientTD.index != -1:
+                return False
+            if not clientTD.nested.isSelfContained():
+                return False
+        return True
+
+    def copy(self):
+        """ Returns private copy of the Type Descriptor
+
+        Objects shared by the whole VI are not copied.
+        """
+        memo = { id(self.vi): self.vi, id(self.po): self.po }
+        if self.topTypeList is not None:
+            memo[id(self.topTypeList)] = self.topTypeList
+        obj = copy.deepcopy(self, memo)
+        obj.shared = False
+        return obj
+
     def clientsEnumerate(self):
         if self.topTypeList is not None:
             typeList = self.topTypeList
@@ -713,6 +793,8 @@ class TDObject:
         del d['parsed_data_updated']
         del d['raw_data_updated']
         del d['raw_data']
+        del d['label_pos']
+        del d['shared']
         if d['topTypeList'] is not None:
             d['topTypeList'] = "PRESENT"
         del d['size']
@@ -1318,7 +1400,7 @@ class TDObjectFunction(TDObject):
 
         count = readVariableSizeFieldU2p2(bldata)
         # Create _separate_ empty namespace for each TypeDesc
-        self.clients = [SimpleNamespace() for _ in range(count)]
+        self.clients = [TDClient() for _ in range(count)]
         for i in range(count):
             cli_idx = readVariableSizeFieldU2p2(bldata)
             self.clients[i].index = cli_idx
@@ -1358,7 +1440,7 @@ class TDObjectFunction(TDObject):
             self.field7 = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
         if (self.fflags & 0x8000) != 0:
             # If the flag is set, then the last sub-type is special - comes from here, not the standard list
-            clientTD = SimpleNamespace()
+            clientTD = TDClient()
             clientTD.index = readVariableSizeFieldU2p2(bldata)
             clientTD.flags = 0
             clientTD.thrallSources = []
@@ -1472,7 +1554,7 @@ class TDObjectFunction(TDObject):
             self.clients = []
             for subelem in conn_elem:
                 if (subelem.tag == "TypeDesc"):
-                    clientTD = SimpleNamespace()
+                    clientTD = TDClient()
                     clientTD.index = int(subelem.get("TypeID"), 0)
                     clientTD.flags = int(subelem.get("Flags"), 0)
                     clientTD.thrallSources = []
@@ -1609,7 +1691,7 @@ class TDObjectTypeDef(TDObject):
         if True:
             cli, cli_len = self.parseRSRCNestedTD(bldata, pos)
             cli_flags = 0
-            clientTD = SimpleNamespace()
+            clientTD = TDClient()
             clientTD.index = cli.index # Nested clients have index -1
             clientTD.flags = cli_flags
             clientTD.nested = cli
@@ -1668,7 +1750,7 @@ class TDObjectTypeDef(TDObject):
         return exp_whole_len
 
     def initWithXMLNestedTD(self, conn_subelem):
-        clientTD = SimpleNamespace()
+        clientTD = TDClient()
         clientTD.index = -1
         clientTD.flags = 0
         obj_type = valFromEnumOrIntString(TD_FULL_TYPE, conn_subelem.get("Type"))
@@ -1782,7 +1864,7 @@ class TDObjectArray(TDObject):
             dim.flags = flags >> 24
             dim.fixedSize = flags & 0x00FFFFFF
 
-        self.clients = [ SimpleNamespace() ]
+        self.clients = [ TDClient() ]
         for clientTD in self.clients:
             cli_idx = readVariableSizeFieldU2p2(bldata)
             cli_flags = 0
@@ -1835,7 +1917,7 @@ class TDObjectArray(TDObject):
                     dim.fixedSize = int(subelem.get("FixedSize"), 0)
                     self.dimensions.append(dim)
                 elif (subelem.tag == "TypeDesc"):
-                    clientTD = SimpleNamespace()
+                    clientTD = TDClient()
                     clientTD.index = int(subelem.get("TypeID"), 0)
                     clientTD.flags = int(subelem.get("Flags"), 0)
                     self.clients.append(clientTD)
@@ -1974,7 +2056,7 @@ class TDObjectAlignedBlock(TDObjectBlock):
         self.clients = []
         self.blkSize = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
         if True:
-            clientTD = SimpleNamespace()
+            clientTD = TDClient()
             clientTD.index = readVariableSizeFieldU2p2(bldata)
             clientTD.flags = 0
             self.clients.append(clientTD)
@@ -2004,7 +2086,7 @@ class TDObjectAlignedBlock(TDObjectBlock):
 
         for subelem in conn_elem:
             if (subelem.tag == "TypeDesc"):
-                clientTD = SimpleNamespace()
+                clientTD = TDClient()
                 clientTD.index = int(subelem.get("TypeID"), 0)
                 clientTD.flags = int(subelem.get("Flags"), 0)
                 self.clients.append(clientTD)
@@ -2065,7 +2147,7 @@ class TDObjectRepeatedBlock(TDObject):
         self.clients = []
         self.numRepeats = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
         if True:
-            clientTD = SimpleNamespace()
+            clientTD = TDClient()
             clientTD.index = readVariableSizeFieldU2p2(bldata)
             clientTD.flags = 0
             self.clients.append(clientTD)
@@ -2099,7 +2181,7 @@ class TDObjectRepeatedBlock(TDObject):
 
         for subelem in conn_elem:
             if (subelem.tag == "TypeDesc"):
-                clientTD = SimpleNamespace()
+                clientTD = TDClient()
                 clientTD.index = int(subelem.get("TypeID"), 0)
                 clientTD.flags = int(subelem.get("Flags"), 0)
                 self.clients.append(clientTD)
@@ -2236,7 +2318,7 @@ class TDObjectRef(TDObject):
             self.items = []
             for subelem in conn_elem:
                 if (subelem.tag == "TypeDesc"):
-                    clientTD = SimpleNamespace()
+                    clientTD = TDClient()
                     clientTD.index = int(subelem.get("TypeID"), 0)
                     clientTD.flags = int(subelem.get("Flags"), 0)
                     if self.ref_obj is not None:
@@ -2331,9 +2413,7 @@ class TDObjectRef(TDObject):
         return ret
 
     def refType(self):
-        if self.reftype not in set(item.value for item in REFNUM_TYPE):
-            return self.reftype
-        return REFNUM_TYPE(self.reftype)
+        return enumOrIntFromVal(REFNUM_TYPE, self.reftype)
 
 
 class TDObjectCluster(TDObject):
@@ -2348,7 +2428,7 @@ class TDObjectCluster(TDObject):
 
         count = readVariableSizeFieldU2p2(bldata)
         # Create _separate_ empty namespace for each TypeDesc
-        self.clients = [SimpleNamespace() for _ in range(count)]
+        self.clients = [TDClient() for _ in range(count)]
         for i in range(count):
             cli_idx = readVariableSizeFieldU2p2(bldata)
             cli_flags = 0
@@ -2386,7 +2466,7 @@ class TDObjectCluster(TDObject):
             self.clients = []
             for subelem in conn_elem:
                 if (subelem.tag == "TypeDesc"):
-                    client = SimpleNamespace()
+                    client = TDClient()
                     client.index = int(subelem.get("TypeID"), 0)
                     client.flags = 0
                     self.clients.append(client)
@@ -2501,9 +2581,7 @@ class TDObjectMeasureData(TDObject):
         return ret
 
     def dtFlavor(self):
-        if self.flavor not in set(item.value for item in MEASURE_DATA_FLAVOR):
-            return self.flavor
-        return MEASURE_DATA_FLAVOR(self.flavor)
+        return enumOrIntFromVal(MEASURE_DATA_FLAVOR, self.flavor)
 
 
 class TDObjectFixedPoint(TDObject):
@@ -2711,7 +2789,7 @@ class TDObjectSingleContainer(TDObject):
 
         self.clients = []
         if True:
-            client = SimpleNamespace()
+            client = TDClient()
             client.index = readVariableSizeFieldU2p2(bldata)
             client.flags = 0
             self.clients.append(client)
@@ -2750,7 +2828,7 @@ class TDObjectSingleContainer(TDObject):
             self.clients = []
             for subelem in conn_elem:
                 if (subelem.tag == "TypeDesc"):
-                    client = SimpleNamespace()
+                    client = TDClient()
                     client.index = int(subelem.get("TypeID"), 0)
                     client.flags = int(subelem.get("Flags"), 0)
                     self.clients.append(client)
@@ -2821,13 +2899,17 @@ class TDObjectSingleContainer(TDObject):
         return ret
 
 
+# Types already found for names by tdNameToEnum() and mdFlavorNameToEnum()
+TD_ENUM_BY_NAME = {}
+MEAS_FLAVOR_ENUM_BY_NAME = {}
+
 def tdEnToName(tdEn):
     """ Return text name for TD_FULL_TYPE element
 
     Try to keep naming convention which LV uses.
     """
-    if LV_INTERNAL_TD_NAMES.has_value(int(tdEn)):
-        lvtdEn = LV_INTERNAL_TD_NAMES(tdEn)
+    lvtdEn = enumMemberByValueMap(LV_INTERNAL_TD_NAMES).get(int(tdEn))
+    if lvtdEn is not None:
         tdName = lvtdEn.name
     elif isinstance(tdEn, TD_FULL_TYPE):
         tdName = tdEn.name
@@ -2837,6 +2919,10 @@ def tdEnToName(tdEn):
     return tdName
 
 def tdNameToEnum(tdName):
+    """ Return TD_FULL_TYPE element for given text name
+    """
+    if tdName in TD_ENUM_BY_NAME:
+        return TD_ENUM_BY_NAME[tdName]
     tagEn = None
 
     if LV_INTERNAL_TD_NAMES.has_name(tdName):
@@ -2867,14 +2953,15 @@ def tdNameToEnum(tdName):
         if tagParse is not None:
             tagEn = int(tagParse[1], 16)
 
+    TD_ENUM_BY_NAME[tdName] = tagEn
     return tagEn
 
 
 def mdFlavorEnToName(flavorEn):
     """ Return text name for MEASURE_DATA_FLAVOR element
     """
-    if LV_INTERNAL_MEAS_FLAVOR_NAMES.has_value(int(flavorEn)):
-        lvflavorEn = LV_INTERNAL_MEAS_FLAVOR_NAMES(flavorEn)
+    lvflavorEn = enumMemberByValueMap(LV_INTERNAL_MEAS_FLAVOR_NAMES).get(int(flavorEn))
+    if lvflavorEn is not None:
         flavName = lvflavorEn.name
     elif isinstance(flavorEn, MEASURE_DATA_FLAVOR):
         flavName = flavorEn.name
@@ -2886,6 +2973,8 @@ def mdFlavorEnToName(flavorEn):
 def mdFlavorNameToEnum(flavName):
     """ Return MEASURE_DATA_FLAVOR element for given text name
     """
+    if flavName in MEAS_FLAVOR_ENUM_BY_NAME:
+        return MEAS_FLAVOR_ENUM_BY_NAME[flavName]
     flavorEn = None
 
     if LV_INTERNAL_MEAS_FLAVOR_NAMES.has_name(flavName):
@@ -2900,6 +2989,7 @@ def mdFlavorNameToEnum(flavName):
         if tagParse is not None:
             flavorEn = int(tagParse[1], 16)
 
+    MEAS_FLAVOR_ENUM_BY_NAME[flavName] = flavorEn
     return flavorEn
 
 
@@ -2909,19 +2999,19 @@ def newErrorCluster(vi, idx, obj_flags, po):
     # Content (fields) of the error cluster
     tdList = []
 
-    tdErrEnt = SimpleNamespace() # error status
+    tdErrEnt = TDClient() # error status
     tdErrEnt.index = -1
     tdErrEnt.flags = 0
     tdErrEnt.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.Boolean, po)
     tdList.append(tdErrEnt)
 
-    tdErrEnt = SimpleNamespace() # error code
+    tdErrEnt = TDClient() # error code
     tdErrEnt.index = -1
     tdErrEnt.flags = 0
     tdErrEnt.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.NumInt32, po)
     tdList.append(tdErrEnt)
 
-    tdErrEnt = SimpleNamespace() # error source
+    tdErrEnt = TDClient() # error source
     tdErrEnt.index = -1
     tdErrEnt.flags = 0
     tdErrEnt.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.String, po)
@@ -2938,7 +3028,7 @@ def newDigitalTableCluster(vi, idx, obj_flags, po):
     # make list of fields
     tdList = []
 
-    tdDigTabEnt = SimpleNamespace() # DigitalTable transitions
+    tdDigTabEnt = TDClient() # DigitalTable transitions
     tdDigTabEnt.index = -1
     tdDigTabEnt.flags = 0
     tdDigTabEnt.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.Array, po)
@@ -2946,7 +3036,7 @@ def newDigitalTableCluster(vi, idx, obj_flags, po):
     for dim in tdDigTabEnt.nested.dimensions:
         dim.flags = 0
         dim.fixedSize = -1
-    tdDigTabEnt.nested.clients = [ SimpleNamespace() ]
+    tdDigTabEnt.nested.clients = [ TDClient() ]
     for client in tdDigTabEnt.nested.clients:
         cli_flags = 0
         client.index = -1
@@ -2954,7 +3044,7 @@ def newDigitalTableCluster(vi, idx, obj_flags, po):
         client.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.NumUInt32, po)
     tdList.append(tdDigTabEnt)
 
-    tdDigTabEnt = SimpleNamespace() # DigitalTable data
+    tdDigTabEnt = TDClient() # DigitalTable data
     tdDigTabEnt.index = -1
     tdDigTabEnt.flags = 0
     tdDigTabEnt.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.Array, po)
@@ -2962,7 +3052,7 @@ def newDigitalTableCluster(vi, idx, obj_flags, po):
     for dim in tdDigTabEnt.nested.dimensions:
         dim.flags = 0
         dim.fixedSize = -1
-    tdDigTabEnt.nested.clients = [ SimpleNamespace() ]
+    tdDigTabEnt.nested.clients = [ TDClient() ]
     for client in tdDigTabEnt.nested.clients:
         cli_flags = 0
         client.index = -1
@@ -2980,30 +3070,30 @@ def newDigitalWaveformCluster(vi, idx, obj_flags, po):
     """ The DigitalWaveform is a Cluster with specific things inside
     """
     tdList = []
-    tdEntry = SimpleNamespace() # t0
+    tdEntry = TDClient() # t0
     tdEntry.index = -1
     tdEntry.flags = 0
     # Use block of 16 bytes as Timestamp
     tdEntry.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.Block, po)
     tdEntry.nested.blkSize = 16
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # dt
+    tdEntry = TDClient() # dt
     tdEntry.index = -1
     tdEntry.flags = 0
     tdEntry.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.NumFloat64, po)
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # Y
+    tdEntry = TDClient() # Y
     tdEntry.index = -1
     tdEntry.flags = 0
     # The DigitalTable is a Cluster with specific things inside
     tdEntry.nested = newDigitalTableCluster(vi, -1, 0, po)
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # error
+    tdEntry = TDClient() # error
     tdEntry.index = -1
     tdEntry.flags = 0
     tdEntry.nested = newErrorCluster(vi, -1, 0, po)
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # attributes
+    tdEntry = TDClient() # attributes
     tdEntry.index = -1
     tdEntry.flags = 0
     tdEntry.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.LVVariant, po)
@@ -3019,19 +3109,19 @@ def newAnalogWaveformCluster(vi, idx, obj_flags, tdInner, po):
     """ The AnalogWaveform is a Cluster with specific things inside
     """
     tdList = []
-    tdEntry = SimpleNamespace() # t0
+    tdEntry = TDClient() # t0
     tdEntry.index = -1
     tdEntry.flags = 0
     # Use block of 16 bytes as Timestamp
     tdEntry.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.Block, po)
     tdEntry.nested.blkSize = 16
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # dt
+    tdEntry = TDClient() # dt
     tdEntry.index = -1
     tdEntry.flags = 0
     tdEntry.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.NumFloat64, po)
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # Y
+    tdEntry = TDClient() # Y
     tdEntry.index = -1
     tdEntry.flags = 0
     # The AnalogTable is a Cluster with specific things inside
@@ -3040,19 +3130,19 @@ def newAnalogWaveformCluster(vi, idx, obj_flags, tdInner, po):
     for dim in tdEntry.nested.dimensions:
         dim.flags = 0
         dim.fixedSize = -1
-    tdEntry.nested.clients = [ SimpleNamespace() ]
+    tdEntry.nested.clients = [ TDClient() ]
     for client in tdEntry.nested.clients:
         cli_flags = 0
         client.index = -1
         client.flags = 0
         client.nested = tdInner
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # error
+    tdEntry = TDClient() # error
     tdEntry.index = -1
     tdEntry.flags = 0
     tdEntry.nested = newErrorCluster(vi, -1, 0, po)
     tdList.append(tdEntry)
-    tdEntry = SimpleNamespace() # attributes
+    tdEntry = TDClient() # attributes
     tdEntry.index = -1
     tdEntry.flags = 0
     tdEntry.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.LVVariant, po)
@@ -3070,7 +3160,7 @@ def newDynamicTableCluster(vi, idx, obj_flags, po):
     # make list of fields
     tdList = []
 
-    tdTabEnt = SimpleNamespace()
+    tdTabEnt = TDClient()
     tdTabEnt.index = -1
     tdTabEnt.flags = 0
     tdTabEnt.nested = newTDObject(vi, -1, 0, TD_FULL_TYPE.Array, po)
@@ -3078,7 +3168,7 @@ def newDynamicTableCluster(vi, idx, obj_flags, po):
     for dim in tdTabEnt.nested.dimensions:
         dim.flags = 0
         dim.fixedSize = -1
-    tdTabEnt.nested.clients = [ SimpleNamespace() ]
+    tdTabEnt.nested.clients = [ TDClient() ]
     for client in tdTabEnt.nested.clients:
         client.index = -1
         client.flags = 0
@@ -3101,6 +3191,258 @@ def newOldFloat64WaveformCluster(vi, idx, obj_flags, po):
     return tdCluster
 
 
+class TDObjectPool:
+    """ Pool of interned Type Descriptors within one VI
+
+    Identical TDs in nested lists are shared, with raw descriptor bytes as key.
+    Only self-contained TDs are pooled, so that the owning list does not matter;
+    shared TDs have no topTypeList. TDs are not parsed when interned - the first
+    one with given raw data becomes a candidate, and is parsed and shared only
+    when another TD with the same data is looked up.
+    Shared TDs cannot be modified - setData() raises; use writableTDClient()
+    to get a private copy before modifying a TD which might be shared.
+    """
+    def __init__(self):
+        self.objects = {}
+        self.candidates = {}
+        self.unpoolable = set()
+        self.type_only = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, raw_data):
+        """ Returns pooled TD with given raw data, or None
+        """
+        obj = self.objects.get(raw_data)
+        if obj is None and raw_data in self.candidates:
+            obj = self.share(raw_data, self.candidates.pop(raw_data))
+        if obj is not None:
+            self.hits += 1
+        return obj
+
+    def share(self, key, obj):
+        """ Makes the candidate TD shared, if it can be; returns it, or None
+        """
+        # The owner could have modified the candidate since it was interned
+        if obj.parsed_data_updated or obj.raw_data is None or bytes(obj.raw_data) != key:
+            return None
+        obj.parseData()
+        if not obj.isSelfContained():
+            self.unpoolable.add(key)
+            return None
+        obj.setOwningList(None)
+        obj.shared = True
+        self.objects[key] = obj
+        return obj
+
+    def intern(self, obj):
+        """ Returns pooled TD identical to given one, or registers and returns the given TD
+        """
+        if obj.shared or obj.raw_data is None or obj.parsed_data_updated:
+            return obj
+        key = bytes(obj.raw_data)
+        pooled = self.lookup(key)
+        if pooled is not None:
+            return pooled
+        self.misses += 1
+        if key not in self.unpoolable:
+            self.candidates[key] = obj
+        return obj
+
+    def typeOnlyTD(self, vi, obj_type, po):
+        """ Returns shared TD of given type, which stores no data
+
+        Such TDs are used where only type is known, ie. for LVVariant attributes.
+        """
+        obj = self.type_only.get(obj_type)
+        if obj is not None:
+            self.hits += 1
+            return obj
+        self.misses += 1
+        obj = newTDObject(vi, -1, 0, obj_type, po)
+        obj.shared = True
+        self.type_only[obj_type] = obj
+        return obj
+
+
+class TDObjectCache:
+    """ Process-wide cache of parsed Type Descriptors, shared between VIs
+
+    Useful for batch processing, where the same typedefs are embedded in many files.
+    Entries are keyed by file version and hash of raw descriptor bytes, and store
+    pickled TD trees with references to VI and options replaced by placeholders.
+    Least recently used entries are evicted when max_entries is exceeded.
+    If store_path is set, entries are also stored in, and loaded from, that folder.
+    Unpickling executes code, so entries on disk are signed with HMAC using a key
+    private to the current user, which is kept outside of the folder; entries
+    without valid signature are ignored. The folder itself must be private too.
+    """
+    # Increase when parsed TD properties change, to invalidate entries stored on disk
+    STORE_FORMAT = 3
+    # Secret key used for signing entries stored on disk; created on first use
+    STORE_KEY_FNAME = os.path.join(os.path.expanduser("~"), ".pylabview_td_cache.key")
+
+    def __init__(self, max_entries=0, store_path=None):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.store_path = store_path
+        self.store_key = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_loads = 0
+        self.disk_rejects = 0
+
+    def configure(self, max_entries=None, store_path=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if store_path is not None:
+            os.makedirs(store_path, mode=0o700, exist_ok=True)
+            checkPrivatePath(store_path)
+            self.store_key = self.loadStoreKey()
+            self.store_path = store_path
+        self.evictEntries()
+
+    def getConfig(self):
+        """ Returns current settings of the cache, in a form accepted by setConfig()
+        """
+        return (self.max_entries, self.store_path, self.store_key,)
+
+    def setConfig(self, config):
+        """ Restores settings of the cache returned by getConfig()
+        """
+        self.max_entries, self.store_path, self.store_key = config
+        self.evictEntries()
+
+    def evictEntries(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def isEnabled(self):
+        return (self.max_entries > 0) or (self.store_path is not None)
+
+    def loadStoreKey(self):
+        """ Returns the key for signing entries on disk, creating it if needed
+        """
+        fname = TDObjectCache.STORE_KEY_FNAME
+        try:
+            key_fd = os.open(fname, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            key_fd = None
+        if key_fd is not None:
+            with os.fdopen(key_fd, "wb") as key_fh:
+                key_fh.write(os.urandom(32))
+        checkPrivatePath(fname)
+        with open(fname, "rb") as key_fh:
+            store_key = key_fh.read()
+        if len(store_key) < 32:
+            raise PermissionError("Key file '{:s}' for TD cache is damaged".format(fname))
+        return store_key
+
+    def storeSignature(self, key, data_buf):
+        return hmac.new(self.store_key, key.encode('ascii') + data_buf, sha256).digest()
+
+    def makeKey(self, vi, raw_data):
+        ver = vi.getFileVersion()
+        return "{:08x}_{:s}".format(encodeVersion(ver), sha1(raw_data).hexdigest())
+
+    def storeFileName(self, key):
+        return os.path.join(self.store_path, "td{:d}_{:s}.pickle".format(TDObjectCache.STORE_FORMAT, key))
+
+    def addEntry(self, key, data_buf):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = data_buf
+        self.entries.move_to_end(key)
+        self.evictEntries()
+
+    def get(self, vi, idx, key, po):
+        """ Returns new parsed TD created from cache entry with given key, or None
+        """
+        data_buf = self.entries.get(key)
+        if data_buf is not None:
+            self.entries.move_to_end(key)
+        elif self.store_path is not None:
+            try:
+                with open(self.storeFileName(key), "rb") as cache_fh:
+                    data_buf = cache_fh.read()
+            except OSError:
+                data_buf = None
+            if data_buf is not None:
+                signature, data_buf = data_buf[:32], data_buf[32:]
+                if not hmac.compare_digest(signature, self.storeSignature(key, data_buf)):
+                    if (po.verbose > 0):
+                        eprint("{:s}: Warning: TD cache entry '{:s}' has invalid signature, ignoring"\
+                          .format(vi.src_fname, self.storeFileName(key)))
+                    self.disk_rejects += 1
+                    data_buf = None
+            if data_buf is not None:
+                self.disk_loads += 1
+                self.addEntry(key, data_buf)
+        if data_buf is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        unpickler = pickle.Unpickler(BytesIO(data_buf))
+        unpickler.persistent_load = lambda pid: {"vi": vi, "po": po}[pid]
+        obj = unpickler.load()
+        obj.index = idx
+        return obj
+
+    def put(self, key, obj):
+        """ Stores parsed TD in the cache
+        """
+        vi, po = obj.vi, obj.po
+        bldata = BytesIO()
+        pickler = pickle.Pickler(bldata, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = lambda o: "vi" if o is vi else ("po" if o is po else None)
+        try:
+            pickler.dump(obj)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            if (po.verbose > 1):
+                eprint("{:s}: Warning: TypeDesc {:d} type 0x{:02x} cannot be cached: {}"\
+                  .format(vi.src_fname, obj.index, obj.otype, str(e)))
+            return
+        data_buf = bldata.getvalue()
+        self.addEntry(key, data_buf)
+        if self.store_path is not None:
+            fname = self.storeFileName(key)
+            with open(fname + ".tmp", "wb") as cache_fh:
+                cache_fh.write(self.storeSignature(key, data_buf))
+                cache_fh.write(data_buf)
+            os.replace(fname + ".tmp", fname)
+
+    def statsText(self):
+        return "TD cache: {:d} hits, {:d} misses, {:d} evictions, {:d} loaded from disk, {:d} rejected, {:d} entries"\
+          .format(self.hits, self.misses, self.evictions, self.disk_loads, self.disk_rejects, len(self.entries))
+
+
+def checkPrivatePath(path):
+    """ Raises exception if given file or folder can be modified by other users
+    """
+    if not hasattr(os, "getuid"):
+        return # No POSIX ownership and permissions
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or (st.st_mode & 0o077) != 0:
+        raise PermissionError("Path '{:s}' must be owned by current user and inaccessible to others"\
+          .format(path))
+    pass
+
+
+typeDescCache = TDObjectCache()
+
+
+def writableTDClient(clientTD):
+    """ Makes sure the TD within given client is not shared, and returns it
+
+    To be used before modifying properties of a TD, so that changes do not
+    propagate to other places which use the same interned TD.
+    """
+    if clientTD.nested.shared:
+        clientTD.nested = clientTD.nested.copy()
+    return clientTD.nested
+
 def parseTDSingleObject(vi, bldata, pos, clients, po):
     bldata.seek(pos)
     obj_type, obj_flags, obj_len = TDObject.parseRSRCDataHeader(bldata)
@@ -3112,15 +3454,20 @@ def parseTDSingleObject(vi, bldata, pos, clients, po):
         raise AttributeError("TD sub-object at 0x{:04x}, type 0x{:02x} flags 0x{:02x}, has length={:d} below minimum"\
           .format(pos, obj_type, obj_flags, obj_len))
         obj_type = TD_FULL_TYPE.Void
-    obj = newTDObject(vi, obj_idx, obj_flags, obj_type, po)
-    clientTD = SimpleNamespace()
+    bldata.seek(pos)
+    # Identical TD might have already been parsed; if so, share it
+    obj = vi.typeDescPool.lookup(bldata.read(obj_len))
+    if obj is None:
+        obj = newTDObject(vi, obj_idx, obj_flags, obj_type, po)
+        bldata.seek(pos)
+        obj.setOwningList(clients)
+        obj.initWithRSRC(bldata, obj_len)
+        obj = vi.typeDescPool.intern(obj)
+    clientTD = TDClient()
     clientTD.index = -1 # Nested clients have index -1
     clientTD.flags = 0 # Only Type Mapped entries have it non-zero
     clientTD.nested = obj
     clients.append(clientTD)
-    bldata.seek(pos)
-    obj.setOwningList(clients)
-    obj.initWithRSRC(bldata, obj_len)
     return obj.index, obj_len
 
 def parseTDObject(vi, bldata, ver, po, useConsolidatedTypes=False):
@@ -3166,6 +3513,8 @@ def prepareTDObject(vi, clients, topType, ver, po, useConsolidatedTypes=False, a
         for clientTD in clients:
             if clientTD.index != -1:
                 continue
+            if not avoid_recompute:
+                writableTDClient(clientTD) # Recomputing replaces raw data of the TD
             clientTD.nested.updateData(avoid_recompute=avoid_recompute)
             data_buf += clientTD.nested.raw_data
         hasTopType = 0 if topType is None else 1
@@ -3186,7 +3535,7 @@ def initWithXMLTDObject(vi, obj_elem, po):
             obj_type = valFromEnumOrIntString(TD_FULL_TYPE, subelem.get("Type"))
             obj_flags = importXMLBitfields(TYPEDESC_FLAGS, subelem)
             obj = newTDObject(vi, obj_idx, obj_flags, obj_type, po)
-            clientTD = SimpleNamespace()
+            clientTD = TDClient()
             clientTD.flags = 0
             clientTD.index = -1
             clientTD.nested = obj
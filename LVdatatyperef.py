@@ -21,8 +21,8 @@ from ctypes import *
 
 from LVmisc import *
 from LVblock import *
-import LVclasses
-import LVheap
+LVclasses = lazyImport('LVclasses')
+LVheap = lazyImport('LVheap')
 import LVdatatype
 
 class REFNUM_TYPE(enum.IntEnum):
@@ -63,7 +63,7 @@ class REFNUM_TYPE(enum.IntEnum):
     TDMSFile =	34
 
 
-class LV_INTERNAL_REFNUM_TYPE_NAMES(LVheap.ENUM_TAGS):
+class LV_INTERNAL_REFNUM_TYPE_NAMES(ENUM_TAGS):
     """ Names of Refnum types from LV
 
     This maps the names of Refnum types this tool uses to names LV uses
@@ -210,7 +210,7 @@ class RefnumBase_SimpleCliList(RefnumBase):
     def parseRSRCData(self, bldata):
         count = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
         # Create _separate_ empty namespace for each connector
-        clients = [SimpleNamespace() for _ in range(count)]
+        clients = [LVdatatype.TDClient() for _ in range(count)]
         for i in range(count):
             cli_idx = readVariableSizeFieldU2p2(bldata)
             cli_flags = 0
@@ -316,7 +316,7 @@ class RefnumBase_RCIOOMId(RefnumBase_RC):
         self.conn_obj.firstclient = firstclient
         self.conn_obj.clients = []
         if firstclient != 0:
-            client = SimpleNamespace()
+            client = LVdatatype.TDClient()
             client.index = readVariableSizeFieldU2p2(bldata)
             client.flags = 0
             self.conn_obj.clients.append(client)
@@ -515,7 +515,7 @@ class RefnumLVObjCtl(RefnumBase):
         ver = self.vi.getFileVersion()
         count = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
         # Create _separate_ empty namespace for each connector
-        clients = [SimpleNamespace() for _ in range(count)]
+        clients = [LVdatatype.TDClient() for _ in range(count)]
         for i in range(count):
             cli_idx = readVariableSizeFieldU2p2(bldata)
             cli_flags = 0
@@ -659,7 +659,7 @@ class RefnumIVIRef(RefnumBase_RCIOOMId):
 
         cli_count = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
         for i in range(cli_count):
-            client = SimpleNamespace()
+            client = LVdatatype.TDClient()
             client.index = readVariableSizeFieldU2p2(bldata)
             client.flags = 0
             self.conn_obj.clients.append(client)
@@ -772,7 +772,7 @@ class RefnumEventReg(RefnumBase):
         field0 = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
         count = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
         # Create _separate_ empty namespace for each connector
-        clients = [SimpleNamespace() for _ in range(count)]
+        clients = [LVdatatype.TDClient() for _ in range(count)]
         for i in range(count):
             # dont know this data!
             cfield0 = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
@@ -1172,11 +1172,14 @@ class RefnumTDMSFile(RefnumBase):
         super().__init__(*args)
 
 
+# Refnum types already found for names by refnumNameToEnum()
+REFNUM_ENUM_BY_NAME = {}
+
 def refnumEnToName(refnumEn):
     """ Return text name for REFNUM_TYPE element
     """
-    if LV_INTERNAL_REFNUM_TYPE_NAMES.has_value(int(refnumEn)):
-        lvrefEn = LV_INTERNAL_REFNUM_TYPE_NAMES(refnumEn)
+    lvrefEn = enumMemberByValueMap(LV_INTERNAL_REFNUM_TYPE_NAMES).get(int(refnumEn))
+    if lvrefEn is not None:
         refnName = lvrefEn.name
     elif isinstance(refnumEn, REFNUM_TYPE):
         refnName = refnumEn.name
@@ -1189,6 +1192,8 @@ def refnumEnToName(refnumEn):
 def refnumNameToEnum(refnName):
     """ Return REFNUM_TYPE element for given text name
     """
+    if refnName in REFNUM_ENUM_BY_NAME:
+        return REFNUM_ENUM_BY_NAME[refnName]
     refnumEn = None
 
     if LV_INTERNAL_REFNUM_TYPE_NAMES.has_name(refnName):
@@ -1202,6 +1207,7 @@ def refnumNameToEnum(refnName):
         if tagParse is not None:
             refnumEn = int(tagParse[1], 16)
 
+    REFNUM_ENUM_BY_NAME[refnName] = refnumEn
     return refnumEn
 
 
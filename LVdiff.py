@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC file format structural diff.
+
+    Comparing two RSRC files block by block, parsing only sections which differ.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+import difflib
+
+from hashlib import md5
+
+from LVmisc import getPrettyStrFromRsrcType
+
+
+class DiffEntry:
+    """ Single difference between two RSRC files
+
+    The change is '+' for items existing only in second file, '-' for items
+    existing only in first file, and '~' for items existing in both but with
+    different content.
+    """
+    def __init__(self, change, ident, section_num=None, item=None, old=None, new=None):
+        self.change = change
+        self.ident = ident
+        self.section_num = section_num
+        self.item = item
+        self.old = old
+        self.new = new
+
+    def __str__(self):
+        where = getPrettyStrFromRsrcType(self.ident)
+        if self.section_num is not None:
+            where += "[{:d}]".format(self.section_num)
+        if self.item is not None:
+            where += " " + str(self.item)
+        if self.change == '~' and (self.old is not None or self.new is not None):
+            return "{} {}: {} -> {}".format(self.change, where, self.old, self.new)
+        if self.change == '-' and self.old is not None:
+            return "{} {}: {}".format(self.change, where, self.old)
+        if self.change == '+' and self.new is not None:
+            return "{} {}: {}".format(self.change, where, self.new)
+        return "{} {}".format(self.change, where)
+
+    def __repr__(self):
+        return "<{}: {}>".format(type(self).__name__, str(self))
+
+
+def sectionHash(block, section_num):
+    """ Returns hash of the section as stored in RSRC file, without decoding it
+    """
+    section = block.sections[section_num]
+    hasher = md5()
+    hasher.update(section.start.int5.to_bytes(4, byteorder='big', signed=False))
+    if section.name_text is not None:
+        hasher.update(section.name_text)
+    hasher.update(b'\0')
+    hasher.update(block.getRawData(section_num))
+    return hasher.digest()
+
+
+def firstDifference(data_a, data_b):
+    """ Returns offset of first byte which differs between two buffers
+    """
+    for i, (a, b) in enumerate(zip(data_a, data_b)):
+        if a != b:
+            return i
+    return min(len(data_a), len(data_b))
+
+
+def diffSequences(ident, section_num, items_a, items_b, key, describe, describeChange=None):
+    """ Compares two lists of items, returning list of DiffEntry
+
+    Items are matched by key, using difflib. Replaced ranges are paired
+    item-by-item, and reported as changes if describeChange() accepts
+    the pair; otherwise as removal and addition.
+    """
+    diffs = []
+    keys_a = [key(item) for item in items_a]
+    keys_b = [key(item) for item in items_b]
+    matcher = difflib.SequenceMatcher(None, keys_a, keys_b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        pairs = 0
+        if tag == 'replace' and describeChange is not None:
+            while pairs < min(i2-i1, j2-j1):
+                change = describeChange(items_a[i1+pairs], items_b[j1+pairs])
+                if change is None:
+                    break
+                item, old, new = change
+                diffs.append(DiffEntry('~', ident, section_num, item, old, new))
+                pairs += 1
+        for i in range(i1+pairs, i2):
+            desc = describe(items_a[i])
+            if desc is not None:
+                diffs.append(DiffEntry('-', ident, section_num, desc[0], old=desc[1]))
+        for j in range(j1+pairs, j2):
+            desc = describe(items_b[j])
+            if desc is not None:
+                diffs.append(DiffEntry('+', ident, section_num, desc[0], new=desc[1]))
+    return diffs
+
+
+def diffVI(vi_a, vi_b):
+    """ Compares two VI objects, returning list of DiffEntry
+
+    Blocks and sections are first compared by hashes of their data as stored
+    in RSRC file, so sections which are the same are never decompressed
+    nor parsed. Only sections with different hashes are compared in detail.
+    """
+    diffs = []
+    for ident in vi_a.blocks:
+        if ident not in vi_b.blocks:
+            diffs.append(DiffEntry('-', vi_a.blocks[ident].ident))
+    for ident in vi_b.blocks:
+        if ident not in vi_a.blocks:
+            diffs.append(DiffEntry('+', vi_b.blocks[ident].ident))
+
+    for ident, block_a in vi_a.blocks.items():
+        block_b = vi_b.blocks.get(ident)
+        if block_b is None:
+            continue
+        for snum in block_a.sections:
+            if snum not in block_b.sections:
+                diffs.append(DiffEntry('-', block_a.ident, snum))
+        for snum in block_b.sections:
+            if snum not in block_a.sections:
+                diffs.append(DiffEntry('+', block_b.ident, snum))
+        for snum in block_a.sections:
+            if snum not in block_b.sections:
+                continue
+            if sectionHash(block_a, snum) == sectionHash(block_b, snum):
+                continue
+            if (vi_a.po.verbose > 1):
+                print("{:s}: Block {} section {:d} differs, comparing content"\
+                  .format(vi_a.src_fname, getPrettyStrFromRsrcType(block_a.ident), snum))
+            # Empty result means same content stored differently, ie. with other compression
+            diffs.extend(block_a.diffSection(block_b, snum))
+    return diffs
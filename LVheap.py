@@ -21,7 +21,7 @@ from ctypes import *
 
 import LVdatatype
 import LVmisc
-from LVmisc import eprint
+from LVmisc import eprint, ENUM_TAGS
 import LVxml as ET
 
 class HEAP_FORMAT(enum.Enum):
@@ -43,17 +43,6 @@ class NODE_SCOPE(enum.IntEnum):
     TagClose = 2 # Closing of a tag
 
 
-class ENUM_TAGS(enum.Enum):
-    @classmethod
-    def has_value(cls, value):
-        #return tagId in set(itm.value for itm in cls) # slower
-        return value in cls._value2member_map_
-
-    @classmethod
-    def has_name(cls, name):
-        return name in cls.__members__
-
-
 class SL_SYSTEM_TAGS(ENUM_TAGS):
     SL__object = -3
     SL__array = -4
@@ -1372,6 +1361,9 @@ class UNRECOGNIZED_CLASS(PHONY_ENUM):
 
 
 class HeapNode(object):
+    __slots__ = ('vi', 'po', 'attribs', 'content', 'parent', 'tagEn', 'scopeInfo', 'childs', \
+      'raw_data', 'raw_data_updated', 'parsed_data_updated', 'size',)
+
     def __init__(self, vi, po, parentNode, tagEn, scopeInfo):
         """ Creates new Section object, represention one of possible contents of a Block.
 
@@ -1391,10 +1383,19 @@ class HeapNode(object):
         # Whether any properties have been updated and preparation of new RAW data is required
         self.parsed_data_updated = False
 
+    def getTagPath(self):
+        """ Returns list of tag names from top of the heap down to this node
+        """
+        path = []
+        obj = self
+        while obj is not None:
+            path.append(tagEnToName(obj.tagEn, obj.parent))
+            obj = obj.parent
+        path.reverse()
+        return path
+
     def getScopeInfo(self):
-        if self.scopeInfo not in set(item.value for item in NODE_SCOPE):
-            return self.scopeInfo
-        return NODE_SCOPE(self.scopeInfo)
+        return LVmisc.enumOrIntFromVal(NODE_SCOPE, self.scopeInfo)
 
     def parseRSRCContent(self):
         pass
@@ -1443,6 +1444,7 @@ class HeapNode(object):
         self.content = content
 
         self.parseRSRCContent()
+        self.parsed_data_updated = False
 
     def getData(self):
         bldata = BytesIO(self.raw_data)
@@ -1453,6 +1455,15 @@ class HeapNode(object):
         self.size = len(self.raw_data)
         if not incomplete:
             self.raw_data_updated = True
+            self.parsed_data_updated = False
+
+    def needUpdateData(self):
+        """ Returns whether RAW data of the node has to be re-created from properties
+
+        Nodes read from RSRC keep their original bytes; these are re-used unless
+        properties were modified and parsed_data_updated was set.
+        """
+        return self.parsed_data_updated or not self.raw_data_updated
 
     def updateContent(self):
         pass
@@ -1471,7 +1482,7 @@ class HeapNode(object):
         if hasAttrList != 0:
             data_buf += LVmisc.prepareVariableSizeFieldU124(len(self.attribs))
             for atId, atVal in self.attribs.items():
-                if isinstance(atVal, enum.Enum) or isinstance(atVal, PHONY_ENUM):
+                if isinstance(atVal, (enum.Enum, ENUM_TAGS, PHONY_ENUM,)):
                     atVal = atVal.value
                 data_buf += LVmisc.prepareVariableSizeFieldS124(atId)
                 data_buf += LVmisc.prepareVariableSizeFieldS24(atVal)
@@ -1524,6 +1535,31 @@ class HeapNode(object):
                 tagText = str(self.content)
         return tagText
 
+    def prepareContentDict(self):
+        if self.content is None or self.content is False:
+            return None
+        if isinstance(self.content, (bytearray, memoryview,)):
+            return bytes(self.content)
+        return self.content
+
+    def exportDict(self):
+        """ Returns properties of the node as dict of plain values
+
+        Child nodes are not included; these are added by the heap block.
+        """
+        d = { 'tag': tagEnToName(self.tagEn, self.parent) }
+        if len(self.attribs) > 0:
+            attribs = {}
+            for atId, atVal in self.attribs.items():
+                if atId == SL_SYSTEM_ATTRIB_TAGS.SL__class.value:
+                    atVal = classEnToName(atVal)
+                attribs[attributeIdToName(atId)] = atVal
+            d['attribs'] = attribs
+        content = self.prepareContentDict()
+        if content is not None:
+            d['content'] = content
+        return d
+
     def exportXML(self, elem, scopeInfo, fname_base):
         for atId, atVal in self.attribs.items():
             propName = attributeIdToName(atId)
@@ -1574,10 +1610,13 @@ class HeapNode(object):
         else:
             tagText = ""
         self.initContentWithXML(tagText)
+        self.parsed_data_updated = True
         pass
 
 
 class HeapNodeStdInt(HeapNode):
+    __slots__ = ('btlen', 'signed', 'value',)
+
     def __init__(self, *args, btlen=-1, signed=True):
         super().__init__(*args)
         self.btlen = btlen
@@ -1606,6 +1645,9 @@ class HeapNodeStdInt(HeapNode):
             btlen = self.btlen
         self.content = int(self.value).to_bytes(btlen, byteorder='big', signed=self.signed)
 
+    def prepareContentDict(self):
+        return self.value
+
     def prepareContentXML(self, fname_base):
         return "{:d}".format(self.value)
 
@@ -1619,6 +1661,8 @@ class HeapNodeStdInt(HeapNode):
 
 
 class HeapNodeTypeId(HeapNodeStdInt):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args, btlen=-1, signed=True)
 
@@ -1635,6 +1679,8 @@ class HeapNodeTypeId(HeapNodeStdInt):
 
 
 class HeapNodeRect(HeapNode):
+    __slots__ = ('left', 'top', 'right', 'bottom',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.left = 0
@@ -1657,6 +1703,9 @@ class HeapNodeRect(HeapNode):
         content += int(self.bottom).to_bytes(2, byteorder='big', signed=True)
         self.content = content
 
+    def prepareContentDict(self):
+        return { 'left': self.left, 'top': self.top, 'right': self.right, 'bottom': self.bottom }
+
     def prepareContentXML(self, fname_base):
         return "({:d}, {:d}, {:d}, {:d})".format(self.left, self.top, self.right, self.bottom)
 
@@ -1673,6 +1722,8 @@ class HeapNodeRect(HeapNode):
 
 
 class HeapNodePoint(HeapNode):
+    __slots__ = ('x', 'y',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.x = 0
@@ -1689,6 +1740,9 @@ class HeapNodePoint(HeapNode):
         content += int(self.y).to_bytes(2, byteorder='big', signed=True)
         self.content = content
 
+    def prepareContentDict(self):
+        return { 'x': self.x, 'y': self.y }
+
     def prepareContentXML(self, fname_base):
         return "({:d}, {:d})".format(self.y, self.x)
 
@@ -1703,9 +1757,16 @@ class HeapNodePoint(HeapNode):
 
 
 class HeapNodeString(HeapNode):
+    __slots__ = ()
+
     def __init__(self, *args):
         super().__init__(*args)
 
+    def prepareContentDict(self):
+        if self.content is None or isinstance(self.content, bool):
+            return None
+        return bytes(self.content).decode(self.vi.textEncoding)
+
     def prepareContentXML(self, fname_base):
 
         if self.content is None or isinstance(self.content, bool):
@@ -1728,6 +1789,8 @@ class HeapNodeString(HeapNode):
 
 
 class HeapNodePStrList(HeapNode):
+    __slots__ = ('values',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.values = []
@@ -1756,6 +1819,9 @@ class HeapNodePStrList(HeapNode):
             content += val
         self.content = content
 
+    def prepareContentDict(self):
+        return [val.decode(self.vi.textEncoding) for val in self.values]
+
     def prepareContentXML(self, fname_base):
         strval = "({:d})".format(len(self.values))
         for val in self.values:
@@ -1788,6 +1854,8 @@ class HeapNodePStrList(HeapNode):
 
 
 class HeapNodeBool(HeapNode):
+    __slots__ = ('value',)
+
     def __init__(self, *args):
         super().__init__(*args)
         self.value = False
@@ -1798,6 +1866,9 @@ class HeapNodeBool(HeapNode):
     def updateContent(self):
         self.content = self.value
 
+    def prepareContentDict(self):
+        return self.value
+
     def prepareContentXML(self, fname_base):
         return str(self.value)
 
@@ -2062,6 +2133,12 @@ NODE_STDINT_AUTOLEN_ARRAY_TAGS_LIST = (
     OBJ_DIGITAL_BUS_ORG_CLUST_TAGS.OF__arrayHandle,
 )
 
+# Names and values already converted for tags, attributes and classes
+TAG_NAME_BY_ENUM = {}
+ATTRIB_NAME_BY_ID = {}
+ATTRIB_ID_BY_NAME = {}
+CLASS_ENUM_BY_NAME = {}
+
 
 def getFrontPanelHeapIdent(hfmt):
     """ Gives 4-byte heap identifier from HEAP_FORMAT member
@@ -2143,11 +2220,16 @@ def tagIdToEnum(tagId, parentNode):
     return tagEn
 
 def tagEnToName(tagEn, parentNode):
+    key = (type(tagEn), tagEn.value,)
+    tagName = TAG_NAME_BY_ENUM.get(key)
+    if tagName is not None:
+        return tagName
     # For most enums, we need to remove 4 starting bytes to get the name
     if isinstance(tagEn, SL_SYSTEM_TAGS):
         tagName = tagEn.name
     else:
         tagName = tagEn.name[4:]
+    TAG_NAME_BY_ENUM[key] = tagName
     return tagName
 
 def tagNameToEnum(tagName, parentNode):
@@ -2175,13 +2257,19 @@ def tagNameToEnum(tagName, parentNode):
     return tagEn
 
 def attributeIdToName(attrId):
+    attrName = ATTRIB_NAME_BY_ID.get(attrId)
+    if attrName is not None:
+        return attrName
     if SL_SYSTEM_ATTRIB_TAGS.has_value(attrId):
         attrName = SL_SYSTEM_ATTRIB_TAGS(attrId).name[4:]
     else:
         attrName = 'Prop{:04X}'.format(attrId)
+    ATTRIB_NAME_BY_ID[attrId] = attrName
     return attrName
 
 def attributeNameToId(attrName):
+    if attrName in ATTRIB_ID_BY_NAME:
+        return ATTRIB_ID_BY_NAME[attrName]
     if SL_SYSTEM_ATTRIB_TAGS.has_name("SL__"+attrName):
         attrId = SL_SYSTEM_ATTRIB_TAGS["SL__"+attrName].value
     else:
@@ -2190,6 +2278,7 @@ def attributeNameToId(attrName):
             attrId = int(nameParse[1], 16)
         else:
             attrId = None
+    ATTRIB_ID_BY_NAME[attrName] = attrId
     return attrId
 
 def classIdToEnum(classId, obj):
@@ -2214,6 +2303,8 @@ def classEnToName(classEn):
     return className
 
 def classNameToEnum(className):
+    if className in CLASS_ENUM_BY_NAME:
+        return CLASS_ENUM_BY_NAME[className]
     classEn = None
     if SL_CLASS_TAGS.has_name("SL__"+className):
         classEn = SL_CLASS_TAGS["SL__"+className]
@@ -2224,6 +2315,7 @@ def classNameToEnum(className):
         if classParse is not None:
             classId = int(classParse[1], 16)
             classEn = UNRECOGNIZED_CLASS(classId)
+    CLASS_ENUM_BY_NAME[className] = classEn
     return classEn
 
 def attributeValueIntToIntOrEn(attrId, attrIntVal, obj):
@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC file format heap queries.
+
+    Searching and indexing Front Panel and Block Diagram heaps without creating
+    HeapNodes or XML.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+import re
+
+from array import array
+
+from LVmisc import lazyImport
+
+LVheap = lazyImport('LVheap')
+
+# Values of LVheap.NODE_SCOPE; repeated here, so that checking scope of entries
+# does not load the heap definitions
+SCOPE_TAG_OPEN = 0
+SCOPE_TAG_LEAF = 1
+SCOPE_TAG_CLOSE = 2
+
+
+class HeapQueryPredicate:
+    """ Condition within square brackets of a query step
+
+    Supported forms are: @attr, @attr='val', @attr!='val', text()='val'
+    and contains(text(),'val'). Names and values are the same as in XML
+    export of the heap.
+    """
+    def __init__(self, kind, name=None, value=None, negate=False):
+        self.kind = kind
+        self.attrId = None
+        self.value = value
+        self.negate = negate
+        if name is not None:
+            self.attrId = LVheap.attributeNameToId(name)
+            if self.attrId is None:
+                raise AttributeError("Unrecognized attribute '{}' in heap query".format(name))
+
+    def needsContent(self):
+        return self.kind in ("text", "contains",)
+
+    def matchAttribs(self, attribs, frame):
+        if self.kind == "exists":
+            return (self.attrId in attribs)
+        if self.kind == "attr":
+            if self.attrId not in attribs:
+                return False
+            valStr = LVheap.attributeValueIntOrEnToStr(self.attrId, attribs[self.attrId], frame.parent)
+            return (valStr == self.value) != self.negate
+        return True
+
+    def matchText(self, tagText):
+        if tagText is None:
+            tagText = ""
+        if self.kind == "text":
+            return tagText == self.value
+        if self.kind == "contains":
+            return self.value in tagText
+        return True
+
+
+class HeapQueryStep:
+    """ Single step of heap query path, ie. tag name with predicates
+    """
+    def __init__(self, axis, tagName, predicates):
+        self.axis = axis
+        self.tagName = tagName
+        self.predicates = predicates
+        self.attribPredicates = [pred for pred in predicates if not pred.needsContent()]
+        self.contentPredicates = [pred for pred in predicates if pred.needsContent()]
+
+    def isDescendant(self):
+        return self.axis == "//"
+
+    def matchName(self, tagName):
+        return self.tagName == "*" or self.tagName == tagName
+
+    def matchAttribs(self, frame):
+        for pred in self.attribPredicates:
+            if not pred.matchAttribs(frame.attribs, frame):
+                return False
+        return True
+
+
+class HeapQueryFrame:
+    """ Open tag within the heap being searched
+
+    Has properties used by LVheap tag and class resolution functions, so can be
+    used as parentNode there; but does not store content, nor raw data.
+    """
+    __slots__ = ('parent', 'tagEn', 'tagName', 'attribs', 'topClassEn', 'done', 'anc',)
+
+    def __init__(self, parent, tagEn, tagName, attribs):
+        self.parent = parent
+        self.tagEn = tagEn
+        self.tagName = tagName
+        self.attribs = attribs
+        # Class of this tag or nearest parent with class, as from LVheap.parentTopClassEn()
+        self.topClassEn = None
+        # Amounts of query steps which matched, with the last one matching this tag
+        self.done = ()
+        # Amounts of matched query steps followed by '//' step, from this tag and all parents
+        self.anc = ()
+
+
+class HeapQueryMatch:
+    """ Heap entry which matched a query
+    """
+    def __init__(self, vi, po, frame, block_ident, section_num, index, offset, path, content):
+        self.vi = vi
+        self.po = po
+        self.frame = frame
+        self.block_ident = block_ident
+        self.section_num = section_num
+        self.index = index
+        self.offset = offset
+        self.path = path
+        self.tagEn = frame.tagEn
+        self.attribs = frame.attribs
+        self.content = content
+
+    def getContentText(self):
+        """ Returns content of the tag in form used within XML export
+        """
+        return contentToXMLText(self.vi, self.po, self.frame, self.content)
+
+    def getAttribsText(self):
+        """ Returns attributes of the tag in form used within XML export
+        """
+        return " ".join("{}=\"{}\"".format(LVheap.attributeIdToName(atId), \
+          LVheap.attributeValueIntOrEnToStr(atId, atVal, None)) for atId, atVal in self.attribs.items())
+
+    def __repr__(self):
+        return "<{}: {} {}>".format(type(self).__name__, "/".join(self.path), self.getAttribsText())
+
+
+class HeapQuery:
+    """ Compiled query over heap entries
+
+    The query is a subset of XPath, applied to heap in the form it has after
+    XML export, ie.:
+      //SL__arrayElement[@class='label']/textRec/text
+      /SL__rootObject/root//*[@class='stdNum']
+      //text[contains(text(),'Pane')]
+    Path without leading slash is searched at any depth.
+    """
+    STEP_RE = re.compile(r"""\s*(//|/)?([A-Za-z0-9_]+|\*)((?:\[(?:[^\]'"]|'[^']*'|"[^"]*")*\])*)""")
+    PRED_RE = re.compile(r"""\[((?:[^\]'"]|'[^']*'|"[^"]*")*)\]""")
+    QUOTED_ALT = r"'([^']*)'|" + r'"([^"]*)"'
+    QUOTED = r"(?:" + QUOTED_ALT + r")"
+    PRED_EXISTS_RE = re.compile(r"^\s*@(\w+)\s*$")
+    PRED_ATTR_RE = re.compile(r"^\s*@(\w+)\s*(!?=)\s*(?:" + QUOTED_ALT + r"""|([^\s'"]+))\s*$""")
+    PRED_TEXT_RE = re.compile(r"^\s*text\(\)\s*=\s*" + QUOTED + r"\s*$")
+    PRED_CONTAINS_RE = re.compile(r"^\s*contains\(\s*text\(\)\s*,\s*" + QUOTED + r"\s*\)\s*$")
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.steps = self.parseSteps(expr)
+        self.needsContent = any(len(step.contentPredicates) > 0 for step in self.steps)
+        # Tag enums and names for (tagId, classEn) pairs; resolving them is the costly part
+        self.tagEnCache = {}
+
+    @classmethod
+    def parsePredicate(cls, text):
+        m = cls.PRED_EXISTS_RE.match(text)
+        if m is not None:
+            return HeapQueryPredicate("exists", name=m.group(1))
+        m = cls.PRED_ATTR_RE.match(text)
+        if m is not None:
+            value = next(v for v in m.group(3,4,5) if v is not None)
+            return HeapQueryPredicate("attr", name=m.group(1), value=value, negate=(m.group(2) == "!="))
+        m = cls.PRED_TEXT_RE.match(text)
+        if m is not None:
+            value = next(v for v in m.group(1,2) if v is not None)
+            return HeapQueryPredicate("text", value=value)
+        m = cls.PRED_CONTAINS_RE.match(text)
+        if m is not None:
+            value = next(v for v in m.group(1,2) if v is not None)
+            return HeapQueryPredicate("contains", value=value)
+        raise AttributeError("Unsupported heap query predicate '[{}]'".format(text))
+
+    @classmethod
+    def parseSteps(cls, expr):
+        steps = []
+        pos = 0
+        expr = expr.strip()
+        while pos < len(expr):
+            m = cls.STEP_RE.match(expr, pos)
+            if m is None or m.end() == pos:
+                raise AttributeError("Cannot parse heap query '{}' at position {:d}".format(expr, pos))
+            axis = m.group(1)
+            if axis is None:
+                if len(steps) > 0:
+                    raise AttributeError("Missing '/' in heap query '{}' at position {:d}".format(expr, pos))
+                axis = "//"
+            predicates = [cls.parsePredicate(p) for p in cls.PRED_RE.findall(m.group(3))]
+            steps.append(HeapQueryStep(axis, m.group(2), predicates))
+            pos = m.end()
+        if len(steps) < 1:
+            raise AttributeError("Heap query is empty")
+        return steps
+
+    def stepsDone(self, frame, parent):
+        """ Computes which query steps are matched at given tag
+
+        Returns tuple with amounts of matched steps; value equal to
+        len(self.steps) means the whole query matched (maybe except content).
+        """
+        if parent is not None:
+            parent_done = parent.done
+            parent_anc = parent.anc
+        else:
+            parent_done = (0,)
+            parent_anc = (0,) if self.steps[0].isDescendant() else ()
+        done = []
+        for k in set(parent_done).union(parent_anc):
+            step = self.steps[k] if k < len(self.steps) else None
+            if step is None:
+                continue
+            if step.isDescendant():
+                if k not in parent_anc:
+                    continue
+            elif k not in parent_done:
+                continue
+            if not step.matchName(frame.tagName):
+                continue
+            if not step.matchAttribs(frame):
+                continue
+            done.append(k+1)
+        return tuple(done)
+
+    def stepsAnc(self, done, parent):
+        if parent is not None:
+            anc = set(parent.anc)
+        else:
+            anc = set([0]) if self.steps[0].isDescendant() else set()
+        for k in done:
+            if k < len(self.steps) and self.steps[k].isDescendant():
+                anc.add(k)
+        return tuple(anc)
+
+    def matchContent(self, vi, po, frame, content):
+        """ Checks content predicates of the last step
+
+        Only here, for tags which matched everything else, a HeapNode is created
+        to get the content converted the same way as in XML export.
+        """
+        step = self.steps[-1]
+        if len(step.contentPredicates) < 1:
+            return True
+        tagText = contentToXMLText(vi, po, frame, content)
+        for pred in step.contentPredicates:
+            if not pred.matchText(tagText):
+                return False
+        return True
+
+    def iterMatches(self, vi, po, data_buf, block_ident=None, section_num=0):
+        """ Yields HeapQueryMatch for every entry of heap data matching the query
+
+        The data_buf is heap section content, after the content length.
+        Entries are decoded from the buffer directly; within subtrees which
+        cannot contain a match, only entry sizes are decoded.
+        """
+        buf = memoryview(data_buf)
+        buf_len = len(buf)
+        nsteps = len(self.steps)
+        pos = 0
+        index = 0
+        parent = None
+        # Depth of subtree in which there can be no matches; only counted
+        dead_depth = 0
+        while pos < buf_len:
+            start_pos = pos
+            cmd0 = buf[pos]
+            cmd1 = buf[pos+1]
+            pos += 2
+            sizeSpec = (cmd0 >> 5) & 7
+            hasAttrList = (cmd0 >> 4) & 1
+            scopeInfo = (cmd0 >> 2) & 3
+            rawTagId = cmd1 | ((cmd0 & 3) << 8)
+            if rawTagId == 1023:
+                tagId = int.from_bytes(buf[pos:pos+4], byteorder='big', signed=True)
+                pos += 4
+            else:
+                tagId = rawTagId - 31
+
+            live = (dead_depth == 0)
+            attribs = {}
+            if hasAttrList != 0:
+                count, pos = readVarU124(buf, pos)
+                for i in range(count):
+                    atId, pos = readVarS124(buf, pos)
+                    atIntVal, pos = readVarS24(buf, pos)
+                    if live:
+                        attribs[atId] = atIntVal
+
+            contentSize = 0
+            if sizeSpec in (1,2,3,4,):
+                contentSize = sizeSpec
+            elif sizeSpec == 6:
+                contentSize, pos = readVarU124(buf, pos)
+            content_pos = pos
+            pos += contentSize
+
+            if not live:
+                if scopeInfo == SCOPE_TAG_OPEN:
+                    dead_depth += 1
+                elif scopeInfo == SCOPE_TAG_CLOSE:
+                    dead_depth -= 1
+                index += 1
+                continue
+
+            if scopeInfo == SCOPE_TAG_CLOSE:
+                if parent is not None:
+                    parent = parent.parent
+                index += 1
+                continue
+
+            parentClassEn = parent.topClassEn if parent is not None else LVheap.SL_CLASS_TAGS.SL__oHExt
+            tagInfo = self.tagEnCache.get((tagId, parentClassEn,))
+            if tagInfo is None:
+                tagEn = LVheap.tagIdToEnum(tagId, parent)
+                tagInfo = (tagEn, LVheap.tagEnToName(tagEn, parent),)
+                self.tagEnCache[(tagId, parentClassEn,)] = tagInfo
+            frame = HeapQueryFrame(parent, tagInfo[0], tagInfo[1], attribs)
+            # Attributes need the tag to be known before the values can be converted
+            for atId, atIntVal in attribs.items():
+                attribs[atId] = LVheap.attributeValueIntToIntOrEn(atId, atIntVal, frame)
+            frame.topClassEn = attribs.get(LVheap.SL_SYSTEM_ATTRIB_TAGS.SL__class.value, parentClassEn)
+            frame.done = self.stepsDone(frame, parent)
+            frame.anc = self.stepsAnc(frame.done, parent)
+
+            if nsteps in frame.done:
+                if sizeSpec == 0:
+                    content = False
+                elif sizeSpec == 7:
+                    content = True
+                elif contentSize > 0:
+                    content = bytes(buf[content_pos:content_pos+contentSize])
+                else:
+                    content = None
+                if self.matchContent(vi, po, frame, content):
+                    path = []
+                    f = frame
+                    while f is not None:
+                        path.append(f.tagName)
+                        f = f.parent
+                    path.reverse()
+                    yield HeapQueryMatch(vi, po, frame, block_ident, section_num, index, start_pos, path, content)
+
+            if scopeInfo == SCOPE_TAG_OPEN:
+                if any(k < nsteps for k in frame.done) or len(frame.anc) > 0:
+                    parent = frame
+                else:
+                    dead_depth = 1
+            index += 1
+
+
+class HeapIndex:
+    """ Positions of all entries within heap data, and their hierarchy
+
+    Entries are identified by index, the same as index within objects list
+    of parsed heap section. For each entry, the index stores its offset
+    within heap data, index of the parent entry (-1 for top level), and index
+    of the last entry of its subtree - for opening tag, this is its closing
+    tag; other entries have no subtree, so it is the entry itself.
+    Entries between opening tag and its subtree end are the children,
+    with their own subtrees.
+    """
+    def __init__(self, data_buf):
+        self.data_buf = data_buf
+        self.offsets = array('L')
+        self.parents = array('l')
+        self.ends = array('L')
+        self.buildIndex()
+
+    def buildIndex(self):
+        """ Scans heap data, decoding only sizes of the entries
+        """
+        buf = memoryview(self.data_buf)
+        buf_len = len(buf)
+        offsets = self.offsets
+        parents = self.parents
+        ends = self.ends
+        open_tags = []
+        parent = -1
+        pos = 0
+        index = 0
+        while pos < buf_len:
+            offsets.append(pos)
+            cmd0 = buf[pos]
+            pos += 2
+            sizeSpec = (cmd0 >> 5) & 7
+            hasAttrList = (cmd0 >> 4) & 1
+            scopeInfo = (cmd0 >> 2) & 3
+            if (buf[pos-1] | ((cmd0 & 3) << 8)) == 1023:
+                pos += 4
+            if hasAttrList != 0:
+                count, pos = readVarU124(buf, pos)
+                for i in range(count):
+                    atId, pos = readVarS124(buf, pos)
+                    # Value is readVarS24(), but only its size is needed
+                    pos += 6 if buf[pos:pos+2] == b'\x80\x00' else 2
+            if sizeSpec in (1,2,3,4,):
+                pos += sizeSpec
+            elif sizeSpec == 6:
+                contentSize, pos = readVarU124(buf, pos)
+                pos += contentSize
+
+            if scopeInfo == SCOPE_TAG_CLOSE and len(open_tags) > 0:
+                ends[open_tags.pop()] = index
+                parent = open_tags[-1] if len(open_tags) > 0 else -1
+            parents.append(parent)
+            ends.append(index)
+            if scopeInfo == SCOPE_TAG_OPEN:
+                open_tags.append(index)
+                parent = index
+            index += 1
+        if pos != buf_len:
+            raise RuntimeError("Heap entries end at {:d} instead of data end at {:d}".format(pos, buf_len))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def entrySpan(self, index):
+        """ Returns start and end offset of given entry
+        """
+        end = self.offsets[index+1] if index+1 < len(self.offsets) else len(self.data_buf)
+        return self.offsets[index], end
+
+    def subtreeSpan(self, index):
+        """ Returns start and end offset of given entry with its subtree
+        """
+        return self.offsets[index], self.entrySpan(self.ends[index])[1]
+
+    def entryScope(self, index):
+        """ Returns NODE_SCOPE value of given entry
+        """
+        return (self.data_buf[self.offsets[index]] >> 2) & 3
+
+    def parentIndex(self, index):
+        return self.parents[index]
+
+    def openingIndex(self, index):
+        """ Returns index of opening tag for closing tag entry of given index, or -1
+        """
+        i = self.parents[index] + 1
+        while i < index:
+            if self.ends[i] == index:
+                return i
+            i = self.ends[i] + 1
+        return -1
+
+    def ancestorIndexes(self, index):
+        """ Returns list of parent entries of given entry, starting from the top one
+        """
+        anc = []
+        parent = self.parents[index]
+        while parent >= 0:
+            anc.append(parent)
+            parent = self.parents[parent]
+        anc.reverse()
+        return anc
+
+    def childIndexes(self, index):
+        """ Returns list of entries which are direct children of given entry
+        """
+        childs = []
+        i = index + 1
+        end = self.ends[index]
+        while i < end:
+            childs.append(i)
+            i = self.ends[i] + 1
+        return childs
+
+
+def contentToXMLText(vi, po, frame, content):
+    """ Converts raw content of heap entry to text, as stored in XML export
+
+    This creates a HeapNode for the entry, so should only be used for entries
+    which already matched other criteria.
+    """
+    obj = LVheap.createObjectNode(vi, po, frame.parent, frame.tagEn, SCOPE_TAG_LEAF)
+    obj.attribs = frame.attribs
+    obj.content = content
+    obj.parseRSRCContent()
+    return obj.prepareContentXML("")
+
+def readVarU124(buf, pos):
+    """ Reads LVmisc.readVariableSizeFieldU124() value from buffer at given position
+    """
+    val = buf[pos]
+    if val == 255:
+        return int.from_bytes(buf[pos+1:pos+3], byteorder='big', signed=False), pos+3
+    elif val == 254:
+        return int.from_bytes(buf[pos+1:pos+5], byteorder='big', signed=False), pos+5
+    return val, pos+1
+
+def readVarS124(buf, pos):
+    """ Reads LVmisc.readVariableSizeFieldS124() value from buffer at given position
+    """
+    val = buf[pos]
+    if val == 0x80:
+        return int.from_bytes(buf[pos+1:pos+3], byteorder='big', signed=True), pos+3
+    elif val == 0x81:
+        return int.from_bytes(buf[pos+1:pos+5], byteorder='big', signed=True), pos+5
+    if val >= 0x80:
+        val -= 0x100
+    return val, pos+1
+
+def readVarS24(buf, pos):
+    """ Reads LVmisc.readVariableSizeFieldS24() value from buffer at given position
+    """
+    val = int.from_bytes(buf[pos:pos+2], byteorder='big', signed=True)
+    if val == -0x8000:
+        return int.from_bytes(buf[pos+2:pos+6], byteorder='big', signed=True), pos+6
+    return val, pos+2
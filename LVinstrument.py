@@ -20,6 +20,7 @@ from ctypes import *
 
 from LVmisc import *
 from LVblock import *
+from LVschema import BinarySchema, SchemaField
 
 
 class VI_TYPE(enum.Enum):
@@ -152,41 +153,36 @@ class VI_EXEC_FLAGS(enum.Enum):
     Bit31 = 1 << 31	# unknown
 
 
-class LVSRData(RSRCStructure):
-    # sizes mostly confirmed in lvrt
-    _fields_ = [('version', c_uint32),	#0
-                ('execFlags', c_uint32),	#4 see VI_EXEC_FLAGS
-                ('field08', c_uint32),	#8 flag 0x0001 = viSuppressBackup, 0x0020 = viIsTemplate, 0x40000000 = viRemoteClientPanel
-                ('field0C', c_uint32),	#12
-                ('flags10', c_uint16),	#16
-                ('field12', c_uint16),	#18
-                ('buttonsHidden', c_uint16),	#20 set based on value of viType, see VI_BTN_HIDE_FLAGS
-                ('frontpFlags', c_uint16),	#18 see VI_FP_FLAGS
-                ('instrState', c_uint32),	#24 see VI_IN_ST_FLAGS
-                ('execState', c_uint32),	#28 valid values under mask 0xF
-                ('execPrio', c_uint16),	#32 priority of the VI when it runs in parallel with other tasks; expected values 0..4
-                ('viType', c_uint16),	#34 type of VI
-                ('field24', c_int32),	#36 signed
-                ('field28', c_uint32),	#40 linked value 1/3
-                ('field2C', c_uint32),	#44 linked value 2/3
-                ('field30', c_uint32),	#48 linked value 3/3
-                ('viSignature', c_ubyte * 16),	#52 A hash identifying the VI file; used by LV while registering for events
-                ('field44', c_uint32),	#68
-                ('field48', c_uint32),	#72
-                ('field4C', c_uint16),	#76
-                ('field4E', c_uint16),	#78
-                ('field50_md5', c_ubyte * 16),	#80
-                ('libpass_md5', c_ubyte * 16),	#96
-                ('field70', c_uint32),	#112
-                ('field74', c_int32),	#116 signed
-                ('field78_md5', c_ubyte * 16),	#120
-                ('inlineStg', c_ubyte),	#136 inline setting, valid value 0..2
-                ('inline_padding', c_ubyte * 3),	#137 
-                ('field8C', c_uint32),	#140 
-    ]
-
-    def __init__(self, po):
-        self.po = po
-        pass
+LVSR_DATA_SCHEMA = BinarySchema("LVSR", [
+    # sizes mostly confirmed in lvrt; version (offset 0) is read separately, as it gates the rest
+    SchemaField('execFlags', 4),	#4 see VI_EXEC_FLAGS
+    SchemaField('field08', 4),	#8 flag 0x0001 = viSuppressBackup, 0x0020 = viIsTemplate, 0x40000000 = viRemoteClientPanel
+    SchemaField('field0C', 4),	#12
+    SchemaField('flags10', 2),	#16
+    SchemaField('field12', 2),	#18
+    SchemaField('buttonsHidden', 2),	#20 set based on value of viType, see VI_BTN_HIDE_FLAGS
+    SchemaField('frontpFlags', 2),	#18 see VI_FP_FLAGS
+    SchemaField('instrState', 4),	#24 see VI_IN_ST_FLAGS
+    SchemaField('execState', 4),	#28 valid values under mask 0xF
+    SchemaField('execPrio', 2),	#32 priority of the VI when it runs in parallel with other tasks; expected values 0..4
+    SchemaField('viType', 2),	#34 type of VI
+    SchemaField('field24', 4, signed=True),	#36 signed
+    SchemaField('field28', 4),	#40 linked value 1/3
+    SchemaField('field2C', 4),	#44 linked value 2/3
+    SchemaField('field30', 4),	#48 linked value 3/3
+    SchemaField('viSignature', 16, raw=True, default=b''),	#52 A hash identifying the VI file; used by LV while registering for events
+    SchemaField('field44', 4, ver_min=(6,0)),	#68
+    SchemaField('field48', 4, ver_min=(6,0)),	#72
+    SchemaField('field4C', 2, ver_min=(6,0)),	#76
+    SchemaField('field4E', 2, ver_min=(6,0)),	#78
+    SchemaField('field50_md5', 16, raw=True, ver_min=(6,0), default=b''),	#80
+    SchemaField('libpass_md5', 16, raw=True, ver_min=(6,0), default=b''),	#96
+    SchemaField('field70', 4, ver_min=(6,0)),	#112
+    SchemaField('field74', 4, signed=True, ver_min=(6,0)),	#116 signed
+    SchemaField('field78_md5', 16, raw=True, ver_min=(10,0,None,'release'), default=b''),	#120
+    SchemaField('inlineStg', 1, ver_min=(14,0)),	#136 inline setting, valid value 0..2
+    SchemaField(None, 3, ver_min=(15,0)),	#137 inline padding
+    SchemaField('field8C', 4, ver_min=(15,0)),	#140
+])
 
 
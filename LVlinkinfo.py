@@ -24,6 +24,48 @@ import LVclasses
 import LVheap
 import LVdatatype
 import LVdatafill
+from LVschema import BinarySchema, SchemaField
+
+
+LINK_SAVE_FLAG_SCHEMA = BinarySchema("BasicLinkSaveInfo", [
+    SchemaField("linkSaveFlag", 1, ver_min=(8,5,0,1), ver_max=(8,6,0,1)),
+    SchemaField("linkSaveFlag", 4, ver_min=(8,6,0,1)),
+])
+
+VI_LINK_REF_INFO_SCHEMA = BinarySchema("VILinkRefInfo", [
+    SchemaField("viLinkField4", 4, ver_min=(8,0,0,3)),
+    SchemaField("viLinkLibVersion", 8, ver_min=(8,0,0,3)),
+    SchemaField("viLinkFieldB", 4, raw=True),
+    SchemaField("viLinkFieldC", 4, raw=True),
+    SchemaField("viLinkFieldD", 4, signed=True),
+])
+
+TYPED_LINK_FLAGS_SCHEMA = BinarySchema("TypedLinkSaveInfo", [
+    SchemaField("typedLinkFlags", 4, ver_min=(12,0,0,3)),
+])
+
+UDCLASS_API_LINK_CACHE_SCHEMA = BinarySchema("UDClassAPILinkCache", [
+    SchemaField("apiLinkLibVersion", 4, align=4, ver_max=(8,0,0,1)),
+    SchemaField("apiLinkLibVersion", 8, align=4, ver_min=(8,0,0,1)),
+    SchemaField(None, 4, ver_max=(8,0,0,4)),
+    SchemaField("apiLinkIsInternal", 1),
+    SchemaField("apiLinkBool2", 1, ver_min=(8,1,0,2), default=1),
+    SchemaField("apiLinkCallParentNodes", 1, ver_min=(9,0,0,2)),
+])
+
+GI_LINK_INFO_SCHEMA = BinarySchema("GILinkInfo", [
+    SchemaField("giLinkProp1", 2),
+    SchemaField("giLinkProp2", 2),
+    SchemaField("giLinkProp3", 2),
+    SchemaField("giLinkProp4", 2),
+    SchemaField("giLinkProp5", 4),
+])
+
+EXT_FUNC_PROPS_SCHEMA = BinarySchema("ExtFuncLinkSaveInfo", [
+    SchemaField("extFuncProp3", 1),
+    SchemaField("extFuncProp4", 1),
+    SchemaField("extFuncProp6", 1, ver_min=(11,0,0,3)),
+])
 
 
 class LinkObjBase:
@@ -112,6 +154,25 @@ class LinkObjBase:
             ET.safe_store_element_text(subelem, name_text)
         pass
 
+    def getTargetQualName(self):
+        """ Returns qualified name of the item this link object refers to
+
+        The name is a list of bytes, with owning libraries first; it is empty
+        if the link object does not store a name.
+        """
+        qualName = getattr(self, 'linkSaveQualName', [])
+        if len(qualName) < 1:
+            qualName = getattr(self, 'msLinkQualName', [])
+        return qualName
+
+    def getTargetPathRef(self):
+        """ Returns path object of the item this link object refers to, or None
+        """
+        pathRef = getattr(self, 'linkSavePathRef', None)
+        if pathRef is None:
+            pathRef = getattr(self, 'viLSPathRef', None)
+        return pathRef
+
     def clearBasicLinkSaveInfo(self):
         self.linkSaveQualName = []
         self.linkSavePathRef = None
@@ -131,11 +192,7 @@ class LinkObjBase:
 
         self.linkSavePathRef = self.parsePathRef(bldata)
 
-        if isGreaterOrEqVersion(ver, 8,5,0,1):
-            if isGreaterOrEqVersion(ver, 8,6,0,1):
-                self.linkSaveFlag = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
-            else:
-                self.linkSaveFlag = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
+        LINK_SAVE_FLAG_SCHEMA.parse(bldata, ver, self)
         pass
 
     def prepareBasicLinkSaveInfo(self, start_offs):
@@ -153,11 +210,7 @@ class LinkObjBase:
 
         data_buf += self.linkSavePathRef.prepareRSRCData()
 
-        if isGreaterOrEqVersion(ver, 8,5,0,1):
-            if isGreaterOrEqVersion(ver, 8,6,0,1):
-                data_buf += int(self.linkSaveFlag).to_bytes(4, byteorder='big', signed=False)
-            else:
-                data_buf += int(self.linkSaveFlag).to_bytes(1, byteorder='big', signed=False)
+        data_buf += LINK_SAVE_FLAG_SCHEMA.prepare(ver, self, start_offs+len(data_buf))
         return data_buf
 
     def initWithXMLBasicLinkSaveInfo(self, lnkobj_elem):
@@ -210,15 +263,10 @@ class LinkObjBase:
             self.viLinkLibVersion = (flagBt >> 1) & 0x1F
             self.viLinkField4 = flagBt >> 6
         else:
-            if isGreaterOrEqVersion(ver, 8,0,0,3):
-                self.viLinkField4 = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
-                self.viLinkLibVersion = int.from_bytes(bldata.read(8), byteorder='big', signed=False)
-            else:
-                self.viLinkField4 = 1
-                self.viLinkLibVersion = 0
-            self.viLinkFieldB = bldata.read(4)
-            self.viLinkFieldC = bldata.read(4)
-            self.viLinkFieldD = int.from_bytes(bldata.read(4), byteorder='big', signed=True)
+            # Versions before 8.0.0.3 do not store these, so defaults are kept
+            self.viLinkField4 = 1
+            self.viLinkLibVersion = 0
+            VI_LINK_REF_INFO_SCHEMA.parse(bldata, ver, self)
         pass
 
     def prepareVILinkRefInfo(self, start_offs):
@@ -236,12 +284,7 @@ class LinkObjBase:
         if flagBt != 0xff:
             pass
         else:
-            if isGreaterOrEqVersion(ver, 8,0,0,3):
-                data_buf += int(self.viLinkField4).to_bytes(4, byteorder='big', signed=False)
-                data_buf += int(self.viLinkLibVersion).to_bytes(8, byteorder='big', signed=False)
-            data_buf += self.viLinkFieldB[:4]
-            data_buf += self.viLinkFieldC[:4]
-            data_buf += int(self.viLinkFieldD).to_bytes(4, byteorder='big', signed=True)
+            data_buf += VI_LINK_REF_INFO_SCHEMA.prepare(ver, self, start_offs+len(data_buf))
         return data_buf
 
     def initWithXMLVILinkRefInfo(self, lnkobj_elem):
@@ -300,8 +343,7 @@ class LinkObjBase:
 
             self.parseVILinkRefInfo(bldata)
 
-            if isGreaterOrEqVersion(ver, 12,0,0,3):
-                self.typedLinkFlags = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
+            TYPED_LINK_FLAGS_SCHEMA.parse(bldata, ver, self)
         else:
             raise NotImplementedError("LinkObj {} TypedLinkSaveInfo parse for LV7 not implemented"\
               .format(self.ident))
@@ -319,8 +361,7 @@ class LinkObjBase:
 
             data_buf += self.prepareVILinkRefInfo(start_offs+len(data_buf))
 
-            if isGreaterOrEqVersion(ver, 12,0,0,3):
-                data_buf +=  int(self.typedLinkFlags).to_bytes(4, byteorder='big', signed=False)
+            data_buf += TYPED_LINK_FLAGS_SCHEMA.prepare(ver, self, start_offs+len(data_buf))
         else:
             raise NotImplementedError("LinkObj {} TypedLinkSaveInfo binary preparation for LV7 not implemented"\
               .format(self.ident))
@@ -479,35 +520,15 @@ class LinkObjBase:
         self.viLSPathRef.exportXML(subelem, fname_base)
 
     def clearUDClassAPILinkCache(self):
-        self.apiLinkLibVersion = 0
-        self.apiLinkIsInternal = 0
-        self.apiLinkBool2 = 1
-        self.apiLinkCallParentNodes = 0
+        UDCLASS_API_LINK_CACHE_SCHEMA.clear(self)
         self.apiLinkContent = b''
 
     def parseUDClassAPILinkCache(self, bldata):
         ver = self.vi.getFileVersion()
         self.clearUDClassAPILinkCache()
 
-        if (bldata.tell() % 4) > 0:
-            bldata.read(4 - (bldata.tell() % 4)) # Padding bytes
-
-        if isGreaterOrEqVersion(ver, 8,0,0,1):
-            self.apiLinkLibVersion = int.from_bytes(bldata.read(8), byteorder='big', signed=False)
-        else:
-            self.apiLinkLibVersion = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
-
-        if isSmallerVersion(ver, 8,0,0,4):
-            bldata.read(4)
-
-        self.apiLinkIsInternal = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
-        if isGreaterOrEqVersion(ver, 8,1,0,2):
-            self.apiLinkBool2 = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
-
-        if isGreaterOrEqVersion(ver, 9,0,0,2):
-            self.apiLinkCallParentNodes = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
-        else:
-            self.apiLinkCallParentNodes = 0
+        # Padding before the block is included in the schema
+        UDCLASS_API_LINK_CACHE_SCHEMA.parse(bldata, ver, self)
 
         self.apiLinkContent = readLStr(bldata, 1, self.po)
 
@@ -515,24 +536,7 @@ class LinkObjBase:
         ver = self.vi.getFileVersion()
         data_buf = b''
 
-        if (start_offs+len(data_buf)) % 4 > 0:
-            padding_len = 4 - ((start_offs+len(data_buf)) % 4)
-            data_buf += (b'\0' * padding_len) # Padding bytes
-
-        if isGreaterOrEqVersion(ver, 8,0,0,1):
-            data_buf += int(self.apiLinkLibVersion).to_bytes(8, byteorder='big', signed=False)
-        else:
-            data_buf += int(self.apiLinkLibVersion).to_bytes(4, byteorder='big', signed=False)
-
-        if isSmallerVersion(ver, 8,0,0,4):
-            data_buf += (b'\0' * 4)
-
-        data_buf += int(self.apiLinkIsInternal).to_bytes(1, byteorder='big', signed=False)
-        if isGreaterOrEqVersion(ver, 8,1,0,2):
-            data_buf += int(self.apiLinkBool2).to_bytes(1, byteorder='big', signed=False)
-
-        if isGreaterOrEqVersion(ver, 9,0,0,2):
-            data_buf += int(self.apiLinkCallParentNodes).to_bytes(1, byteorder='big', signed=False)
+        data_buf += UDCLASS_API_LINK_CACHE_SCHEMA.prepare(ver, self, start_offs+len(data_buf))
 
         data_buf += prepareLStr(self.apiLinkContent, 1, self.po)
         return data_buf
@@ -676,27 +680,17 @@ class LinkObjBase:
         self.exportXMLUDClassAPILinkCache(lnkobj_elem, fname_base)
 
     def clearGILinkInfo(self):
-        self.giLinkProp1 = 0
-        self.giLinkProp2 = 0
-        self.giLinkProp3 = 0
-        self.giLinkProp4 = 0
-        self.giLinkProp5 = 0
+        GI_LINK_INFO_SCHEMA.clear(self)
 
     def parseGILinkInfo(self, bldata):
+        ver = self.vi.getFileVersion()
         self.clearGILinkInfo()
-        self.giLinkProp1 = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
-        self.giLinkProp2 = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
-        self.giLinkProp3 = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
-        self.giLinkProp4 = int.from_bytes(bldata.read(2), byteorder='big', signed=False)
-        self.giLinkProp5 = int.from_bytes(bldata.read(4), byteorder='big', signed=False)
+        GI_LINK_INFO_SCHEMA.parse(bldata, ver, self)
 
     def prepareGILinkInfo(self, start_offs):
+        ver = self.vi.getFileVersion()
         data_buf = b''
-        data_buf += int(self.giLinkProp1).to_bytes(2, byteorder='big', signed=False)
-        data_buf += int(self.giLinkProp2).to_bytes(2, byteorder='big', signed=False)
-        data_buf += int(self.giLinkProp3).to_bytes(2, byteorder='big', signed=False)
-        data_buf += int(self.giLinkProp4).to_bytes(2, byteorder='big', signed=False)
-        data_buf += int(self.giLinkProp5).to_bytes(4, byteorder='big', signed=False)
+        data_buf += GI_LINK_INFO_SCHEMA.prepare(ver, self, start_offs+len(data_buf))
         return data_buf
 
     def initWithXMLGILinkInfo(self, lnkobj_elem):
@@ -783,9 +777,7 @@ class LinkObjBase:
     def clearExtFuncLinkSaveInfo(self):
         self.clearOffsetLinkSaveInfo()
         self.extFuncStr = b''
-        self.extFuncProp3 = 0
-        self.extFuncProp4 = 0
-        self.extFuncProp6 = 0
+        EXT_FUNC_PROPS_SCHEMA.clear(self)
 
     def parseExtFuncLinkSaveInfo(self, bldata):
         ver = self.vi.getFileVersion()
@@ -795,10 +787,7 @@ class LinkObjBase:
             self.parseBasicLinkSaveInfo(bldata)
             self.offsetList = self.parseLinkOffsetList(bldata) # reuse property from OffsetLinkSaveInfo
             self.extFuncStr = readPStr(bldata, 2, self.po)
-            self.extFuncProp3 = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
-            self.extFuncProp4 = int.from_bytes(bldata.read(1), byteorder='big', signed=False)
-            if isGreaterOrEqVersion(ver, 11,0,0,3):
-                self.extFuncProp6 = self.parseBool(bldata)
+            EXT_FUNC_PROPS_SCHEMA.parse(bldata, ver, self)
         else:
             self.parseOffsetLinkSaveInfo(bldata)
 
@@ -815,10 +804,7 @@ class LinkObjBase:
             data_buf += self.prepareBasicLinkSaveInfo(start_offs+len(data_buf))
             data_buf += self.prepareLinkOffsetList(self.offsetList, start_offs+len(data_buf))
             data_buf += preparePStr(self.extFuncStr, 2, self.po)
-            data_buf += int(self.extFuncProp3).to_bytes(1, byteorder='big', signed=False)
-            data_buf += int(self.extFuncProp4).to_bytes(1, byteorder='big', signed=False)
-            if isGreaterOrEqVersion(ver, 11,0,0,3):
-                data_buf += self.prepareBool(self.extFuncProp6)
+            data_buf += EXT_FUNC_PROPS_SCHEMA.prepare(ver, self, start_offs+len(data_buf))
         else:
             data_buf += self.prepareOffsetLinkSaveInfo(start_offs+len(data_buf))
 
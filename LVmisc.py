@@ -15,8 +15,10 @@ import re
 import sys
 import enum
 import math
+import importlib.util
 
 from ctypes import *
+from types import SimpleNamespace
 from collections import OrderedDict
 
 class RSRCStructure(BigEndianStructure):
@@ -49,6 +51,145 @@ class LABVIEW_VERSION_STAGE(enum.Enum):
     beta = 3
     release = 4
 
+class TagTableMeta(type):
+    """ Metaclass for lightweight tables of named tags
+
+    Works like EnumMeta for the subset of features used on tag tables:
+    members have name and value, can be found by value with Class(value)
+    or by name with Class[name], and iterating gives members without aliases.
+    Creating the members costs a fraction of what enum.Enum needs, which
+    matters for tables with hundreds of entries, built on each import.
+    """
+    def __new__(mcls, cls_name, bases, classdict):
+        members = {}
+        namespace = {}
+        for name, value in classdict.items():
+            if name.startswith('_') or callable(value) or \
+              isinstance(value, (classmethod, staticmethod, property,)):
+                namespace[name] = value
+            else:
+                members[name] = value
+        cls = super().__new__(mcls, cls_name, bases, namespace)
+        cls._member_map_ = {}
+        cls._value2member_map_ = {}
+        for name, value in members.items():
+            member = cls._value2member_map_.get(value)
+            if member is None:
+                member = object.__new__(cls)
+                member._name_ = name
+                member._value_ = value
+                cls._value2member_map_[value] = member
+            cls._member_map_[name] = member
+            type.__setattr__(cls, name, member)
+        return cls
+
+    def __call__(cls, value):
+        if isinstance(value, cls):
+            return value
+        member = cls._value2member_map_.get(value)
+        if member is None:
+            raise ValueError("{!r} is not a valid {:s}".format(value, cls.__name__))
+        return member
+
+    def __getitem__(cls, name):
+        return cls._member_map_[name]
+
+    def __iter__(cls):
+        return iter(cls._value2member_map_.values())
+
+    def __len__(cls):
+        return len(cls._value2member_map_)
+
+    def __contains__(cls, member):
+        return isinstance(member, cls)
+
+    def __setattr__(cls, name, value):
+        if name in cls.__dict__.get('_member_map_', {}):
+            raise AttributeError("Cannot reassign member '{:s}'".format(name))
+        super().__setattr__(name, value)
+
+    @property
+    def __members__(cls):
+        return cls._member_map_
+
+
+class ENUM_TAGS(metaclass=TagTableMeta):
+    """ Base for tables of named tags, with quick checks for existence
+    """
+    __slots__ = ('_name_', '_value_',)
+
+    @property
+    def name(self):
+        return self._name_
+
+    @property
+    def value(self):
+        return self._value_
+
+    def __repr__(self):
+        return "<{:s}.{:s}: {!r}>".format(type(self).__name__, self._name_, self._value_)
+
+    def __str__(self):
+        return "{:s}.{:s}".format(type(self).__name__, self._name_)
+
+    def __hash__(self):
+        return hash(self._name_)
+
+    def __reduce_ex__(self, proto):
+        return (type(self), (self._value_,))
+
+    @classmethod
+    def has_value(cls, value):
+        #return tagId in set(itm.value for itm in cls) # slower
+        return value in cls._value2member_map_
+
+    @classmethod
+    def has_name(cls, name):
+        return name in cls._member_map_
+
+
+class SlotsRecord(object):
+    """ Base for records with fixed set of fields, stored in slots
+
+    Behaves like SimpleNamespace for fields listed in __slots__ of subclasses,
+    but without per-instance dict; fields which were never set are missing.
+    Subclasses may include '__dict__' in their slots to allow other fields.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+    @classmethod
+    def slotNames(cls):
+        names = cls.__dict__.get('_slot_names')
+        if names is None:
+            names = []
+            for base in reversed(cls.__mro__):
+                for name in base.__dict__.get('__slots__', ()):
+                    if name not in ('__dict__', '__weakref__',) and name not in names:
+                        names.append(name)
+            names = tuple(names)
+            cls._slot_names = names
+        return names
+
+    def fieldNames(self):
+        """ Returns names of all fields which are set in this record
+        """
+        names = [name for name in self.slotNames() if hasattr(self, name)]
+        if hasattr(self, '__dict__'):
+            names.extend(self.__dict__.keys())
+        return names
+
+    def fieldsDict(self):
+        return { name: getattr(self, name) for name in self.fieldNames() }
+
+    def __repr__(self):
+        return "{:s}({:s})".format(type(self).__name__, \
+          ", ".join("{:s}={!r}".format(k, v) for k, v in self.fieldsDict().items()))
+
+
 LABVIEW_COLOR_PALETTE_256 = [
     0xF1F1F1, 0xFFFFCC, 0xFFFF99, 0xFFFF66, 0xFFFF33, 0xFFFF00, 0xFFCCFF, 0xFFCCCC,
     0xFFCC99, 0xFFCC66, 0xFFCC33, 0xFFCC00, 0xFF99FF, 0xFF99CC, 0xFF9999, 0xFF9966,
@@ -97,6 +238,22 @@ LABVIEW_COLOR_PALETTE_2 = [
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
+def lazyImport(name):
+    """ Imports module which will only be executed on first access to its attribute
+
+    Allows modules with large definition tables to not slow down the tool
+    startup, if the command does not need them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
 def getPrettyStrFromRsrcType(rsrc_ident):
     """ Gives alphanumeric string representation of a 4-byte identifier, like block ident
     """
@@ -121,10 +278,31 @@ def getRsrcTypeFromPrettyStr(pretty_ident):
     return rsrc_ident
 
 def enumOrIntToName(val):
-    if isinstance(val, enum.IntEnum) or isinstance(val, enum.Enum):
+    if isinstance(val, (enum.Enum, ENUM_TAGS,)):
         return val.name
     return str(val)
 
+def exportDictValue(val):
+    """ Converts parsed property value into plain dicts, lists and scalars
+
+    Objects which have exportDict() method are converted by calling it.
+    """
+    if isinstance(val, (enum.Enum, ENUM_TAGS,)):
+        return val.name
+    if isinstance(val, (list, tuple,)):
+        return [exportDictValue(itm) for itm in val]
+    if isinstance(val, dict):
+        return { k: exportDictValue(v) for k, v in val.items() }
+    if isinstance(val, (bytearray, memoryview,)):
+        return bytes(val)
+    if isinstance(val, SimpleNamespace):
+        return { k: exportDictValue(v) for k, v in vars(val).items() }
+    if isinstance(val, SlotsRecord):
+        return { k: exportDictValue(v) for k, v in val.fieldsDict().items() }
+    if hasattr(val, 'exportDict'):
+        return val.exportDict()
+    return val
+
 def decodeVersion(vcode):
     ver = {}
     ver['major'] = ((vcode >> 28) & 0x0F) * 10 + ((vcode >> 24) & 0x0F)
@@ -187,16 +365,69 @@ def isGreaterOrEqVersion(ver, major, minor = None, bugfix = None, stage = None):
 def isSmallerVersion(ver, *args, **kwargs):
     return not isGreaterOrEqVersion(ver, *args, **kwargs)
 
+# Lookup tables for conversions of enums, built on first use of each enum class
+ENUM_MEMBER_BY_VALUE = {}
+ENUM_VALUE_BY_LOWER_NAME = {}
+ENUM_BITFIELDS = {}
+
+def enumMemberByValueMap(EnumClass):
+    """ Returns dict of enum members by value; aliases are not included
+    """
+    members = ENUM_MEMBER_BY_VALUE.get(EnumClass)
+    if members is None:
+        members = {}
+        for en in EnumClass:
+            members.setdefault(en.value, en)
+        ENUM_MEMBER_BY_VALUE[EnumClass] = members
+    return members
+
+def enumValueByLowerNameMap(EnumClass):
+    """ Returns dict of enum values by lower case name; aliases are not included
+    """
+    values = ENUM_VALUE_BY_LOWER_NAME.get(EnumClass)
+    if values is None:
+        values = {}
+        for en in EnumClass:
+            values.setdefault(en.name.lower(), en.value)
+        ENUM_VALUE_BY_LOWER_NAME[EnumClass] = values
+    return values
+
+def enumBitfieldsList(EnumClass):
+    """ Returns list of bitfields within enum of masks
+
+    Each bitfield is a tuple of name, mask, shift of the mask, and whether
+    the name is a default bit name.
+    """
+    bitfields = ENUM_BITFIELDS.get(EnumClass)
+    if bitfields is None:
+        bitfields = []
+        for mask in EnumClass:
+            nshift = getFirstSetBitPos(mask.value) - 1 if mask.value != 0 else 0
+            isBitName = re.match("(^Bit[0-9]*$)", mask.name) is not None
+            bitfields.append( (mask.name, mask.value, nshift, isBitName,) )
+        bitfields = tuple(bitfields)
+        ENUM_BITFIELDS[EnumClass] = bitfields
+    return bitfields
+
+def enumOrIntFromVal(EnumClass, value):
+    """ Returns enum member with given value, or the value if there is no such member
+    """
+    return enumMemberByValueMap(EnumClass).get(value, value)
+
 def stringFromValEnumOrInt(EnumClass, value):
-    for en in EnumClass:
-        if value == en.value:
-            return en.name
+    try:
+        en = enumMemberByValueMap(EnumClass).get(value)
+    except TypeError: # Unhashable value cannot be within enum
+        en = None
+    if en is not None:
+        return en.name
     return str(value)
 
 def valFromEnumOrIntString(EnumClass, strval):
-    for en in EnumClass:
-        if str(strval).lower() == en.name.lower():
-            return en.value
+    values = enumValueByLowerNameMap(EnumClass)
+    lowval = str(strval).lower()
+    if lowval in values:
+        return values[lowval]
     return int(strval, 0)
 
 def getFirstSetBitPos(n):
@@ -205,29 +436,27 @@ def getFirstSetBitPos(n):
 def exportXMLBitfields(EnumClass, subelem, value, skip_mask=0):
     """ Export bitfields of an enum stored in int to ElementTree properties
     """
-    for mask in EnumClass:
-        if ((mask.value & skip_mask) != 0): # Skip fields given as mask
+    for name, mask, nshift, isBitName in enumBitfieldsList(EnumClass):
+        if ((mask & skip_mask) != 0): # Skip fields given as mask
             continue
         # Add only properties which have bit set or have non-default bit name
-        addProperty = ((value & mask.value) != 0) or (not re.match("(^Bit[0-9]*$)", mask.name))
+        addProperty = ((value & mask) != 0) or (not isBitName)
         if not addProperty:
             continue
-        nshift = getFirstSetBitPos(mask.value) - 1
-        subelem.set(mask.name, "{:d}".format( (value & mask.value) >> nshift))
+        subelem.set(name, "{:d}".format( (value & mask) >> nshift))
 
 def importXMLBitfields(EnumClass, subelem):
     """ Import bitfields of an enum from ElementTree properties to int
     """
     value = 0
-    for mask in EnumClass:
+    for name, mask, nshift, isBitName in enumBitfieldsList(EnumClass):
         # Skip non-existing
-        propval = subelem.get(mask.name)
+        propval = subelem.get(name)
         if propval is None:
             continue
         propval = int(propval, 0)
         # Got integer value; mark bits in resulting value
-        nshift = getFirstSetBitPos(mask.value) - 1
-        value |= ((propval << nshift) & mask.value)
+        value |= ((propval << nshift) & mask)
     return value
 
 def crypto_xor8320_decrypt(data):
@@ -254,6 +483,96 @@ def crypto_xor8320_encrypt(data):
         key = nval ^ rol(key, 1, 32)
     return out
 
+def pixelsUnpackTables(bpp):
+    """ Returns translation tables which extract each pixel from a packed byte
+    """
+    ppb = 8 // bpp
+    mask = (1 << bpp) - 1
+    return [ bytes(((i >> (8 - bpp*(k+1))) & mask) for i in range(256)) for k in range(ppb) ]
+
+def pixelsPackTables(bpp):
+    """ Returns translation tables which move a pixel to its place in packed byte
+    """
+    ppb = 8 // bpp
+    mask = (1 << bpp) - 1
+    return [ bytes(((i & mask) << (8 - bpp*(k+1))) for i in range(256)) for k in range(ppb) ]
+
+PIXELS_UNPACK_TABLES = { bpp: pixelsUnpackTables(bpp) for bpp in (1, 2, 4) }
+PIXELS_PACK_TABLES = { bpp: pixelsPackTables(bpp) for bpp in (1, 2, 4) }
+
+# Imported on first use by importNumpy(); None if the module is not installed
+numpy = False
+
+def importNumpy():
+    """ Returns numpy module, or None if it is not installed
+
+    Importing numpy takes a while, so it is only done when pixels are converted.
+    """
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as numpy_module
+        except ImportError:
+            numpy_module = None
+        numpy = numpy_module
+    return numpy
+
+def unpackPixelsToBytes(data, bpp):
+    """ Converts packed 1/2/4bpp image data to one byte per pixel
+
+    Uses numpy if available; otherwise each pixel position within byte is
+    extracted for all bytes at once, by bytes.translate().
+    """
+    if bpp == 8:
+        return bytes(data)
+    if bpp not in PIXELS_UNPACK_TABLES:
+        raise ValueError("Unsupported pixel BPP")
+    ppb = 8 // bpp
+    numpy = importNumpy()
+    if numpy is not None:
+        arr = numpy.frombuffer(data, dtype=numpy.uint8)
+        if bpp == 1:
+            return numpy.unpackbits(arr).tobytes()
+        out = numpy.empty((len(arr), ppb), dtype=numpy.uint8)
+        mask = (1 << bpp) - 1
+        for k in range(ppb):
+            out[:,k] = (arr >> (8 - bpp*(k+1))) & mask
+        return out.tobytes()
+    data = bytes(data)
+    out = bytearray(len(data) * ppb)
+    for k, tbl in enumerate(PIXELS_UNPACK_TABLES[bpp]):
+        out[k::ppb] = data.translate(tbl)
+    return bytes(out)
+
+def packBytesToPixels(data, bpp):
+    """ Converts one byte per pixel image data to packed 1/2/4bpp
+
+    Reverses unpackPixelsToBytes(); the data length should be multiplication
+    of pixels per byte, incomplete byte at end is dropped.
+    """
+    if bpp == 8:
+        return bytes(data)
+    if bpp not in PIXELS_PACK_TABLES:
+        raise ValueError("Unsupported pixel BPP")
+    ppb = 8 // bpp
+    data_len = len(data) // ppb
+    numpy = importNumpy()
+    if numpy is not None:
+        arr = numpy.frombuffer(data, dtype=numpy.uint8)[:data_len*ppb].reshape(data_len, ppb)
+        if bpp == 1:
+            return numpy.packbits(arr & 1, axis=None).tobytes()
+        out = numpy.zeros(data_len, dtype=numpy.uint8)
+        mask = (1 << bpp) - 1
+        for k in range(ppb):
+            out |= (arr[:,k] & mask) << (8 - bpp*(k+1))
+        return out.tobytes()
+    data = bytes(data[:data_len*ppb])
+    # OR of all the positions is done on big integers, to avoid per-byte loop
+    val = 0
+    for k, tbl in enumerate(PIXELS_PACK_TABLES[bpp]):
+        val |= int.from_bytes(data[k::ppb].translate(tbl), byteorder='big', signed=False)
+    return val.to_bytes(data_len, byteorder='big', signed=False)
+
 def readVariableSizeFieldU2p2(bldata):
     """ Reads VI field which is either 16-bit or 32-bit, depending on first bit
 
@@ -16,15 +16,21 @@ import sys
 import re
 import os
 import enum
+import base64
 import binascii
 from ctypes import *
 from hashlib import md5
+from io import BytesIO
 
 import LVblock
 import LVdatatype
+import LVbinmodel
 import LVxml as ET
 from LVmisc import *
 
+LVheapquery = lazyImport('LVheapquery')
+LVdiff = lazyImport('LVdiff')
+
 class FILE_FMT_TYPE(enum.Enum):
     NONE = 0
     Control = 1
@@ -178,6 +184,15 @@ def getFileExtByType(ftype):
     }.get(ftype, 'rsrc')
     return fext
 
+def isRSRCFile(fname):
+    """ Checks whether given file starts with RSRC header
+    """
+    try:
+        with open(fname, "rb") as fh:
+            return fh.read(6) == b'RSRC\r\n'
+    except OSError:
+        return False
+
 def getExistingRSRCFileWithBase(filebase):
     """ Returns file extension associated with given FILE_FMT_TYPE member
     """
@@ -189,7 +204,12 @@ def getExistingRSRCFileWithBase(filebase):
     return ""
 
 class VI():
-    def __init__(self, po, rsrc_fh=None, xml_root=None, text_encoding='utf-8'):
+    def __init__(self, po, rsrc_fh=None, xml_root=None, text_encoding='utf-8', parse_blocks=None, bin_fh=None):
+        """ Creates VI object and loads it from RSRC file, XML or compact binary file.
+
+        If parse_blocks is a list of block idents, only these blocks are parsed
+        while loading RSRC file; other blocks are parsed when they are accessed.
+        """
         self.rsrc_fh = None
         self.src_fname = ""
         self.xml_root = None
@@ -199,6 +219,13 @@ class VI():
         self.textEncoding = text_encoding
         self.blocks = None
         self.rsrc_map = []
+        # Type Descriptors shared between nested lists within this VI
+        self.typeDescPool = LVdatatype.TDObjectPool()
+        self.parse_blocks = parse_blocks
+        # Files embedded within single-file XML, by name; bytes or XML tree roots
+        self.xml_payloads = {}
+        # Whether export should keep all created files as payloads for the caller, regardless of options
+        self.export_to_payloads = False
 
         if rsrc_fh is not None:
             self.dataSource = "rsrc"
@@ -206,6 +233,9 @@ class VI():
         elif xml_root is not None:
             self.dataSource = "xml"
             self.readXML(xml_root, po.xml)
+        elif bin_fh is not None:
+            self.dataSource = "bin"
+            self.readBin(bin_fh)
         else:
             self.dataSource = "new"
 
@@ -339,6 +369,8 @@ class VI():
 
         # Now when everything is ready, parse the blocks data
         for block in self.blocks.values():
+            if self.parse_blocks is not None and block.ident not in self.parse_blocks:
+                continue
             block.parseData()
 
         return (len(blocks) > 0)
@@ -371,6 +403,8 @@ class VI():
         blocks_arr = []
         for i, block_elem in enumerate(self.xml_root):
             ident = block_elem.tag
+            if ident == "Payloads":
+                continue # Not a block; already loaded by readXMLPayloads()
             bfactory = getattr(LVblock, ident, None)
             # Block may depend on some other informational blocks (ie. version info)
             # so give each block reference to the vi object
@@ -414,6 +448,24 @@ class VI():
         if encoding_str is not None:
             self.textEncoding = encoding_str
 
+        self.prepareRSRCHeaders(rsrc_type_id)
+
+        self.readXMLPayloads()
+
+        dataset_int1 = self.xml_root.get("Int1")
+        if dataset_int1 is not None:
+            self.binflsthead.dataset_int1 = int(dataset_int1, 0)
+        dataset_int2 = self.xml_root.get("Int2")
+        if dataset_int2 is not None:
+            self.binflsthead.dataset_int2 = int(dataset_int2, 0)
+
+        self.readXMLBlockData()
+        self.checkSanity()
+        pass
+
+    def prepareRSRCHeaders(self, rsrc_type_id):
+        """ Creates RSRC headers for a file which was not loaded from RSRC
+        """
         self.rsrc_headers = []
         rsrchead = RSRCHeader(self.po)
         rsrchead.rsrc_type = (c_ubyte * sizeof(rsrchead.rsrc_type)).from_buffer_copy(rsrc_type_id)
@@ -424,17 +476,93 @@ class VI():
 
         self.binflsthead = BlockInfoListHeader(self.po)
 
-        dataset_int1 = self.xml_root.get("Int1")
-        if dataset_int1 is not None:
-            self.binflsthead.dataset_int1 = int(dataset_int1, 0)
-        dataset_int2 = self.xml_root.get("Int2")
-        if dataset_int2 is not None:
-            self.binflsthead.dataset_int2 = int(dataset_int2, 0)
+    def readBinBlockData(self, block_list):
+        """ Read data sections for all Blocks from compact binary records.
+            After this function, `self.blocks` is filled.
+        """
+        blocks_arr = []
+        for ident, sections in block_list:
+            pretty_ident = getPrettyStrFromRsrcType(ident)
+            bfactory = getattr(LVblock, pretty_ident, None)
+            # Block may depend on some other informational blocks (ie. version info)
+            # so give each block reference to the vi object
+            if isinstance(bfactory, type):
+                if (self.po.verbose > 1):
+                    print("{:s}: Block {:s} recognized".format(self.src_fname,pretty_ident))
+                block = bfactory(self, self.po)
+            else:
+                block = LVblock.Block(self, self.po)
+            block.initWithBinEarly(ident, sections)
+            blocks_arr.append(block)
 
-        self.readXMLBlockData()
+        # Create Array of Block Data
+        blocks = {}
+        for i, block in enumerate(blocks_arr):
+            blocks[block.ident] = block
+        self.blocks = blocks
+
+        # Late part of initialization, which requires all blocks to be already present
+        for block in self.blocks.values():
+            block.initWithBinLate()
+
+        # Now when everything is ready, parse the blocks data
+        for block in self.blocks.values():
+            block.parseData()
+
+        return (len(blocks) > 0)
+
+    def readBin(self, fh):
+        self.src_fname = fh.name
+        head, block_list = LVbinmodel.readBinModel(fh)
+        rsrc_type_id, dataset_int1, dataset_int2, self.textEncoding = head
+        self.ftype = recognizeFileTypeFromRsrcType(rsrc_type_id)
+
+        self.prepareRSRCHeaders(rsrc_type_id)
+        self.binflsthead.dataset_int1 = dataset_int1
+        self.binflsthead.dataset_int2 = dataset_int2
+
+        self.readBinBlockData(block_list)
         self.checkSanity()
         pass
 
+    def readXMLPayloads(self):
+        """ Read files embedded within the XML, if it was exported as single file
+        """
+        payloads_elem = self.xml_root.find("Payloads")
+        if payloads_elem is None:
+            return
+        for subelem in payloads_elem:
+            if subelem.tag != "Payload":
+                raise AttributeError("Payloads contain unexpected tag '{}'".format(subelem.tag))
+            fname = subelem.get("File")
+            fmt = subelem.get("Format")
+            if fmt == "xml":
+                if len(subelem) != 1:
+                    raise AttributeError("Payload '{}' should contain one XML root".format(fname))
+                self.xml_payloads[fname] = subelem[0]
+            elif fmt == "base64":
+                self.xml_payloads[fname] = base64.b64decode(subelem.text or "")
+            else:
+                raise NotImplementedError("Unsupported Payload '{}' Format '{}'".format(fname,fmt))
+        pass
+
+    def exportXMLPayloads(self, elem):
+        """ Embed files created during XML export into the XML, for single file export
+        """
+        if len(self.xml_payloads) < 1:
+            return
+        payloads_elem = ET.SubElement(elem, "Payloads")
+        for fname, payload in self.xml_payloads.items():
+            subelem = ET.SubElement(payloads_elem, "Payload")
+            subelem.set("File", fname)
+            if isinstance(payload, bytes):
+                subelem.set("Format", "base64")
+                subelem.text = base64.b64encode(payload).decode('ascii')
+            else:
+                subelem.set("Format", "xml")
+                subelem.append(payload)
+        pass
+
     def updateRSRCData(self):
         """ Updates RAW data stored in each block to changes in properties
         """
@@ -530,6 +658,48 @@ class VI():
         self.resaveRSRCHeaders(fh)
         pass
 
+    def saveLLBFromFiles(self, fh, member_fnames):
+        """ Creates LLB file with given files as members, streaming their content
+
+        Content of the member files goes directly to output, in the same order as
+        the list; only one chunk of a file is in memory at a time. Block Info and
+        section names are placed after the data anyway, so they are filled in
+        when all members are written.
+        """
+        if len(member_fnames) < 1:
+            raise ValueError("LLB needs at least one member file, as empty UCRF block cannot be stored")
+        self.src_fname = fh.name
+        self.dataSource = "new"
+        self.ftype = FILE_FMT_TYPE.LLB
+        rsrc_type_id = getRsrcTypeForFileType(self.ftype)
+        self.rsrc_headers = []
+        for i in range(2):
+            rsrchead = RSRCHeader(self.po)
+            rsrchead.rsrc_type = (c_ubyte * sizeof(rsrchead.rsrc_type)).from_buffer_copy(rsrc_type_id)
+            self.rsrc_headers.append(rsrchead)
+        self.binflsthead = BlockInfoListHeader(self.po)
+
+        block = LVblock.UCRF(self, self.po)
+        block.initWithFiles(member_fnames)
+        self.blocks = { block.ident: block }
+
+        # Write header, though it is not completely filled yet
+        rsrchead = self.rsrc_headers[0]
+        fh.write((c_ubyte * sizeof(rsrchead)).from_buffer_copy(rsrchead))
+
+        all_blocks = self.blocks.values()
+        section_names = bytearray()
+        if (self.po.verbose > 0):
+            print("{}: Writing RSRC block {} data from {:d} files".format(self.src_fname,block.ident,len(member_fnames)))
+        block.header.starts = block.saveRSRCDataFromFiles(fh, section_names)
+
+        rsrchead.rsrc_info_offset = fh.tell()
+        rsrchead.rsrc_data_size = rsrchead.rsrc_info_offset - rsrchead.rsrc_data_offset
+
+        self.saveRSRCInfo(fh, all_blocks, section_names)
+        self.resaveRSRCHeaders(fh)
+        pass
+
     def exportXMLRoot(self):
         """ Creates root of the XML export tree
         """
@@ -559,13 +729,16 @@ class VI():
         """
         elem = self.exportXMLRoot()
 
+        self.xml_payloads = {}
         for ident, block in self.blocks.items():
             if (self.po.verbose > 0):
                 print("{}: Writing BIN block {}".format(self.src_fname,ident))
             subelem = block.exportXMLTree(simple_bin=True)
             elem.append(subelem)
-
-        ET.pretty_element_tree_heap(elem)
+        if not self.export_to_payloads:
+            self.exportXMLPayloads(elem)
+            # Indentation is only needed when the tree is written as XML text
+            ET.pretty_element_tree_heap(elem)
         return elem
 
     def exportXMLTree(self):
@@ -573,18 +746,66 @@ class VI():
         """
         elem = self.exportXMLRoot()
 
+        self.xml_payloads = {}
         for ident, block in self.blocks.items():
             if (self.po.verbose > 0):
                 print("{}: Writing block {}".format(self.src_fname,ident))
             subelem = block.exportXMLTree()
             elem.append(subelem)
-
-        ET.pretty_element_tree_heap(elem)
+        if not self.export_to_payloads:
+            self.exportXMLPayloads(elem)
+            # Indentation is only needed when the tree is written as XML text
+            ET.pretty_element_tree_heap(elem)
         return elem
 
+    def exportBin(self, fh, simple_bin=False):
+        """ Export the file data into compact binary records
+
+        If simple_bin is set, all sections are stored as raw data, like in BIN files with XML glue.
+        """
+        writer = LVbinmodel.BinModelWriter(fh)
+        writer.writeHead(getRsrcTypeForFileType(self.ftype), self.binflsthead.dataset_int1, \
+          self.binflsthead.dataset_int2, self.textEncoding)
+        for ident, block in self.blocks.items():
+            if (self.po.verbose > 0):
+                print("{}: Writing block {}".format(self.src_fname,ident))
+            block.exportBinRecords(writer, simple_bin=simple_bin)
+        writer.writeEnd()
+
+    def to_dict(self):
+        """ Export the file data into dict of plain values
+
+        Type Descriptors, Default Fill and heap nodes are given in their parsed
+        form; other blocks are converted from XML export made in memory. No files
+        are written - content which XML export would store in separate files
+        is included as bytes.
+        """
+        d = { 'type': getRsrcTypeForFileType(self.ftype).decode('ascii'), 'encoding': self.textEncoding }
+        if self.ftype == FILE_FMT_TYPE.LLB:
+            for name, val in (('int1', self.binflsthead.dataset_int1,), ('int2', self.binflsthead.dataset_int2,),):
+                if val is not None:
+                    d[name] = val
+
+        self.xml_payloads = {}
+        self.export_to_payloads = True
+        try:
+            blocks = {}
+            for ident, block in self.blocks.items():
+                if (self.po.verbose > 0):
+                    print("{}: Converting block {}".format(self.src_fname,ident))
+                block_dict = block.exportDict()
+                blocks[block_dict['ident']] = block_dict
+        finally:
+            self.export_to_payloads = False
+            self.xml_payloads = {}
+        d['blocks'] = blocks
+        return d
+
     def checkSanity(self):
         ret = True
         for ident, block in self.blocks.items():
+            if self.parse_blocks is not None and ident not in self.parse_blocks:
+                continue
             block.parseData()
             if not block.checkSanity():
                 if (self.po.verbose > 0):
@@ -660,6 +881,102 @@ class VI():
         BDPW.updateSectionData()
         return BDPW
 
+    def memberSources(self, parse_blocks=(b'LVSR', b'vers',)):
+        """ Returns list of (name, VI) tuples of this file and all its LLB members
+
+        Members are loaded from UCRF block sections, with given blocks parsed;
+        name of this file is empty, names of members include names of containing
+        members, separated by ':'. Members which fail to load are skipped.
+        """
+        sources = [("", self,)]
+        UCRF = self.get('UCRF')
+        if UCRF is None:
+            return sources
+        for snum, section in UCRF.sections.items():
+            if section.name_text is not None:
+                member_name = section.name_text.decode(self.textEncoding, errors="replace")
+            else:
+                member_name = "{:d}".format(snum)
+            member_fh = BytesIO(UCRF.getData(section_num=snum).read())
+            member_fh.name = "{}:{}".format(self.src_fname, member_name)
+            try:
+                member = VI(self.po, rsrc_fh=member_fh, text_encoding=self.textEncoding, \
+                  parse_blocks=parse_blocks)
+            except Exception as ex:
+                if (self.po.verbose > 0):
+                    eprint("{}: Warning: Member not loaded, skipping it; {}".format(member_fh.name,str(ex)))
+                continue
+            for name, vi in member.memberSources(parse_blocks=parse_blocks):
+                sources.append( (member_name + (":" + name if len(name) > 0 else ""), vi,) )
+        return sources
+
+    def exportIconsSheet(self, fname):
+        """ Exports all icons from the RSRC file, and members of LLB, into one sprite sheet image
+
+        Each icon block type gets a column, each section of each file gets a row.
+        Returns list of (member_name, ident, section_num, x, y) for placed icons;
+        if there are no icons, the list is empty and no image is written.
+        """
+        rows = []
+        idents = []
+        for member_name, vi in self.memberSources():
+            icon_blocks = [block for block in vi.blocks.values() if isinstance(block, LVblock.ICON)]
+            for block in icon_blocks:
+                if block.ident not in idents:
+                    idents.append(block.ident)
+            for snum in sorted(set(snum for block in icon_blocks for snum in block.sections)):
+                rows.append( (member_name, vi, snum, { block.ident: block for block in icon_blocks },) )
+        if len(rows) < 1:
+            return []
+        from PIL import Image
+        cell_w = max(section.width for member_name, vi, snum, blocks in rows \
+          for block in blocks.values() for section in block.sections.values())
+        cell_h = max(section.height for member_name, vi, snum, blocks in rows \
+          for block in blocks.values() for section in block.sections.values())
+        sheet = Image.new("RGB", (cell_w * len(idents), cell_h * len(rows)), (255,255,255))
+        placement = []
+        for row, (member_name, vi, snum, blocks) in enumerate(rows):
+            for col, ident in enumerate(idents):
+                block = blocks.get(ident)
+                if block is None or snum not in block.sections:
+                    continue
+                block.parseData(section_num=snum)
+                icon = block.getIcon(section_num=snum)
+                x, y = col * cell_w, row * cell_h
+                sheet.paste(icon.convert("RGB"), (x, y))
+                placement.append( (member_name, block.ident, snum, x, y,) )
+                if (self.po.verbose > 1):
+                    print("{}: Icon {} section {} placed at ({:d},{:d})".format(vi.src_fname,block.ident,snum,x,y))
+        with open(fname, "wb") as sheet_fd:
+            sheet.save(sheet_fd, format="PNG")
+        return placement
+
+    def diff(self, other):
+        """ Returns list of LVdiff.DiffEntry with differences between this and other VI
+
+        Only sections which are stored differently are parsed and compared in detail.
+        """
+        return LVdiff.diffVI(self, other)
+
+    def queryHeaps(self, query, limit=None):
+        """ Returns list of entries within Front Panel and Block Diagram heaps matching the query
+
+        Heaps are searched in their raw form, without parsing. If limit is
+        given, the search stops after that many matches.
+        """
+        if not isinstance(query, LVheapquery.HeapQuery):
+            query = LVheapquery.HeapQuery(query)
+        matches = []
+        for block in self.blocks.values():
+            if not isinstance(block, LVblock.HeapVerb):
+                continue
+            for snum in block.sections:
+                for match in block.queryHeap(query, section_num=snum):
+                    matches.append(match)
+                    if limit is not None and len(matches) >= limit:
+                        return matches
+        return matches
+
     def printRSRCMap(self):
         # BlockSectionStart elements are really independent; but let's put them into some parent
         # for clarity. After all, all versions of LV create these next to each other.
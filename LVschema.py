@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC file format binary schema.
+
+    Declarative layouts of fixed-size records, compiled into struct formats.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+
+import struct
+
+from LVmisc import isGreaterOrEqVersion, isSmallerVersion
+
+
+INT_FORMAT_CHARS = {
+    (1, False): 'B', (1, True): 'b',
+    (2, False): 'H', (2, True): 'h',
+    (4, False): 'I', (4, True): 'i',
+    (8, False): 'Q', (8, True): 'q',
+}
+
+
+class SchemaField:
+    """ Single field within binary schema.
+
+    Field without a name is padding, and is stored as zeros.
+    Field with raw=True is a bytes string of given width; otherwise
+    the field is an integer of width 1, 2, 4 or 8.
+    Fields with 'align' are preceded by padding which makes the field
+    start at multiplication of given value, counted from start of the block.
+    Version range is given as tuples of isGreaterOrEqVersion() parameters;
+    the field exists if version >= ver_min and version < ver_max.
+    """
+    def __init__(self, name, width, signed=False, raw=False, align=1, ver_min=None, ver_max=None, default=None):
+        if not raw and name is not None and (width, signed) not in INT_FORMAT_CHARS:
+            raise AttributeError("Schema field '{}' has unsupported integer width {}".format(name, width))
+        self.name = name
+        self.width = width
+        self.signed = signed
+        self.raw = raw or (name is None)
+        self.align = align
+        self.ver_min = ver_min
+        self.ver_max = ver_max
+        if default is None:
+            default = (b'\0' * width) if self.raw else 0
+        self.default = default
+
+    def existsInVersion(self, ver):
+        if self.ver_min is not None and not isGreaterOrEqVersion(ver, *self.ver_min):
+            return False
+        if self.ver_max is not None and not isSmallerVersion(ver, *self.ver_max):
+            return False
+        return True
+
+    def formatChar(self):
+        if self.name is None:
+            return "{:d}x".format(self.width)
+        if self.raw:
+            return "{:d}s".format(self.width)
+        return INT_FORMAT_CHARS[(self.width, self.signed)]
+
+
+class BinarySchema:
+    """ Layout of a fixed-size binary record.
+
+    The list of fields is compiled into one struct.Struct for each version
+    and starting alignment, so that whole record can be read or written
+    by single call. Compiled layouts are cached within the schema.
+    """
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.max_align = max([1] + [fld.align for fld in fields])
+        self.compiled = {}
+
+    def compile(self, ver, start_offs=0):
+        """ Returns struct and list of stored fields for given version and offset.
+        """
+        align_phase = start_offs % self.max_align
+        key = (ver['major'], ver['minor'], ver['bugfix'], ver.get('stage', 0), align_phase,)
+        layout = self.compiled.get(key)
+        if layout is not None:
+            return layout
+        fmt = '>'
+        rec_fields = []
+        offs = align_phase
+        for fld in self.fields:
+            if not fld.existsInVersion(ver):
+                continue
+            if (offs % fld.align) > 0:
+                padding_len = fld.align - (offs % fld.align)
+                fmt += "{:d}x".format(padding_len)
+                offs += padding_len
+            fmt += fld.formatChar()
+            offs += fld.width
+            if fld.name is not None:
+                rec_fields.append(fld)
+        layout = (struct.Struct(fmt), rec_fields,)
+        self.compiled[key] = layout
+        return layout
+
+    def size(self, ver, start_offs=0):
+        """ Returns amount of bytes the record takes in given version.
+        """
+        rec_struct, rec_fields = self.compile(ver, start_offs)
+        return rec_struct.size
+
+    def clear(self, obj):
+        """ Sets all fields in given object to default values.
+        """
+        for fld in self.fields:
+            if fld.name is not None:
+                setattr(obj, fld.name, fld.default)
+
+    def parse(self, bldata, ver, obj):
+        """ Reads the record from stream and stores fields as attributes of obj.
+
+        Fields which do not exist in given version are left unchanged.
+        """
+        rec_struct, rec_fields = self.compile(ver, bldata.tell())
+        data_buf = bldata.read(rec_struct.size)
+        if len(data_buf) < rec_struct.size:
+            raise EOFError("Data block length {} too small for parsing {} data"\
+              .format(len(data_buf), self.name))
+        for fld, val in zip(rec_fields, rec_struct.unpack(data_buf)):
+            setattr(obj, fld.name, val)
+        return obj
+
+    def prepare(self, ver, obj, start_offs=0, **overrides):
+        """ Returns bytes of the record, with field values taken from obj.
+
+        Values given as keyword arguments take precedence over obj attributes.
+        """
+        rec_struct, rec_fields = self.compile(ver, start_offs)
+        vals = []
+        for fld in rec_fields:
+            if fld.name in overrides:
+                val = overrides[fld.name]
+            else:
+                val = getattr(obj, fld.name)
+            if fld.raw:
+                val = bytes(val[:fld.width])
+            else:
+                val = int(val)
+            vals.append(val)
+        return rec_struct.pack(*vals)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC file format support.
+
+Files written by XML export, and content-addressed store for them.
+
+When the store is enabled, binary and XML files created by export are named
+by hash of their content, and each is written only once; files with the same
+content, ie. standard icons or common typedefs, are shared between all VIs
+extracted with the same store.
+
+When single file export is enabled, the files are not written at all; they
+are kept as payloads of the VI object, and embedded into the main XML.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import re
+
+from io import BytesIO
+from hashlib import sha256
+
+import LVxml as ET
+
+
+def getStorePath(po):
+    """ Returns folder of the content-addressed store, or None if disabled
+    """
+    return getattr(po, 'store', None)
+
+
+def isSingleFileExport(po):
+    """ Returns whether exported files are to be embedded in the main XML
+    """
+    return getattr(po, 'single_file', False)
+
+
+def storeFileName(store_path, data_buf, fext):
+    """ Returns name of file within the store which would keep given data
+    """
+    digest = sha256(data_buf).hexdigest()
+    return os.path.join(store_path, digest[:2], "{:s}.{:s}".format(digest, fext))
+
+
+def isStoreFileName(fname):
+    """ Checks whether given file name looks like a name created by the store
+    """
+    return re.match('^[0-9a-f]{64}\\.[A-Za-z0-9]+$', os.path.basename(fname)) is not None
+
+
+def writeExportFile(vi, po, fname, data_buf):
+    """ Writes file created by XML export; returns name to reference it in XML
+
+    Without the store, data is written to given file name, and its base name is
+    returned. With the store enabled, data is placed in the store, under name
+    created from its hash, unless the same content is already there; the
+    returned name is then the stored file path relative to the main XML file.
+    For single file export, data becomes a payload of the VI.
+    """
+    if isSingleFileExport(po) or vi.export_to_payloads:
+        vi.xml_payloads[os.path.basename(fname)] = data_buf
+        return os.path.basename(fname)
+    store_path = getStorePath(po)
+    if store_path is None:
+        with open(fname, "wb") as out_fh:
+            out_fh.write(data_buf)
+        return os.path.basename(fname)
+
+    fext = os.path.splitext(fname)[1][1:]
+    if len(fext) < 1:
+        fext = "bin"
+    stored_fname = storeFileName(store_path, data_buf, fext)
+    if not os.path.exists(stored_fname):
+        if (po.verbose > 1):
+            print("{:s}: Storing new file for '{:s}'".format(stored_fname,os.path.basename(fname)))
+        os.makedirs(os.path.dirname(stored_fname), exist_ok=True)
+        # Other processes may export to the same store; replace is atomic
+        tmp_fname = "{:s}.{:d}.tmp".format(stored_fname, os.getpid())
+        with open(tmp_fname, "wb") as out_fh:
+            out_fh.write(data_buf)
+        os.replace(tmp_fname, stored_fname)
+    elif (po.verbose > 2):
+        print("{:s}: Reusing stored file for '{:s}'".format(stored_fname,os.path.basename(fname)))
+    xml_path = os.path.dirname(po.xml)
+    return os.path.relpath(stored_fname, xml_path if len(xml_path) > 0 else ".").replace(os.sep, '/')
+
+
+def writeExportXML(vi, po, fname, root):
+    """ Writes XML file created by XML export; returns name to reference it in XML
+
+    For single file export, the XML tree becomes a payload of the VI.
+    """
+    if isSingleFileExport(po) or vi.export_to_payloads:
+        vi.xml_payloads[os.path.basename(fname)] = root
+        return os.path.basename(fname)
+    bldata = BytesIO()
+    ET.ElementTree(root).write(bldata, encoding='utf-8', xml_declaration=True)
+    return writeExportFile(vi, po, fname, bldata.getvalue())
+
+
+def importFileName(vi, po, file_attr):
+    """ Returns path to file referenced in XML by given File attribute value
+
+    Relative names are within the folder of main XML file. If the file is not
+    there, but it has a name created by the store, and the store is enabled,
+    then the file is taken from the store.
+    """
+    bin_path = os.path.dirname(vi.src_fname)
+    if len(bin_path) > 0:
+        bin_fname = bin_path + '/' + file_attr
+    else:
+        bin_fname = file_attr
+    store_path = getStorePath(po)
+    if store_path is not None and not os.path.exists(bin_fname) and isStoreFileName(file_attr):
+        digest = os.path.basename(file_attr)
+        bin_fname = os.path.join(store_path, digest[:2], digest)
+    return bin_fname
+
+
+def readImportFile(vi, po, file_attr):
+    """ Returns content of file referenced in XML by given File attribute value
+
+    Payloads embedded in the main XML are used without accessing any files.
+    """
+    data_buf = vi.xml_payloads.get(file_attr)
+    if isinstance(data_buf, bytes):
+        return data_buf
+    with open(importFileName(vi, po, file_attr), "rb") as bin_fh:
+        data_buf = bin_fh.read()
+    return data_buf
+
+
+def readImportXML(vi, po, file_attr):
+    """ Returns root of XML tree referenced in XML by given File attribute value
+
+    Payloads embedded in the main XML are used without accessing any files.
+    """
+    root = vi.xml_payloads.get(file_attr)
+    if root is not None and not isinstance(root, bytes):
+        return root
+    tree = ET.parse(importFileName(vi, po, file_attr))
+    return tree.getroot()
@@ -3,6 +3,11 @@
 """ LabView RSRC file xml support.
 
 XML input/output support. Wrapped Python libraries, with any neccessary changes.
+
+Two backends are supported - ElementTree from Python standard library, and
+lxml if it is installed. Both produce the same XML files; lxml is faster at
+writing and parsing them. The backend is selected by setBackend(), before any
+trees are created.
 """
 
 # Copyright (C) 2019 Mefistotelis <mefistotelis@gmail.com>
@@ -10,9 +15,29 @@ XML input/output support. Wrapped Python libraries, with any neccessary changes.
 # This work is licensed under the terms of the MIT license.
 # For a copy, see <https://opensource.org/licenses/MIT>.
 
+import re
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import ElementTree,Element,Comment,SubElement,parse
 
+# The lxml module; imported on first use by importLxml(), None if not installed
+LET = False
+
+XML_BACKENDS = ("auto", "etree", "lxml",)
+
+# Name of currently selected backend; "auto" until the first tree is created or parsed
+backend = "auto"
+
+def importLxml():
+    """ Returns lxml.etree module, or None if it is not installed.
+    """
+    global LET
+    if LET is False:
+        try:
+            from lxml import etree as LET
+        except ImportError:
+            LET = None
+    return LET
+
 def et_escape_cdata_mind_binary(text):
     # escape character data
     try:
@@ -119,10 +144,135 @@ def safe_store_element_text(elem, text):
     if text is None:
         return
     if any(chr(ele) in text for ele in range(0,32)):
-        elem.append(CDATA(escape_cdata_control_chars(text)))
+        if backend == "lxml":
+            elem.text = LET.CDATA(escape_cdata_control_chars(text))
+        else:
+            elem.append(CDATA(escape_cdata_control_chars(text)))
     else:
         elem.text = text
 
 def unescape_safe_store_element_text(elem_text):
     text = unescape_cdata_control_chars(elem_text)
     return text
+
+# Comments and CDATA sections, which are written by lxml serialiser without changes
+LXML_RAW_SECTION_RE = re.compile(rb'(<!--.*?-->|<!\[CDATA\[.*?\]\]>)', re.DOTALL)
+
+def _lxml_fix_markup(data_buf):
+    """ Changes markup written by lxml to the form ElementTree writes.
+
+    Expects data without comments and CDATA. Raw '>' and '&' cannot appear
+    within text or attributes, so plain replacing is enough for most cases.
+    """
+    data_buf = data_buf.replace(b"/>", b" />").replace(b"&#9;", b"&#09;")
+    if b"></" not in data_buf:
+        return data_buf
+    # Element with empty text is written by lxml as start tag followed by end tag
+    parts = []
+    pos = 0
+    end = data_buf.find(b"></")
+    while end >= 0:
+        beg = data_buf.rfind(b"<", pos, end)
+        if beg >= 0 and data_buf[beg+1:beg+2] not in (b"/", b"!", b"?",):
+            end_tag = b"</" + data_buf[beg+1:end].split(None, 1)[0] + b">"
+            if data_buf.startswith(end_tag, end+1):
+                parts.append(data_buf[pos:end])
+                parts.append(b" />")
+                pos = end + 1 + len(end_tag)
+        end = data_buf.find(b"></", end + 1)
+    parts.append(data_buf[pos:])
+    return b"".join(parts)
+
+def lxml_fix_output(data_buf):
+    """ Changes XML written by lxml to be the same as written by ElementTree.
+    """
+    if b"<!" not in data_buf:
+        return _lxml_fix_markup(data_buf)
+    parts = LXML_RAW_SECTION_RE.split(data_buf)
+    for i in range(0, len(parts), 2):
+        parts[i] = _lxml_fix_markup(parts[i])
+    return b"".join(parts)
+
+class LxmlElementTree(object):
+    """ ElementTree replacement for lxml backend.
+
+    Writes XML in the same form as ElementTree from Python standard library.
+    """
+    def __init__(self, element=None, file=None):
+        self._root = element
+        if file is not None:
+            self._root = lxml_parse(file).getroot()
+
+    def getroot(self):
+        return self._root
+
+    def write(self, file_or_filename, encoding="us-ascii", xml_declaration=None):
+        data_buf = LET.tostring(self._root, encoding=encoding, xml_declaration=False, with_tail=True)
+        data_buf = lxml_fix_output(data_buf)
+        if xml_declaration or (xml_declaration is None and encoding.lower() not in ("utf-8", "us-ascii",)):
+            data_buf = "<?xml version='1.0' encoding='{:s}'?>\n".format(encoding).encode(encoding) + data_buf
+        if hasattr(file_or_filename, "write"):
+            file_or_filename.write(data_buf)
+        else:
+            with open(file_or_filename, "wb") as fh:
+                fh.write(data_buf)
+        pass
+
+def lxml_parse(source):
+    """ Parses XML file using lxml; drops comments, like ElementTree parser does.
+    """
+    parser = LET.XMLParser(remove_comments=True, remove_pis=True, resolve_entities=False,
+      no_network=True, huge_tree=True)
+    return LxmlElementTree(LET.parse(source, parser).getroot())
+
+def resolveBackend():
+    """ Selects the real library if "auto" backend is active.
+    """
+    if backend == "auto":
+        setBackend("lxml" if importLxml() is not None else "etree")
+
+def auto_ElementTree(*args, **kwargs):
+    resolveBackend()
+    return ElementTree(*args, **kwargs)
+
+def auto_Element(*args, **kwargs):
+    resolveBackend()
+    return Element(*args, **kwargs)
+
+def auto_Comment(*args, **kwargs):
+    resolveBackend()
+    return Comment(*args, **kwargs)
+
+def auto_SubElement(*args, **kwargs):
+    resolveBackend()
+    return SubElement(*args, **kwargs)
+
+def auto_parse(*args, **kwargs):
+    resolveBackend()
+    return parse(*args, **kwargs)
+
+def setBackend(name="auto"):
+    """ Selects library used for XML trees, their writing and parsing.
+
+    The "auto" backend is lxml if it is installed, ElementTree otherwise; it is
+    resolved when the first tree is created or parsed, so that commands which do
+    not touch XML do not import lxml. Trees created by one backend cannot be
+    mixed with trees of the other.
+    """
+    global backend, ElementTree, Element, Comment, SubElement, parse
+    if name == "auto":
+        ElementTree, Element, Comment, SubElement, parse = \
+          auto_ElementTree, auto_Element, auto_Comment, auto_SubElement, auto_parse
+    elif name == "lxml":
+        if importLxml() is None:
+            raise ImportError("XML backend '{:s}' requested, but the module is not installed".format(name))
+        ElementTree, Element, Comment, SubElement, parse = \
+          LxmlElementTree, LET.Element, LET.Comment, LET.SubElement, lxml_parse
+    elif name == "etree":
+        ElementTree, Element, Comment, SubElement, parse = \
+          ET.ElementTree, ET.Element, ET.Comment, ET.SubElement, ET.parse
+    else:
+        raise ValueError("Unknown XML backend '{:s}'".format(name))
+    backend = name
+
+setBackend()
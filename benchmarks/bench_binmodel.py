@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of round trip through XML against compact binary file.
+
+For each RSRC file, measures extraction and re-creation through XML with
+separate files, and through single compact binary file; also compares
+sizes of the intermediate files, and checks the re-created RSRC files
+against each other and against the original file.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LVxml as ET
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import gen_stress
+import bench_blocks
+
+
+INTERMEDIATE_FORMATS = ("xml", "binary",)
+
+
+def folderSize(path):
+    return sum(os.path.getsize(os.path.join(dirpath, fname)) \
+      for dirpath, dirnames, fnames in os.walk(path) for fname in fnames)
+
+
+def roundTrip(fname, fmt, work_dir, textcp):
+    """ Extracts RSRC file and re-creates it, using given intermediate format
+
+    Returns times of RSRC loading, writing the intermediate files, reading them
+    and saving new RSRC; then size of intermediate files, and the new file content.
+    """
+    fbase = os.path.splitext(os.path.basename(fname))[0]
+    xml_dir = os.path.join(work_dir, "xml")
+    os.makedirs(xml_dir)
+    xml_fname = os.path.join(xml_dir, fbase + (".xml" if fmt == "xml" else ".lvbx"))
+    new_fname = os.path.join(work_dir, "new_" + os.path.basename(fname))
+
+    po = gen_stress.newOptions(fname, xml_fname, textcp=textcp)
+    with open(fname, "rb") as rsrc_fh:
+        tm_start = time.perf_counter()
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp)
+        load_tm = time.perf_counter() - tm_start
+
+        tm_start = time.perf_counter()
+        with open(xml_fname, "wb") as xml_fh:
+            if fmt == "binary":
+                vi.exportBin(xml_fh)
+            else:
+                root = vi.exportXMLTree()
+                ET.ElementTree(root).write(xml_fh, encoding='utf-8', xml_declaration=True)
+        write_tm = time.perf_counter() - tm_start
+
+    po = gen_stress.newOptions(new_fname, xml_fname, textcp=textcp)
+    tm_start = time.perf_counter()
+    if fmt == "binary":
+        with open(xml_fname, "rb") as xml_fh:
+            vi = VI(po, bin_fh=xml_fh, text_encoding=textcp)
+    else:
+        tree = ET.parse(xml_fname)
+        vi = VI(po, xml_root=tree.getroot(), text_encoding=textcp)
+    read_tm = time.perf_counter() - tm_start
+
+    tm_start = time.perf_counter()
+    with open(new_fname, "wb") as rsrc_fh:
+        vi.saveRSRC(rsrc_fh)
+    save_tm = time.perf_counter() - tm_start
+
+    with open(new_fname, "rb") as rsrc_fh:
+        new_data = rsrc_fh.read()
+    return (load_tm, write_tm, read_tm, save_tm,), folderSize(xml_dir), new_data
+
+
+def benchmarkFile(fname, repeats, textcp):
+    best = {}
+    new_files = {}
+    for i in range(repeats):
+        for fmt in INTERMEDIATE_FORMATS:
+            with tempfile.TemporaryDirectory(prefix="lvbinmodel_") as work_dir:
+                times, size, new_data = roundTrip(fname, fmt, work_dir, textcp)
+            prev = best.get(fmt)
+            if prev is None or sum(times) < sum(prev[0]):
+                best[fmt] = (times, size,)
+            new_files[fmt] = new_data
+    with open(fname, "rb") as rsrc_fh:
+        orig_data = rsrc_fh.read()
+    identical = { fmt: (new_files[fmt] == orig_data) for fmt in INTERMEDIATE_FORMATS }
+    identical["same"] = (new_files["xml"] == new_files["binary"])
+    return best, identical
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress files by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress files; existing files are reused")
+
+    parser.add_argument('-s', '--scale', default=1.0, type=float,
+            help="multiplier for amounts of items in generated stress files")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of measurements of each file; best time is shown")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        fnames = [fname for name, fname, params in bench_blocks.generateStressFiles(gen_dir, po.scale)]
+
+    print("{:24s} {:>6s} {:>8s} {:>8s} {:>8s} {:>8s} {:>8s} {:>9s} {:>4s}".format("file", "format", \
+      "load", "write", "read", "save", "total", "size", "orig"))
+    for fname in fnames:
+        best, identical = benchmarkFile(fname, po.repeats, po.textcp)
+        for fmt in INTERMEDIATE_FORMATS:
+            times, size = best[fmt]
+            print("{:24s} {:>6s} {:8.1f} {:8.1f} {:8.1f} {:8.1f} {:8.1f} {:9d} {:>4s}".format(os.path.basename(fname), fmt, \
+              *[tm * 1000 for tm in times], sum(times) * 1000, size, "yes" if identical[fmt] else "NO"))
+        xml_times, xml_size = best["xml"]
+        bin_times, bin_size = best["binary"]
+        print("{:24s} {:>6s} {:>17s} {:7.2f}x {:>17s} {:7.2f}x {:8.1f}% {:>4s}".format("", "", "write+read:", \
+          (xml_times[1] + xml_times[2]) / (bin_times[1] + bin_times[2]), "total:", \
+          sum(xml_times) / sum(bin_times), 100.0 * bin_size / xml_size, "same" if identical["same"] else "DIFF"))
+    print("Times in ms, sizes in bytes; 'orig' tells if re-created RSRC is identical to the original;")
+    print("'write' and 'read' is the intermediate format, 'load' and 'save' is RSRC file.")
+    print("Last column of speedup line tells if both formats re-created identical RSRC.")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of load, parse, export and save times for each block type.
+
+Runs on synthetic stress files created by gen_stress.py, or on given RSRC
+files. Results are stored as JSON named after current git commit, so runs
+on different commits can be compared with --compare.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import json
+import argparse
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LVxml as ET
+from LVrsrcontainer import VI
+from LVmisc import eprint, getPrettyStrFromRsrcType
+
+import gen_stress
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Each preset scales up one part of the file, so that block timings can be attributed
+STRESS_PRESETS = [
+    ("template", {}),
+    ("heap", {'heap_nodes': 4000}),
+    ("typedescs", {'type_descs': 2000}),
+    ("array", {'array_len': 20000}),
+    ("links", {'link_objs': 1000}),
+    ("llb", {'heap_nodes': 200, 'type_descs': 50, 'link_objs': 20, 'llb_members': 20}),
+]
+
+STAGES = ("load", "parse", "export", "import", "save",)
+
+
+def currentCommit():
+    """ Returns short hash of git HEAD, with suffix if there are uncommitted changes
+    """
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], \
+          cwd=repo_dir, stderr=subprocess.DEVNULL).decode('ascii').strip()
+        changes = subprocess.check_output(["git", "status", "--porcelain", "-uno"], \
+          cwd=repo_dir, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    if len(changes.strip()) > 0:
+        commit += "-dirty"
+    return commit
+
+
+def presetParams(params, scale):
+    """ Returns options for gen_stress, with amounts multiplied by scale
+    """
+    po = argparse.Namespace(heap_nodes=0, type_descs=0, array_len=0, cluster_fills=0, link_objs=0, llb_members=0, \
+      template=gen_stress.DEFAULT_TEMPLATE, textcp="mac_roman")
+    for name, val in params.items():
+        if name == 'llb_members':
+            setattr(po, name, val)
+        else:
+            setattr(po, name, max(int(val * scale), 1))
+    return po
+
+
+def generateStressFiles(gen_dir, scale):
+    """ Creates stress files for all presets, reusing ones already in gen_dir
+
+    Returns list of (name, file name, params) tuples.
+    """
+    stress_files = []
+    for name, params in STRESS_PRESETS:
+        gen_po = presetParams(params, scale)
+        fext = "llb" if gen_po.llb_members > 0 else "vi"
+        fname = os.path.join(gen_dir, "stress_{:s}_x{:g}.{:s}".format(name, scale, fext))
+        if not os.path.exists(fname):
+            print("{:s}: Generating".format(fname))
+            with tempfile.TemporaryDirectory(prefix="lvstress_", dir=gen_dir) as work_dir:
+                gen_stress.generateStressFile(gen_po, fname, work_dir)
+        desc = { k: v for k, v in vars(gen_po).items() if k not in ('template','textcp',) }
+        stress_files.append((name, fname, desc,))
+    return stress_files
+
+
+def addTime(times, ident, stage, tm):
+    pretty_ident = getPrettyStrFromRsrcType(ident) if isinstance(ident, bytes) else ident
+    times.setdefault(pretty_ident, {})[stage] = tm
+
+
+def measureFile(fname, work_dir, textcp):
+    """ Runs all stages once on given file, returns times per block and stage
+
+    Times of stages which are not done per block are stored under '*' key.
+    """
+    times = {}
+    fbase = os.path.splitext(os.path.basename(fname))[0]
+    xml_fname = os.path.join(work_dir, fbase + ".xml")
+    po = gen_stress.newOptions(fname, xml_fname, textcp=textcp)
+
+    with open(fname, "rb") as rsrc_fh:
+        tm_start = time.perf_counter()
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp, parse_blocks=())
+        addTime(times, '*', "load", time.perf_counter() - tm_start)
+        for ident, block in vi.blocks.items():
+            tm_start = time.perf_counter()
+            block.readRawDataSections(section_count=0xffffffff)
+            addTime(times, ident, "load", time.perf_counter() - tm_start)
+
+        for ident, block in vi.blocks.items():
+            tm_start = time.perf_counter()
+            for snum in block.sections:
+                block.parseData(section_num=snum)
+            addTime(times, ident, "parse", time.perf_counter() - tm_start)
+
+        root = vi.exportXMLRoot()
+        for ident, block in vi.blocks.items():
+            tm_start = time.perf_counter()
+            root.append(block.exportXMLTree())
+            addTime(times, ident, "export", time.perf_counter() - tm_start)
+    ET.pretty_element_tree_heap(root)
+    with open(xml_fname, "wb") as xml_fh:
+        ET.ElementTree(root).write(xml_fh, encoding='utf-8', xml_declaration=True)
+
+    new_fname = os.path.join(work_dir, "new_" + os.path.basename(fname))
+    po = gen_stress.newOptions(new_fname, xml_fname, textcp=textcp)
+    tm_start = time.perf_counter()
+    tree = ET.parse(xml_fname)
+    vi = VI(po, xml_root=tree.getroot(), text_encoding=textcp)
+    addTime(times, '*', "import", time.perf_counter() - tm_start)
+
+    for ident, block in vi.blocks.items():
+        tm_start = time.perf_counter()
+        block.updateData()
+        addTime(times, ident, "save", time.perf_counter() - tm_start)
+    # Same as saveRSRC(), but without updating the data again
+    tm_start = time.perf_counter()
+    with open(new_fname, "wb") as rsrc_fh:
+        all_blocks, section_names = vi.saveRSRCData(rsrc_fh)
+        vi.saveRSRCInfo(rsrc_fh, all_blocks, section_names)
+        vi.resaveRSRCHeaders(rsrc_fh)
+    addTime(times, '*', "save", time.perf_counter() - tm_start)
+    return times
+
+
+def benchmarkFile(name, fname, params, repeats, textcp):
+    """ Measures given file several times, keeping the best time for each stage
+    """
+    best = {}
+    for i in range(repeats):
+        with tempfile.TemporaryDirectory(prefix="lvbench_") as work_dir:
+            times = measureFile(fname, work_dir, textcp)
+        for ident, stages in times.items():
+            for stage, tm in stages.items():
+                prev = best.setdefault(ident, {}).get(stage)
+                if prev is None or tm < prev:
+                    best[ident][stage] = tm
+    totals = { stage: sum(stages.get(stage, 0.0) for stages in best.values()) for stage in STAGES }
+    return { 'name': name, 'file': os.path.basename(fname), 'size': os.path.getsize(fname), \
+      'params': params, 'totals': totals, 'blocks': best }
+
+
+def printResults(results):
+    for entry in results['files']:
+        print("{:s} ({:d} bytes):".format(entry['name'], entry['size']))
+        print("  {:6s} ".format("block") + " ".join("{:>9s}".format(stage) for stage in STAGES))
+        rows = [("total", entry['totals'],)] + sorted(entry['blocks'].items())
+        for ident, stages in rows:
+            print("  {:6s} ".format(ident) + " ".join("{:9s}".format("") if stage not in stages else \
+              "{:9.2f}".format(stages[stage] * 1000) for stage in STAGES))
+    pass
+
+
+def printComparison(old_results, results, min_time):
+    """ Prints per-block stage times which changed between two result sets
+    """
+    print("Comparing {:s} (old) with {:s} (new); times in ms".format(old_results['commit'], results['commit']))
+    old_entries = { entry['name']: entry for entry in old_results['files'] }
+    for entry in results['files']:
+        old_entry = old_entries.get(entry['name'])
+        if old_entry is None:
+            print("{:s}: not in old results".format(entry['name']))
+            continue
+        if old_entry['params'] != entry['params']:
+            eprint("{:s}: Warning: Files were generated with different parameters".format(entry['name']))
+        print("{:s}:".format(entry['name']))
+        print("  {:6s} {:6s} {:>10s} {:>10s} {:>8s}".format("block", "stage", "old", "new", "speedup"))
+        rows = [("total", old_entry['totals'], entry['totals'],)]
+        for ident, stages in sorted(entry['blocks'].items()):
+            rows.append((ident, old_entry['blocks'].get(ident, {}), stages,))
+        for ident, old_stages, stages in rows:
+            for stage in STAGES:
+                tm, old_tm = stages.get(stage), old_stages.get(stage)
+                if tm is None or old_tm is None or max(tm, old_tm) < min_time:
+                    continue
+                print("  {:6s} {:6s} {:10.2f} {:10.2f} {:7.2f}x".format(ident, stage, \
+                  old_tm * 1000, tm * 1000, old_tm / tm if tm > 0 else float('inf')))
+    pass
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress files by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress files; existing files are reused,"
+            " which keeps input the same across commits")
+
+    parser.add_argument('-s', '--scale', default=1.0, type=float,
+            help="multiplier for amounts of items in generated stress files")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of measurements of each file; best time is stored")
+
+    parser.add_argument('-o', '--output', default=None, type=str,
+            help="name of JSON results file (default is commit hash within \"{:s}\")"\
+              .format(RESULTS_DIR))
+
+    parser.add_argument('-c', '--compare', default=None, type=str,
+            help="JSON results file from previous run to compare with")
+
+    parser.add_argument('--min-time', default=0.001, type=float,
+            help="minimal time in seconds for a stage to be listed in comparison")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    commit = currentCommit()
+    results = { 'tool': "bench_blocks", 'version': __version__, 'commit': commit, \
+      'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(), \
+      'repeats': po.repeats, 'scale': po.scale, 'files': [] }
+
+    if len(po.files) > 0:
+        bench_files = [(os.path.basename(fname), fname, None,) for fname in po.files]
+        for name, fname, params in bench_files:
+            results['files'].append(benchmarkFile(name, fname, params, po.repeats, po.textcp))
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        bench_files = generateStressFiles(gen_dir, po.scale)
+        for name, fname, params in bench_files:
+            results['files'].append(benchmarkFile(name, fname, params, po.repeats, po.textcp))
+
+    printResults(results)
+
+    out_fname = po.output
+    if out_fname is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out_fname = os.path.join(RESULTS_DIR, "{:s}.json".format(commit))
+    with open(out_fname, "w") as out_fh:
+        json.dump(results, out_fh, indent=2)
+    print("{:s}: Results stored".format(out_fname))
+
+    if po.compare is not None:
+        with open(po.compare, "r") as old_fh:
+            old_results = json.load(old_fh)
+        printComparison(old_results, results, po.min_time)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of access to single Default Fill value within DFDS block.
+
+Compares parsing the whole DFDS section to find one fill, with building
+index of the section by skipping the data and parsing only the requested
+fill. Runs on a synthetic VI with many cluster defaults, each containing
+an array, or on given RSRC files.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import gen_stress
+
+
+def loadVI(fname, textcp):
+    """ Loads RSRC file without parsing any blocks, then parses Type Map
+    """
+    po = gen_stress.newOptions(fname, os.path.splitext(fname)[0] + ".xml", textcp=textcp)
+    with open(fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp, parse_blocks=())
+        for ident in ('VCTP', 'TM80',):
+            block = vi.get(ident)
+            if block is not None:
+                block.readRawDataSections(section_count=0xffffffff)
+                block.parseData()
+        vi.get_or_raise('DFDS').readRawDataSections(section_count=0xffffffff)
+    return vi
+
+
+def getByParse(vi, index):
+    DFDS = vi.get_or_raise('DFDS')
+    DFDS.parseData()
+    for df in DFDS.content:
+        if df.index == index:
+            return df
+    return None
+
+
+def getByIndex(vi, index):
+    DFDS = vi.get_or_raise('DFDS')
+    return DFDS.getDataFill(index)
+
+
+def measure(fname, textcp, get_func, index, lookups):
+    """ Measures first access to a fill, and further lookups of other fills
+
+    Returns times of first access and average lookup, and the fill found.
+    """
+    vi = loadVI(fname, textcp)
+    tm_start = time.perf_counter()
+    df = get_func(vi, index)
+    first_tm = time.perf_counter() - tm_start
+    tm_start = time.perf_counter()
+    for i in lookups:
+        get_func(vi, i)
+    lookup_tm = (time.perf_counter() - tm_start) / max(len(lookups), 1)
+    return first_tm, lookup_tm, df
+
+
+def measureMemory(fname, textcp, get_func, index):
+    """ Returns peak memory allocated during first access to a fill
+
+    Done separately from time measurement, as tracing allocations slows down the code.
+    """
+    vi = loadVI(fname, textcp)
+    tracemalloc.start()
+    get_func(vi, index)
+    peak_mem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak_mem
+
+
+def benchmarkFile(fname, repeats, textcp):
+    DFDS = loadVI(fname, textcp).get_or_raise('DFDS')
+    indexes = list(DFDS.getFillIndex().keys())
+    if len(indexes) < 1:
+        raise RuntimeError("File has no Default Fills")
+    # Take fill from the middle, so that half of the section is before it
+    index = indexes[len(indexes) // 2]
+    lookups = indexes[::max(len(indexes) // 100, 1)]
+    results = {}
+    for name, get_func in (("parse", getByParse,), ("index", getByIndex,),):
+        best = None
+        for i in range(repeats):
+            first_tm, lookup_tm, df = measure(fname, textcp, get_func, index, lookups)
+            if best is None or first_tm < best[0]:
+                best = (first_tm, lookup_tm, df,)
+        peak_mem = measureMemory(fname, textcp, get_func, index)
+        results[name] = best[:2] + (peak_mem, best[2],)
+    identical = results["parse"][3].prepareRSRCData() == results["index"][3].prepareRSRCData()
+    return len(indexes), index, results, identical
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress file by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress file; existing file is reused")
+
+    parser.add_argument('-c', '--cluster-fills', default=2000, type=int,
+            help="amount of cluster defaults in generated stress file (default is %(default)s)")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of measurements of each file; best time is shown")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        fname = os.path.join(gen_dir, "stress_fills_c{:d}.vi".format(po.cluster_fills))
+        if not os.path.exists(fname):
+            print("{:s}: Generating".format(fname))
+            with tempfile.TemporaryDirectory(prefix="lvstress_", dir=gen_dir) as work_dir:
+                gen_stress.generateVI(fname, work_dir, cluster_fills=po.cluster_fills, textcp=po.textcp)
+        fnames = [fname]
+
+    for fname in fnames:
+        count, index, results, identical = benchmarkFile(fname, po.repeats, po.textcp)
+        print("{:s}: {:d} fills, accessing TypeID {:d}".format(os.path.basename(fname), count, index))
+        print("  {:6s} {:>12s} {:>12s} {:>12s}".format("method", "first ms", "lookup ms", "peak KiB"))
+        for name, (first_tm, lookup_tm, peak_mem, df) in results.items():
+            print("  {:6s} {:12.2f} {:12.4f} {:12.1f}".format(name, first_tm * 1000, lookup_tm * 1000, peak_mem / 1024))
+        first_speedup = results["parse"][0] / results["index"][0]
+        print("  first access speedup {:.2f}x, memory {:.1f}%, same value: {:s}".format(first_speedup, \
+          100.0 * results["index"][2] / results["parse"][2], "yes" if identical else "NO"))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of VI.to_dict() against XML export of the same VI.
+
+XML export is measured as done by readRSRC.py --extract, with files written
+to a temporary folder, and with --single-file, which keeps them in memory.
+All blocks are parsed before measurement, so only the export is timed.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import gen_stress
+import bench_blocks
+
+
+EXPORT_MODES = ("xml", "xml-single", "dict",)
+
+
+def measureExport(fname, mode, work_dir, textcp):
+    """ Loads the file with all blocks parsed, and returns time of the export
+    """
+    fbase = os.path.splitext(os.path.basename(fname))[0]
+    po = gen_stress.newOptions(fname, os.path.join(work_dir, fbase + ".xml"), textcp=textcp)
+    po.single_file = (mode == "xml-single")
+    with open(fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp)
+        tm_start = time.perf_counter()
+        if mode == "dict":
+            vi.to_dict()
+        else:
+            vi.exportXMLTree()
+        tm = time.perf_counter() - tm_start
+    return tm
+
+
+def benchmarkFile(fname, repeats, textcp):
+    best = {}
+    for i in range(repeats):
+        for mode in EXPORT_MODES:
+            with tempfile.TemporaryDirectory(prefix="lvdict_") as work_dir:
+                tm = measureExport(fname, mode, work_dir, textcp)
+            if mode not in best or tm < best[mode]:
+                best[mode] = tm
+    return best
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress files by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress files; existing files are reused")
+
+    parser.add_argument('-s', '--scale', default=1.0, type=float,
+            help="multiplier for amounts of items in generated stress files")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of measurements of each file; best time is shown")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        fnames = [fname for name, fname, params in bench_blocks.generateStressFiles(gen_dir, po.scale)]
+
+    print("{:32s} ".format("file") + " ".join("{:>10s}".format(mode) for mode in EXPORT_MODES) + " {:>8s}".format("speedup"))
+    for fname in fnames:
+        best = benchmarkFile(fname, po.repeats, po.textcp)
+        print("{:32s} ".format(os.path.basename(fname)) + \
+          " ".join("{:10.2f}".format(best[mode] * 1000) for mode in EXPORT_MODES) + \
+          " {:7.2f}x".format(best["xml"] / best["dict"]))
+    print("Times in ms; speedup is of dict over xml export")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
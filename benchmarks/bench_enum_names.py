@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmark of conversions between enum values and names.
+
+XML export and import convert numbers to names, and back, once for each
+tag, attribute and type. This measures the conversion helpers, called with
+values taken from a synthetic VI with large front panel heap (or given RSRC
+file), and the whole heap export to XML tree and import from it. Results
+are stored as JSON named after current git commit, so runs on different
+commits can be compared with --compare.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import json
+import argparse
+import platform
+import tempfile
+
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LVxml as ET
+from LVrsrcontainer import VI
+import LVmisc
+import LVheap
+import LVdatatype
+import LVdatatyperef
+from LVmisc import eprint
+
+import gen_stress
+import bench_blocks
+
+
+# Labels added to the heap of generated file; each adds about 17 heap nodes
+DEFAULT_LABELS = 5900
+
+
+def loadHeap(fname, textcp):
+    """ Loads RSRC file and parses its front panel heap; returns VI and the heap block
+    """
+    po = gen_stress.newOptions(fname, os.path.splitext(fname)[0] + ".xml", textcp=textcp)
+    with open(fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp, parse_blocks=())
+        heap_block = None
+        for ident in (b'FPHb', b'FPHc',):
+            heap_block = vi.get(ident)
+            if heap_block is not None:
+                break
+        if heap_block is None:
+            raise AttributeError("File has no binary front panel heap")
+        heap_block.readRawDataSections(section_count=0xffffffff)
+        heap_block.parseData()
+    return vi, heap_block
+
+
+def cycleValues(values, count):
+    """ Returns list of given length, made by repeating given values
+    """
+    values = list(values)
+    return [values[i % len(values)] for i in range(count)]
+
+
+def prepareCalls(heap_block):
+    """ Returns list of (name, function, list of args) for each measured conversion
+    """
+    objects = heap_block.objects
+    count = len(objects)
+    tagArgs = [(obj.tagEn, obj.parent,) for obj in objects]
+    attribArgs = [(atId,) for obj in objects for atId in obj.attribs.keys()]
+    classArgs = [(obj.attribs[LVheap.SL_SYSTEM_ATTRIB_TAGS.SL__class.value],) for obj in objects \
+      if LVheap.SL_SYSTEM_ATTRIB_TAGS.SL__class.value in obj.attribs]
+    tdVals = cycleValues([en.value for en in LVdatatype.LV_INTERNAL_TD_NAMES], count)
+    refVals = cycleValues([en.value for en in LVdatatyperef.LV_INTERNAL_REFNUM_TYPE_NAMES], count)
+    fullTypes = cycleValues([en.value for en in LVdatatype.TD_FULL_TYPE], count)
+    elem = ET.Element("TypeDesc")
+    calls = [
+      ("getScopeInfo", LVheap.HeapNode.getScopeInfo, [(obj,) for obj in objects]),
+      ("tagEnToName", LVheap.tagEnToName, tagArgs),
+      ("tagNameToEnum", LVheap.tagNameToEnum, [(LVheap.tagEnToName(*args), args[1],) for args in tagArgs]),
+      ("attributeIdToName", LVheap.attributeIdToName, attribArgs),
+      ("attributeNameToId", LVheap.attributeNameToId, [(LVheap.attributeIdToName(*args),) for args in attribArgs]),
+      ("classEnToName", LVheap.classEnToName, classArgs),
+      ("classNameToEnum", LVheap.classNameToEnum, [(LVheap.classEnToName(*args),) for args in classArgs]),
+      ("stringFromValEnumOrInt", LVmisc.stringFromValEnumOrInt, \
+        [(LVdatatype.TD_FULL_TYPE, val,) for val in fullTypes]),
+      ("valFromEnumOrIntString", LVmisc.valFromEnumOrIntString, \
+        [(LVdatatype.TD_FULL_TYPE, LVmisc.stringFromValEnumOrInt(LVdatatype.TD_FULL_TYPE, val),) for val in fullTypes]),
+      ("tdEnToName", LVdatatype.tdEnToName, [(val,) for val in tdVals]),
+      ("tdNameToEnum", LVdatatype.tdNameToEnum, [(LVdatatype.tdEnToName(val),) for val in tdVals]),
+      ("refnumEnToName", LVdatatyperef.refnumEnToName, [(val,) for val in refVals]),
+      ("refnumNameToEnum", LVdatatyperef.refnumNameToEnum, [(LVdatatyperef.refnumEnToName(val),) for val in refVals]),
+      ("exportXMLBitfields", LVmisc.exportXMLBitfields, \
+        [(LVdatatype.TYPEDESC_FLAGS, elem, i & 0xffff,) for i in range(count)]),
+      ("importXMLBitfields", LVmisc.importXMLBitfields, [(LVdatatype.TYPEDESC_FLAGS, elem,)] * count),
+    ]
+    return calls
+
+
+def measureCalls(func, args_list, repeats):
+    best = None
+    for i in range(repeats):
+        tm_start = time.perf_counter()
+        for args in args_list:
+            func(*args)
+        tm = time.perf_counter() - tm_start
+        if best is None or tm < best:
+            best = tm
+    return best
+
+
+def measureHeapXML(vi, heap_block, repeats):
+    """ Returns best times of heap export to XML tree, and of import from that tree
+    """
+    vi.export_to_payloads = True
+    section = heap_block.sections[heap_block.active_section_num]
+    export_tm = None
+    import_tm = None
+    for i in range(repeats):
+        section_elem = ET.Element("Section")
+        tm_start = time.perf_counter()
+        heap_block.exportXMLSection(section_elem, heap_block.active_section_num, section, "heap")
+        tm = time.perf_counter() - tm_start
+        if export_tm is None or tm < export_tm:
+            export_tm = tm
+        heap_root = vi.xml_payloads[section_elem.get("File")]
+        new_section = SimpleNamespace(objects=[])
+        tm_start = time.perf_counter()
+        heap_block.initWithXMLHeap(new_section, heap_root, None)
+        tm = time.perf_counter() - tm_start
+        if import_tm is None or tm < import_tm:
+            import_tm = tm
+    return export_tm, import_tm
+
+
+def benchmarkFile(fname, repeats, textcp):
+    vi, heap_block = loadHeap(fname, textcp)
+    times = {}
+    counts = {}
+    for name, func, args_list in prepareCalls(heap_block):
+        times[name] = measureCalls(func, args_list, repeats)
+        counts[name] = len(args_list)
+    times["heap export"], times["heap import"] = measureHeapXML(vi, heap_block, repeats)
+    counts["heap export"] = counts["heap import"] = len(heap_block.objects)
+    return { 'file': os.path.basename(fname), 'nodes': len(heap_block.objects), \
+      'times': times, 'counts': counts }
+
+
+def printResults(entry, old_entry=None):
+    print("{:s}: {:d} heap nodes".format(entry['file'], entry['nodes']))
+    if old_entry is None:
+        print("  {:24s} {:>8s} {:>10s} {:>10s}".format("conversion", "calls", "ms", "ns/call"))
+    else:
+        print("  {:24s} {:>8s} {:>10s} {:>10s} {:>8s}".format("conversion", "calls", "old ms", "new ms", "speedup"))
+    for name, tm in entry['times'].items():
+        count = entry['counts'][name]
+        if old_entry is None:
+            print("  {:24s} {:8d} {:10.2f} {:10.1f}".format(name, count, tm * 1000, tm * 1e9 / max(count, 1)))
+        elif name in old_entry['times']:
+            old_tm = old_entry['times'][name]
+            print("  {:24s} {:8d} {:10.2f} {:10.2f} {:7.2f}x".format(name, count, old_tm * 1000, tm * 1000, \
+              old_tm / tm if tm > 0 else float('inf')))
+    pass
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress file by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress file; existing file is reused")
+
+    parser.add_argument('-l', '--labels', default=DEFAULT_LABELS, type=int,
+            help="amount of labels added to heap of generated stress file (default is %(default)s)")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of measurements of each conversion; best time is stored")
+
+    parser.add_argument('-o', '--output', default=None, type=str,
+            help="name of JSON results file (default is commit hash within \"{:s}\")"\
+              .format(bench_blocks.RESULTS_DIR))
+
+    parser.add_argument('-c', '--compare', default=None, type=str,
+            help="JSON results file from previous run to compare with")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        fname = os.path.join(gen_dir, "stress_heap_l{:d}.vi".format(po.labels))
+        if not os.path.exists(fname):
+            print("{:s}: Generating".format(fname))
+            with tempfile.TemporaryDirectory(prefix="lvstress_", dir=gen_dir) as work_dir:
+                gen_stress.generateVI(fname, work_dir, heap_nodes=po.labels, textcp=po.textcp)
+        fnames = [fname]
+
+    commit = bench_blocks.currentCommit()
+    results = { 'tool': "bench_enum_names", 'version': __version__, 'commit': commit, \
+      'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(), \
+      'repeats': po.repeats, 'files': [] }
+    for fname in fnames:
+        results['files'].append(benchmarkFile(fname, po.repeats, po.textcp))
+
+    old_entries = {}
+    if po.compare is not None:
+        with open(po.compare, "r") as old_fh:
+            old_results = json.load(old_fh)
+        print("Comparing {:s} (old) with {:s} (new)".format(old_results['commit'], results['commit']))
+        old_entries = { entry['file']: entry for entry in old_results['files'] }
+    for entry in results['files']:
+        printResults(entry, old_entries.get(entry['file']))
+
+    out_fname = po.output
+    if out_fname is None:
+        os.makedirs(bench_blocks.RESULTS_DIR, exist_ok=True)
+        out_fname = os.path.join(bench_blocks.RESULTS_DIR, "enum_names_{:s}.json".format(commit))
+    with open(out_fname, "w") as out_fh:
+        json.dump(results, out_fh, indent=2)
+    print("{:s}: Results stored".format(out_fname))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of heap subtree lookup through heap index.
+
+Loads synthetic VI with large front panel heap (or given RSRC files), and
+compares getting subtrees of random heap entries from unparsed heap, through
+the index of entries, with parsing the whole heap first. Also checks that
+HeapNodes of the subtrees are the same in both cases.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LVrsrcontainer import VI
+import LVheap
+from LVmisc import eprint
+
+import gen_stress
+
+
+# Labels added to the heap of generated file; each adds about 17 heap nodes
+DEFAULT_LABELS = 5900
+
+
+def loadHeapBlocks(fname, textcp):
+    """ Loads RSRC file without parsing; returns VI and list of its binary heap blocks
+    """
+    po = gen_stress.newOptions(fname, os.path.splitext(fname)[0] + ".xml", textcp=textcp)
+    with open(fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp, parse_blocks=())
+        heap_blocks = [block for ident, block in vi.blocks.items() if ident in (b'FPHb', b'BDHb',)]
+        for block in heap_blocks:
+            block.readRawDataSections(section_count=0xffffffff)
+    return vi, heap_blocks
+
+
+def nodeKey(obj):
+    return (bytes(obj.raw_data), obj.tagEn, type(obj), tuple(obj.getTagPath()),)
+
+
+def benchmarkBlock(fname, ident, indexes, textcp):
+    """ Measures subtree lookups in one heap block, with and without the index
+    """
+    # Through heap index, without parsing the whole heap
+    vi, heap_blocks = loadHeapBlocks(fname, textcp)
+    block = next(block for block in heap_blocks if block.ident == ident)
+    tm_start = time.perf_counter()
+    heap_index = block.getHeapIndex()
+    index_tm = time.perf_counter() - tm_start
+    tm_start = time.perf_counter()
+    idx_subtrees = [block.getHeapSubtree(i) for i in indexes]
+    lookup_tm = time.perf_counter() - tm_start
+    unparsed = block.needParseData()
+
+    # From parsed heap
+    vi, heap_blocks = loadHeapBlocks(fname, textcp)
+    block = next(block for block in heap_blocks if block.ident == ident)
+    tm_start = time.perf_counter()
+    block.parseData()
+    parse_tm = time.perf_counter() - tm_start
+    tm_start = time.perf_counter()
+    ref_subtrees = [block.getHeapSubtree(i) for i in indexes]
+    parsed_lookup_tm = time.perf_counter() - tm_start
+
+    same = all([nodeKey(obj) for obj in idx_subtree] == [nodeKey(obj) for obj in ref_subtree] \
+      for idx_subtree, ref_subtree in zip(idx_subtrees, ref_subtrees))
+    nodes = sum(len(subtree) for subtree in idx_subtrees)
+    return { 'entries': len(heap_index), 'nodes': nodes, 'index': index_tm, 'lookup': lookup_tm, \
+      'parse': parse_tm, 'parsed lookup': parsed_lookup_tm, 'same': same and unparsed }
+
+
+def benchmarkFile(fname, lookups, textcp):
+    vi, heap_blocks = loadHeapBlocks(fname, textcp)
+    results = []
+    for block in heap_blocks:
+        heap_index = block.getHeapIndex()
+        # Subtrees of random objects, ie. entries which are not closing tags
+        rnd = random.Random(len(heap_index))
+        candidates = [i for i in range(len(heap_index)) \
+          if heap_index.entryScope(i) != LVheap.NODE_SCOPE.TagClose]
+        indexes = rnd.sample(candidates, min(lookups, len(candidates)))
+        entry = benchmarkBlock(fname, block.ident, indexes, textcp)
+        entry['ident'] = block.ident.decode('ascii')
+        entry['lookups'] = len(indexes)
+        results.append(entry)
+    return results
+
+
+def printResults(fname, results):
+    print("{:s}:".format(os.path.basename(fname)))
+    print("  {:6s} {:>8s} {:>8s} {:>8s} {:>10s} {:>10s} {:>10s} {:>10s} {:>6s}".format("block", "entries", \
+      "lookups", "nodes", "index ms", "lookup ms", "parse ms", "parsed ms", "same"))
+    for entry in results:
+        print("  {:6s} {:8d} {:8d} {:8d} {:10.2f} {:10.2f} {:10.2f} {:10.2f} {:>6s}".format(entry['ident'], \
+          entry['entries'], entry['lookups'], entry['nodes'], entry['index'] * 1000, entry['lookup'] * 1000, \
+          entry['parse'] * 1000, entry['parsed lookup'] * 1000, "yes" if entry['same'] else "NO"))
+    pass
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress file by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress file; existing file is reused")
+
+    parser.add_argument('-l', '--labels', default=DEFAULT_LABELS, type=int,
+            help="amount of labels added to heap of generated stress file (default is %(default)s)")
+
+    parser.add_argument('-n', '--lookups', default=100, type=int,
+            help="amount of random subtrees to get from each heap (default is %(default)s)")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        fname = os.path.join(gen_dir, "stress_heap_l{:d}.vi".format(po.labels))
+        if not os.path.exists(fname):
+            print("{:s}: Generating".format(fname))
+            with tempfile.TemporaryDirectory(prefix="lvstress_", dir=gen_dir) as work_dir:
+                gen_stress.generateVI(fname, work_dir, heap_nodes=po.labels, textcp=po.textcp)
+        fnames = [fname]
+
+    all_same = True
+    for fname in fnames:
+        results = benchmarkFile(fname, po.lookups, po.textcp)
+        printResults(fname, results)
+        all_same = all_same and all(entry['same'] for entry in results)
+    if not all_same:
+        raise AssertionError("Subtrees got through heap index differ from parsed ones")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of memory used by parsed RSRC files.
+
+Loads synthetic stress files created by gen_stress.py, or given RSRC files,
+parsing all blocks; measures peak of memory allocated while loading, and the
+memory still kept by the loaded VI, using tracemalloc. Time of loading is
+measured in separate runs, without tracing. Results are stored as JSON named
+after current git commit, so runs on different commits can be compared
+with --compare.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import gc
+import sys
+import time
+import json
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import gen_stress
+import bench_blocks
+
+
+# Each preset scales up the parts which create many small objects; "large" combines them
+MEMORY_PRESETS = [
+    ("typedescs", {'type_descs': 2000}),
+    ("fills", {'cluster_fills': 2000}),
+    ("heap", {'heap_nodes': 4000}),
+    ("large", {'heap_nodes': 4000, 'type_descs': 2000, 'cluster_fills': 2000, 'array_len': 20000}),
+]
+
+
+def generateStressFiles(gen_dir, scale):
+    """ Creates stress files for all presets, reusing ones already in gen_dir
+
+    Returns list of (name, file name, params) tuples.
+    """
+    stress_files = []
+    for name, params in MEMORY_PRESETS:
+        gen_po = bench_blocks.presetParams(params, scale)
+        fname = os.path.join(gen_dir, "stress_mem_{:s}_x{:g}.vi".format(name, scale))
+        if not os.path.exists(fname):
+            print("{:s}: Generating".format(fname))
+            with tempfile.TemporaryDirectory(prefix="lvstress_", dir=gen_dir) as work_dir:
+                gen_stress.generateStressFile(gen_po, fname, work_dir)
+        desc = { k: v for k, v in vars(gen_po).items() if k not in ('template','textcp',) }
+        stress_files.append((name, fname, desc,))
+    return stress_files
+
+
+def loadVI(fname, textcp):
+    """ Loads RSRC file, parsing all blocks
+    """
+    po = gen_stress.newOptions(fname, os.path.splitext(fname)[0] + ".xml", textcp=textcp)
+    with open(fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp)
+    return vi
+
+
+def measureMemory(fname, textcp):
+    """ Returns peak memory allocated while loading, and memory kept by loaded VI
+    """
+    gc.collect()
+    tracemalloc.start()
+    vi = loadVI(fname, textcp)
+    gc.collect()
+    kept_mem, peak_mem = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del vi
+    return peak_mem, kept_mem
+
+
+def measureTime(fname, textcp, repeats):
+    """ Returns best time of loading the file
+    """
+    best = None
+    for i in range(repeats):
+        tm_start = time.perf_counter()
+        loadVI(fname, textcp)
+        tm = time.perf_counter() - tm_start
+        if best is None or tm < best:
+            best = tm
+    return best
+
+
+def benchmarkFile(name, fname, params, repeats, textcp):
+    # Load once before measuring, so that imports of modules are not counted
+    loadVI(fname, textcp)
+    peak_mem, kept_mem = measureMemory(fname, textcp)
+    load_tm = measureTime(fname, textcp, repeats)
+    return { 'name': name, 'file': os.path.basename(fname), 'size': os.path.getsize(fname), \
+      'params': params, 'peak': peak_mem, 'kept': kept_mem, 'load': load_tm }
+
+
+def printResults(results):
+    print("  {:12s} {:>10s} {:>10s} {:>10s} {:>10s}".format("file", "size KiB", "peak KiB", "kept KiB", "load ms"))
+    for entry in results['files']:
+        print("  {:12s} {:10.1f} {:10.1f} {:10.1f} {:10.2f}".format(entry['name'], entry['size'] / 1024, \
+          entry['peak'] / 1024, entry['kept'] / 1024, entry['load'] * 1000))
+    pass
+
+
+def printComparison(old_results, results):
+    """ Prints memory and time of each file in two result sets
+    """
+    print("Comparing {:s} (old) with {:s} (new)".format(old_results['commit'], results['commit']))
+    print("  {:12s} {:>10s} {:>10s} {:>7s} {:>10s} {:>10s} {:>7s} {:>9s} {:>9s} {:>8s}".format("file", \
+      "old peak", "new peak", "ratio", "old kept", "new kept", "ratio", "old ms", "new ms", "speedup"))
+    old_entries = { entry['name']: entry for entry in old_results['files'] }
+    for entry in results['files']:
+        old_entry = old_entries.get(entry['name'])
+        if old_entry is None:
+            print("  {:12s} not in old results".format(entry['name']))
+            continue
+        if old_entry['params'] != entry['params']:
+            eprint("{:s}: Warning: Files were generated with different parameters".format(entry['name']))
+        print("  {:12s} {:10.1f} {:10.1f} {:6.1f}% {:10.1f} {:10.1f} {:6.1f}% {:9.2f} {:9.2f} {:7.2f}x".format(\
+          entry['name'], old_entry['peak'] / 1024, entry['peak'] / 1024, 100.0 * entry['peak'] / old_entry['peak'], \
+          old_entry['kept'] / 1024, entry['kept'] / 1024, 100.0 * entry['kept'] / old_entry['kept'], \
+          old_entry['load'] * 1000, entry['load'] * 1000, old_entry['load'] / entry['load']))
+    pass
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to benchmark; synthetic stress files by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="folder for generated stress files; existing files are reused,"
+            " which keeps input the same across commits")
+
+    parser.add_argument('-s', '--scale', default=1.0, type=float,
+            help="multiplier for amounts of items in generated stress files")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of time measurements of each file; best time is stored")
+
+    parser.add_argument('-o', '--output', default=None, type=str,
+            help="name of JSON results file (default is commit hash within \"{:s}\")"\
+              .format(bench_blocks.RESULTS_DIR))
+
+    parser.add_argument('-c', '--compare', default=None, type=str,
+            help="JSON results file from previous run to compare with")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    commit = bench_blocks.currentCommit()
+    results = { 'tool': "bench_memory", 'version': __version__, 'commit': commit, \
+      'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(), \
+      'repeats': po.repeats, 'scale': po.scale, 'files': [] }
+
+    if len(po.files) > 0:
+        bench_files = [(os.path.basename(fname), fname, None,) for fname in po.files]
+    else:
+        gen_dir = po.gen_dir
+        if gen_dir is None:
+            gen_dir = tempfile.mkdtemp(prefix="lvstress_")
+        os.makedirs(gen_dir, exist_ok=True)
+        bench_files = generateStressFiles(gen_dir, po.scale)
+    for name, fname, params in bench_files:
+        results['files'].append(benchmarkFile(name, fname, params, po.repeats, po.textcp))
+
+    printResults(results)
+
+    out_fname = po.output
+    if out_fname is None:
+        os.makedirs(bench_blocks.RESULTS_DIR, exist_ok=True)
+        out_fname = os.path.join(bench_blocks.RESULTS_DIR, "memory_{:s}.json".format(commit))
+    with open(out_fname, "w") as out_fh:
+        json.dump(results, out_fh, indent=2)
+    print("{:s}: Results stored".format(out_fname))
+
+    if po.compare is not None:
+        with open(po.compare, "r") as old_fh:
+            old_results = json.load(old_fh)
+        printComparison(old_results, results)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
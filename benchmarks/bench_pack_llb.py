@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of LLB creation from a folder of member files.
+
+Compares creating LLB through XML with UCRF sections referencing member files,
+which loads all members before saving, with streaming the members directly
+into the output file. Measures time and peak of memory allocated by Python;
+also checks that both ways create identical files.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LVxml as ET
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import gen_stress
+
+
+def prepareMembers(member_dir, count, heap_nodes, textcp):
+    """ Fills folder with copies of one generated VI, unless it already has files
+    """
+    os.makedirs(member_dir, exist_ok=True)
+    if len(os.listdir(member_dir)) > 0:
+        return
+    with tempfile.TemporaryDirectory(prefix="lvstress_") as work_dir:
+        template_fname = os.path.join(work_dir, "member.vi")
+        gen_stress.generateVI(template_fname, work_dir, heap_nodes=heap_nodes, textcp=textcp)
+        for i in range(count):
+            shutil.copyfile(template_fname, os.path.join(member_dir, "member{:03d}.vi".format(i)))
+    pass
+
+
+def createThroughXML(member_fnames, rsrc_fname, textcp):
+    """ Creates LLB the way --create does, from XML listing the members
+    """
+    xml_fname = os.path.splitext(rsrc_fname)[0] + ".xml"
+    root = ET.Element("RSRC")
+    root.set("Type", "LVAR")
+    root.set("Encoding", textcp)
+    block_elem = ET.SubElement(root, "UCRF")
+    for i, member_fname in enumerate(member_fnames):
+        section_elem = ET.SubElement(block_elem, "Section")
+        section_elem.set("Index", "{:d}".format(i))
+        section_elem.set("Name", os.path.basename(member_fname))
+        section_elem.set("Format", "bin")
+        section_elem.set("File", os.path.relpath(member_fname, os.path.dirname(xml_fname)))
+    po = gen_stress.newOptions(rsrc_fname, xml_fname, textcp=textcp)
+    vi = VI(po, xml_root=root, text_encoding=textcp)
+    with open(rsrc_fname, "wb") as rsrc_fh:
+        vi.saveRSRC(rsrc_fh)
+    pass
+
+
+def createByStreaming(member_fnames, rsrc_fname, textcp):
+    """ Creates LLB the way --pack-llb does
+    """
+    po = gen_stress.newOptions(rsrc_fname, os.path.splitext(rsrc_fname)[0] + ".xml", textcp=textcp)
+    vi = VI(po, text_encoding=textcp)
+    with open(rsrc_fname, "wb") as rsrc_fh:
+        vi.saveLLBFromFiles(rsrc_fh, member_fnames)
+    pass
+
+
+def measure(func, member_fnames, rsrc_fname, textcp, repeats):
+    best_tm = None
+    for i in range(repeats):
+        tm_start = time.perf_counter()
+        func(member_fnames, rsrc_fname, textcp)
+        tm = time.perf_counter() - tm_start
+        if best_tm is None or tm < best_tm:
+            best_tm = tm
+    # Tracing allocations slows down the code, so memory is measured separately
+    tracemalloc.start()
+    func(member_fnames, rsrc_fname, textcp)
+    peak_mem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_tm, peak_mem
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('member_dir', nargs='?', default=None, metavar='DIR',
+            help="folder with member files; generated if not given or empty")
+
+    parser.add_argument('-k', '--members', default=50, type=int,
+            help="amount of member files to generate (default is %(default)s)")
+
+    parser.add_argument('-s', '--heap-nodes', default=4000, type=int,
+            help="amount of heap nodes in generated member VI (default is %(default)s)")
+
+    parser.add_argument('-n', '--repeats', default=3, type=int,
+            help="amount of measurements; best time is shown")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used in created files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    member_dir = po.member_dir
+    if member_dir is None:
+        member_dir = tempfile.mkdtemp(prefix="lvmembers_")
+    prepareMembers(member_dir, po.members, po.heap_nodes, po.textcp)
+    member_fnames = [os.path.join(member_dir, fname) for fname in sorted(os.listdir(member_dir))]
+    total_size = sum(os.path.getsize(fname) for fname in member_fnames)
+    print("{:s}: {:d} members, {:d} bytes in total, largest {:d} bytes".format(member_dir, \
+      len(member_fnames), total_size, max(os.path.getsize(fname) for fname in member_fnames)))
+
+    with tempfile.TemporaryDirectory(prefix="lvpack_") as work_dir:
+        results = {}
+        for name, func in (("xml", createThroughXML,), ("stream", createByStreaming,),):
+            rsrc_fname = os.path.join(work_dir, "{:s}.llb".format(name))
+            results[name] = measure(func, member_fnames, rsrc_fname, po.textcp, po.repeats)
+            with open(rsrc_fname, "rb") as rsrc_fh:
+                results[name] += (rsrc_fh.read(),)
+
+    print("  {:6s} {:>10s} {:>12s}".format("method", "time ms", "peak KiB"))
+    for name, (tm, peak_mem, data_buf) in results.items():
+        print("  {:6s} {:10.2f} {:12.1f}".format(name, tm * 1000, peak_mem / 1024))
+    print("  speedup {:.2f}x, memory {:.1f}%, identical output: {:s}".format( \
+      results["xml"][0] / results["stream"][0], 100.0 * results["stream"][1] / results["xml"][1], \
+      "yes" if results["xml"][2] == results["stream"][2] else "NO"))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Benchmark of one-shot readRSRC.py runs against requests to --serve mode.
+
+Runs the same command given amount of times as separate processes, and then
+as requests sent to a server started with readRSRC.py --serve.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from LVmisc import eprint
+from readRSRCClient import sendCommand
+
+
+def waitForSocket(sock_fname, server, timeout):
+    tm_end = time.perf_counter() + timeout
+    while not os.path.exists(sock_fname):
+        if server.poll() is not None:
+            raise ChildProcessError("Server exited with status {:d}.".format(server.returncode))
+        if time.perf_counter() > tm_end:
+            raise TimeoutError("Server did not create socket in {:g} seconds.".format(timeout))
+        time.sleep(0.01)
+    pass
+
+
+def commandArgs(po, work_dir):
+    rsrc_fname = os.path.abspath(po.rsrc)
+    xml_fname = os.path.join(work_dir, os.path.splitext(os.path.basename(rsrc_fname))[0] + ".xml")
+    return [po.command, "-i", rsrc_fname, "-m", xml_fname]
+
+
+def runOneShot(po, argv, work_dir):
+    """ Executes the command as separate processes; returns total time
+    """
+    cmd = [sys.executable, os.path.join(REPO_DIR, "readRSRC.py")] + argv
+    tm_start = time.perf_counter()
+    for i in range(po.count):
+        subprocess.run(cmd, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - tm_start
+
+
+def runClientProcess(po, argv, sock_fname, work_dir):
+    """ Executes the command through server, with a client process per request
+    """
+    cmd = [sys.executable, os.path.join(REPO_DIR, "readRSRCClient.py"), sock_fname] + argv
+    tm_start = time.perf_counter()
+    for i in range(po.count):
+        subprocess.run(cmd, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - tm_start
+
+
+def runClientRequests(po, argv, sock_fname, work_dir):
+    """ Executes the command through server, sending requests from this process
+    """
+    tm_start = time.perf_counter()
+    for i in range(po.count):
+        status, out_text, err_text = sendCommand(sock_fname, argv, cwd=work_dir)
+        if status != 0:
+            raise RuntimeError("Served command failed with status {:d}: {}".format(status, err_text))
+    return time.perf_counter() - tm_start
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('-i', '--rsrc', default=os.path.join(REPO_DIR, "examples", "lv14f1", "empty_vifile.vi"),
+            type=str, help="RSRC file to process (default is \"%(default)s\")")
+
+    parser.add_argument('-n', '--count', default=1000, type=int,
+            help="amount of runs in each mode (default is %(default)s)")
+
+    parser.add_argument('-c', '--command', default="-x", type=str,
+            help="readRSRC.py command to run (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="lvserve_") as work_dir:
+        argv = commandArgs(po, work_dir)
+        sock_fname = os.path.join(work_dir, "readRSRC.sock")
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "readRSRC.py"), "--serve", sock_fname], \
+          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            waitForSocket(sock_fname, server, 30.0)
+            times = []
+            times.append(("one-shot", runOneShot(po, argv, work_dir),))
+            times.append(("client process", runClientProcess(po, argv, sock_fname, work_dir),))
+            times.append(("socket request", runClientRequests(po, argv, sock_fname, work_dir),))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print("{:s} {:s}, {:d} runs:".format(os.path.basename(po.rsrc), po.command, po.count))
+    base_tm = times[0][1]
+    for name, tm in times:
+        print("  {:16s} {:9.3f} s {:9.2f} ms/run {:7.2f}x".format(name, tm, tm * 1000 / po.count, base_tm / tm))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmark of Type Descriptor label locator.
+
+Times locating the label within every Type Descriptor of VCTP blocks in given
+files, comparing current single-pass locator with the older per-position scan.
+As the shipped examples have few labelled TDs, synthetic labelled TD data
+is added to the set.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import sys
+import glob
+import timeit
+import argparse
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LVrsrcontainer import VI
+from LVdatatype import TDObject, TYPEDESC_FLAGS
+
+import readRSRC
+
+
+def legacyValidLabelLength(whole_data, i):
+    """ Label check from before the single-pass locator, kept as a reference
+    """
+    if whole_data[-1] == 0:
+        whole_data = whole_data[:-1]
+    label_len = int.from_bytes(whole_data[i:i+1], byteorder='big', signed=False)
+    if (len(whole_data)-i == label_len+1) and all((bt in b'\r\n\t') or (bt >= 32) for bt in whole_data[i+1:]):
+        return label_len
+    return 0
+
+
+def legacyFindLabelPosition(whole_data):
+    for i in range(max(len(whole_data)-256,0), len(whole_data)):
+        label_len = legacyValidLabelLength(whole_data, i)
+        if label_len > 0:
+            return i, label_len
+    return None, 0
+
+
+def collectTypeDescs(client_list, out_list):
+    for clientTD in client_list:
+        if clientTD.index != -1: # only nested clients are owned by the list
+            continue
+        out_list.append(clientTD.nested)
+        collectTypeDescs(clientTD.nested.clients, out_list)
+
+
+def syntheticLabelledData(count, seed=1):
+    """ Creates TD data buffers (without header) ending with a padded label
+    """
+    rnd = random.Random(seed)
+    out_list = []
+    for i in range(count):
+        data_buf = bytes(rnd.randrange(256) for k in range(rnd.randrange(2,300)))
+        label = bytes(rnd.randrange(32,127) for k in range(rnd.randrange(1,64)))
+        data_buf += bytes([len(label)]) + label
+        if len(data_buf) % 2 > 0:
+            data_buf += b'\0'
+        out_list.append(data_buf)
+    return out_list
+
+
+def loadTypeDescs(fnames):
+    tds = []
+    for fname in fnames:
+        po = readRSRC.prepareDefaultOptions(rsrc=fname)
+        with open(fname, "rb") as rsrc_fh:
+            vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=po.textcp)
+        for ident in (b'VCTP', b'VCTP2',):
+            block = vi.get(ident)
+            if block is None:
+                continue
+            for section in block.sections.values():
+                collectTypeDescs(section.content, tds)
+    return tds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*', help="RSRC files to take TDs from; examples by default")
+    parser.add_argument('-n', '--number', type=int, default=20, help="amount of passes over all TDs")
+    parser.add_argument('-s', '--synthetic', type=int, default=10000, help="amount of synthetic labelled TDs")
+    po = parser.parse_args()
+
+    fnames = po.files
+    if len(fnames) < 1:
+        examples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+        fnames = sorted(glob.glob(os.path.join(examples, "**", "*.vi"), recursive=True) + \
+          glob.glob(os.path.join(examples, "**", "*.llb"), recursive=True))
+    tds = loadTypeDescs(fnames)
+    labelled = [td.raw_data[4:] for td in tds if (td.oflags & TYPEDESC_FLAGS.HasLabel.value) != 0]
+    print("Type Descriptors: {:d}, with label: {:d}, synthetic: {:d}".format(len(tds), len(labelled), po.synthetic))
+    labelled += syntheticLabelledData(po.synthetic)
+    if len(labelled) < 1:
+        return
+
+    for data in labelled:
+        if TDObject.findLabelPosition(data) != legacyFindLabelPosition(data):
+            raise RuntimeError("Label position mismatch for data {}".format(data.hex()))
+
+    for name, func in (("per-position scan", legacyFindLabelPosition), ("single pass", TDObject.findLabelPosition),):
+        tm = min(timeit.repeat(lambda: [func(data) for data in labelled], number=po.number, repeat=5))
+        print("{:>20s}: {:8.3f} us per TD".format(name, tm * 1e6 / (po.number * len(labelled))))
+
+
+if __name__ == "__main__":
+    main()
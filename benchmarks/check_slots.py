@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Check of attributes set in classes with __slots__.
+
+Classes which declare __slots__ in all their bases have no instance dict,
+so setting any attribute which is not in the slots raises AttributeError -
+but only when the code doing it runs. This scans the source of all modules
+instead, and lists every 'self.<name> = ...' within such class, or within
+its bases, for which the name is not in slots of the class nor its bases.
+Exits with non-zero status if any such attribute is found.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import ast
+import argparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from LVmisc import eprint
+
+
+class ClassInfo:
+    """ Properties of a class definition, as found in the source
+    """
+    def __init__(self, module, node):
+        self.module = module
+        self.name = node.name
+        self.lineno = node.lineno
+        self.bases = [baseName(base) for base in node.bases]
+        self.slots = None
+        # Names defined within class body, ie. methods, properties and class variables
+        self.members = set()
+        # Attributes assigned through self, with line numbers
+        self.assigned = {}
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef,)):
+                self.members.add(item.name)
+                self.scanMethod(item)
+            elif isinstance(item, (ast.Assign, ast.AnnAssign,)):
+                targets = item.targets if isinstance(item, ast.Assign) else [item.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        self.members.add(target.id)
+                        if target.id == "__slots__":
+                            self.slots = slotNames(item.value)
+
+    def scanMethod(self, func):
+        # Class and static methods do not get the instance
+        if any(baseName(deco) in ("classmethod", "staticmethod",) for deco in func.decorator_list):
+            return
+        if len(func.args.args) < 1:
+            return
+        self_name = func.args.args[0].arg
+        for node in ast.walk(func):
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, (ast.AugAssign, ast.AnnAssign,)):
+                targets = [node.target]
+            else:
+                continue
+            for target in targets:
+                for elt in (target.elts if isinstance(target, (ast.Tuple, ast.List,)) else [target]):
+                    if isinstance(elt, ast.Attribute) and isinstance(elt.value, ast.Name) and elt.value.id == self_name:
+                        self.assigned.setdefault(elt.attr, node.lineno)
+        pass
+
+
+def baseName(node):
+    """ Returns name of base class, without module
+    """
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def slotNames(node):
+    if isinstance(node, (ast.Tuple, ast.List,)):
+        return [elt.value for elt in node.elts if isinstance(elt, ast.Constant)]
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    return None
+
+
+def scanModules(paths):
+    """ Returns dict of class names and ClassInfo of all classes in given files
+    """
+    classes = {}
+    for fname in paths:
+        with open(fname, "r", encoding="utf-8") as fh:
+            tree = ast.parse(fh.read(), filename=fname)
+        module = os.path.splitext(os.path.basename(fname))[0]
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef):
+                classes.setdefault(node.name, []).append(ClassInfo(module, node))
+    return classes
+
+
+def classChain(cls, classes):
+    """ Returns list of the class and all its bases, or None if any of them has instance dict
+    """
+    chain = []
+    pending = [cls]
+    while len(pending) > 0:
+        info = pending.pop()
+        if info.slots is None or "__dict__" in info.slots:
+            return None
+        chain.append(info)
+        for base in info.bases:
+            if base == "object":
+                continue
+            # Bases from within the same module are preferred on name collision
+            candidates = classes.get(base)
+            if candidates is None:
+                return None # Class from outside of scanned modules
+            same_module = [c for c in candidates if c.module == info.module]
+            pending.append(same_module[0] if len(same_module) > 0 else candidates[0])
+    return chain
+
+
+def checkClasses(classes):
+    """ Returns list of (module, class, line, attribute) for attributes missing in slots
+    """
+    problems = []
+    for name, infos in sorted(classes.items()):
+        for info in infos:
+            chain = classChain(info, classes)
+            if chain is None:
+                continue
+            allowed = set()
+            for c in chain:
+                allowed.update(c.slots)
+                allowed.update(c.members)
+            for attr, lineno in sorted(info.assigned.items()):
+                if attr not in allowed:
+                    problems.append( (info.module, info.name, lineno, attr,) )
+    return problems
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="Python modules to check; all modules in main folder by default")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        fnames = [os.path.join(REPO_DIR, fname) for fname in sorted(os.listdir(REPO_DIR)) if fname.endswith(".py")]
+
+    classes = scanModules(fnames)
+    problems = checkClasses(classes)
+    for module, name, lineno, attr in problems:
+        eprint("{:s}.py:{:d}: Class {:s} sets attribute '{:s}' which is not in its slots"\
+          .format(module, lineno, name, attr))
+    if len(problems) > 0:
+        raise AttributeError("Found {:d} attributes missing in slots".format(len(problems)))
+    nslotted = sum(1 for infos in classes.values() for info in infos if classChain(info, classes) is not None)
+    print("All {:d} classes with slots set only their slotted attributes".format(nslotted))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Comparison of XML backends - ElementTree and lxml.
+
+Extracts each RSRC file to XML with every backend, and checks that all
+written files are identical; then re-creates the RSRC file from the XML
+with every backend, and checks the re-created files are identical too.
+Measures times of both stages. By default, all files within examples/
+folder are used. Exits with non-zero status if any of the outputs differ.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import LVxml as ET
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import gen_stress
+import bench_blocks
+
+
+COMPARED_BACKENDS = ("etree", "lxml",)
+
+RSRC_EXTENSIONS = (".vi", ".vit", ".vim", ".ctl", ".ctt", ".llb", ".lvlib", ".lvclass", ".mnu", ".uir", ".rsc",)
+
+
+def exampleFiles():
+    """ Returns list of RSRC files within examples folder
+    """
+    fnames = []
+    for dirpath, dirnames, files in os.walk(os.path.join(REPO_DIR, "examples")):
+        dirnames.sort()
+        for fname in sorted(files):
+            if os.path.splitext(fname)[1].lower() in RSRC_EXTENSIONS:
+                fnames.append(os.path.join(dirpath, fname))
+    return fnames
+
+
+def readFolder(path):
+    """ Returns dict of relative file names and content of all files in given folder
+    """
+    files = {}
+    for dirpath, dirnames, fnames in os.walk(path):
+        for fname in fnames:
+            full_fname = os.path.join(dirpath, fname)
+            with open(full_fname, "rb") as fh:
+                files[os.path.relpath(full_fname, path)] = fh.read()
+    return files
+
+
+def roundTrip(fname, work_dir, textcp):
+    """ Extracts RSRC file to XML and re-creates it, using current backend
+
+    Returns extract and create times, extracted files, and the new RSRC file content.
+    """
+    fbase = os.path.splitext(os.path.basename(fname))[0]
+    xml_dir = os.path.join(work_dir, "xml")
+    os.makedirs(xml_dir)
+    xml_fname = os.path.join(xml_dir, fbase + ".xml")
+    new_fname = os.path.join(work_dir, "new_" + os.path.basename(fname))
+
+    tm_start = time.perf_counter()
+    po = gen_stress.newOptions(fname, xml_fname, textcp=textcp)
+    with open(fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp)
+        root = vi.exportXMLTree()
+    with open(xml_fname, "wb") as xml_fh:
+        ET.ElementTree(root).write(xml_fh, encoding='utf-8', xml_declaration=True)
+    extract_tm = time.perf_counter() - tm_start
+
+    tm_start = time.perf_counter()
+    po = gen_stress.newOptions(new_fname, xml_fname, textcp=textcp)
+    tree = ET.parse(xml_fname)
+    vi = VI(po, xml_root=tree.getroot(), text_encoding=textcp)
+    with open(new_fname, "wb") as rsrc_fh:
+        vi.saveRSRC(rsrc_fh)
+    create_tm = time.perf_counter() - tm_start
+
+    with open(new_fname, "rb") as rsrc_fh:
+        new_data = rsrc_fh.read()
+    return extract_tm, create_tm, readFolder(xml_dir), new_data
+
+
+def listDifferences(outputs):
+    """ Returns list of names of files which are not the same in outputs of all backends
+    """
+    ref_files, ref_rsrc = outputs[COMPARED_BACKENDS[0]]
+    diffs = []
+    for backend in COMPARED_BACKENDS[1:]:
+        files, rsrc = outputs[backend]
+        for name in sorted(set(ref_files.keys()) | set(files.keys())):
+            if ref_files.get(name) != files.get(name) and name not in diffs:
+                diffs.append(name)
+        if ref_rsrc != rsrc and "(re-created RSRC)" not in diffs:
+            diffs.append("(re-created RSRC)")
+    return diffs
+
+
+def compareFile(fname, repeats, textcp):
+    best = {}
+    outputs = {}
+    for i in range(repeats):
+        for backend in COMPARED_BACKENDS:
+            ET.setBackend(backend)
+            with tempfile.TemporaryDirectory(prefix="lvxmlcmp_") as work_dir:
+                extract_tm, create_tm, files, new_data = roundTrip(fname, work_dir, textcp)
+            prev = best.get(backend)
+            if prev is None or extract_tm + create_tm < prev[0] + prev[1]:
+                best[backend] = (extract_tm, create_tm,)
+            outputs[backend] = (files, new_data,)
+    nfiles = len(outputs[COMPARED_BACKENDS[0]][0])
+    return best, nfiles, listDifferences(outputs)
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('files', nargs='*', metavar='FILE',
+            help="RSRC files to compare on; all files within examples folder by default")
+
+    parser.add_argument('-g', '--gen-dir', default=None, type=str,
+            help="also compare on synthetic stress files, generated in given folder;" \
+            " existing files are reused")
+
+    parser.add_argument('-s', '--scale', default=1.0, type=float,
+            help="multiplier for amounts of items in generated stress files")
+
+    parser.add_argument('-n', '--repeats', default=1, type=int,
+            help="amount of measurements of each file; best time is shown")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    if ET.importLxml() is None:
+        raise ImportError("Comparison requires lxml module, which is not installed")
+
+    if len(po.files) > 0:
+        fnames = po.files
+    else:
+        fnames = exampleFiles()
+    if po.gen_dir is not None:
+        os.makedirs(po.gen_dir, exist_ok=True)
+        fnames += [fname for name, fname, params in bench_blocks.generateStressFiles(po.gen_dir, po.scale)]
+
+    print("  {:40s} {:>6s} {:>11s} {:>11s} {:>11s} {:>11s} {:>8s}".format("file", "files", \
+      "etree ext", "lxml ext", "etree cre", "lxml cre", "result"))
+    failed = 0
+    for fname in fnames:
+        best, nfiles, diffs = compareFile(fname, po.repeats, po.textcp)
+        print("  {:40s} {:6d} {:9.2f}ms {:9.2f}ms {:9.2f}ms {:9.2f}ms {:>8s}".format(\
+          os.path.basename(fname), nfiles, best["etree"][0] * 1000, best["lxml"][0] * 1000, \
+          best["etree"][1] * 1000, best["lxml"][1] * 1000, "same" if len(diffs) == 0 else "DIFF"))
+        for name in diffs:
+            eprint("{:s}: Output of backends differs: {:s}".format(fname, name))
+        if len(diffs) > 0:
+            failed += 1
+    if failed > 0:
+        raise AssertionError("Outputs differ for {:d} of {:d} files".format(failed, len(fnames)))
+    print("Outputs of all backends are identical for {:d} files".format(len(fnames)))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" Generator of synthetic large RSRC files for stress tests and benchmarks.
+
+Takes a small VI as template, extracts it to XML, scales up selected parts
+of the XML - heap nodes, Type Descriptors with default data, large default
+data array, clusters with default data, link objects - and creates the RSRC
+file through the usual XML import path. Can also pack many such VIs into an LLB.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import os
+import sys
+import copy
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import LVxml as ET
+from LVrsrcontainer import VI
+from LVmisc import eprint
+
+import readRSRC
+
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), \
+  "examples", "lv14f1", "empty_vifile.vi")
+
+# Type Map flags used for generated entries; the second has default data in DFDS
+TM_FLAGS_NO_FILL = 0xD000
+TM_FLAGS_FILL = 0xD001
+
+# Amount of items in the array within each generated cluster
+CLUSTER_ARRAY_LEN = 64
+
+
+def newOptions(rsrc_fname, xml_fname, verbose=0, textcp="mac_roman"):
+    """ Prepares options for VI object, as readRSRC.py would set them
+    """
+    return readRSRC.prepareDefaultOptions(verbose=verbose, textcp=textcp, \
+      rsrc=rsrc_fname, xml=xml_fname)
+
+
+def exportTemplate(template_fname, xml_fname, textcp="mac_roman"):
+    """ Extracts template RSRC file to XML, returns root of the XML tree
+
+    Sidecar files are written into the folder of given XML file name.
+    """
+    po = newOptions(template_fname, xml_fname, textcp=textcp)
+    with open(template_fname, "rb") as rsrc_fh:
+        vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp)
+        root = vi.exportXMLTree()
+    return root
+
+
+def blockSection(root, ident):
+    """ Returns first Section element of given block within RSRC XML tree
+    """
+    section_elem = root.find("{:s}/Section".format(ident))
+    if section_elem is None:
+        raise AttributeError("Template has no {:s} block section".format(ident))
+    return section_elem
+
+
+def addHeapNodes(heap_fname, count, uid_start):
+    """ Adds given amount of label nodes to heap XML file; returns last uid used
+
+    The nodes are copies of first label within first parts list of the heap.
+    """
+    tree = ET.parse(heap_fname)
+    heap_root = tree.getroot()
+    parts_elem = heap_root.find(".//partsList")
+    if parts_elem is None:
+        raise AttributeError("Heap '{:s}' has no partsList to extend".format(heap_fname))
+    model_elem = parts_elem.find("SL__arrayElement[@class='label']")
+    if model_elem is None:
+        raise AttributeError("Heap '{:s}' has no label to copy".format(heap_fname))
+    uid = uid_start
+    for i in range(count):
+        node_elem = copy.deepcopy(model_elem)
+        uid += 1
+        node_elem.set("uid", "{:d}".format(uid))
+        text_elem = node_elem.find("textRec/text")
+        if text_elem is not None:
+            text_elem.text = "\"Label {:d}\"".format(i)
+        parts_elem.append(node_elem)
+    parts_elem.set("elements", "{:d}".format(len(parts_elem)))
+    ET.pretty_element_tree_heap(heap_root)
+    with open(heap_fname, "wb") as xml_fh:
+        tree.write(xml_fh, encoding='utf-8', xml_declaration=True)
+    return uid
+
+
+def addTypeDescs(root, count, array_len, cluster_fills=0):
+    """ Adds labelled numeric Type Descriptors, an array, and clusters, with default data
+
+    Each new TD gets consolidated type index, Type Map entry and default
+    fill value, so that VCTP, TM80 and DFDS all grow together. All the
+    clusters share one flat TD, made of a numeric and an array of numerics.
+    """
+    vctp_elem = blockSection(root, "VCTP")
+    top_elem = vctp_elem.find("TopLevel")
+    flat_tds = [elem for elem in vctp_elem if elem.tag == "TypeDesc"]
+    top_tds = [elem for elem in top_elem if elem.tag == "TypeDesc"]
+    tm_elem = blockSection(root, "TM80")
+    dfds_elem = blockSection(root, "DFDS")
+
+    flat_idx = len(flat_tds)
+    top_idx = max([int(elem.get("Index"), 0) for elem in top_tds] + [0]) + 1
+    tm_idx = int(tm_elem.get("IndexShift", "0"), 0) + len(tm_elem.findall("Client"))
+
+    def appendFlatTD(td_elem):
+        nonlocal flat_idx
+        vctp_elem.insert(list(vctp_elem).index(top_elem), td_elem)
+        flat_idx += 1
+        return flat_idx - 1
+
+    def appendTD(td_elem, fill_elem):
+        nonlocal flat_idx, top_idx, tm_idx
+        if td_elem is not None:
+            appendFlatTD(td_elem)
+        subelem = ET.SubElement(top_elem, "TypeDesc")
+        subelem.set("Index", "{:d}".format(top_idx))
+        subelem.set("FlatTypeID", "{:d}".format(flat_idx - 1))
+        # Type Map has to list all consolidated types up to the new one
+        while tm_idx < top_idx:
+            subelem = ET.SubElement(tm_elem, "Client")
+            subelem.set("Flags", "0x{:X}".format(TM_FLAGS_NO_FILL))
+            tm_idx += 1
+        subelem = ET.SubElement(tm_elem, "Client")
+        subelem.set("Flags", "0x{:X}".format(TM_FLAGS_FILL))
+        tm_idx += 1
+        dfds_elem.append(fill_elem)
+        top_idx += 1
+
+    def newArrayTD(item_flat_idx):
+        td_elem = ET.Element("TypeDesc")
+        td_elem.set("Type", "Array")
+        td_elem.set("Format", "inline")
+        subelem = ET.SubElement(td_elem, "Dimension")
+        subelem.set("Flags", "0xFF")
+        subelem.set("FixedSize", "0xFFFFFF")
+        subelem = ET.SubElement(td_elem, "TypeDesc")
+        subelem.set("TypeID", "{:d}".format(item_flat_idx))
+        subelem.set("Flags", "0x0000")
+        return td_elem
+
+    def newArrayFill(amount, start):
+        fill_elem = ET.Element("Array")
+        subelem = ET.SubElement(fill_elem, "dim")
+        subelem.text = "{:d}".format(amount)
+        for i in range(amount):
+            subelem = ET.SubElement(fill_elem, "I32")
+            subelem.text = "{:d}".format(start + i)
+        return fill_elem
+
+    for i in range(count):
+        td_elem = ET.Element("TypeDesc")
+        td_elem.set("Type", "NumInt32")
+        td_elem.set("Prop1", "0")
+        td_elem.set("Label", "Numeric {:d}".format(i))
+        td_elem.set("Format", "inline")
+        fill_elem = ET.Element("I32")
+        fill_elem.text = "{:d}".format(i)
+        appendTD(td_elem, fill_elem)
+
+    if (array_len > 0 or cluster_fills > 0) and count < 1:
+        # Array items type has to be a flat TD; the last numeric fits, otherwise add one
+        td_elem = ET.Element("TypeDesc")
+        td_elem.set("Type", "NumInt32")
+        td_elem.set("Prop1", "0")
+        td_elem.set("Format", "inline")
+        fill_elem = ET.Element("I32")
+        fill_elem.text = "0"
+        appendTD(td_elem, fill_elem)
+    item_flat_idx = flat_idx - 1
+
+    if array_len > 0:
+        appendTD(newArrayTD(item_flat_idx), newArrayFill(array_len, 0))
+
+    if cluster_fills > 0:
+        array_flat_idx = appendFlatTD(newArrayTD(item_flat_idx))
+        td_elem = ET.Element("TypeDesc")
+        td_elem.set("Type", "Cluster")
+        td_elem.set("Format", "inline")
+        for sub_flat_idx in (item_flat_idx, array_flat_idx,):
+            subelem = ET.SubElement(td_elem, "TypeDesc")
+            subelem.set("TypeID", "{:d}".format(sub_flat_idx))
+        appendFlatTD(td_elem)
+        for i in range(cluster_fills):
+            fill_elem = ET.Element("Cluster")
+            subelem = ET.SubElement(fill_elem, "I32")
+            subelem.text = "{:d}".format(i)
+            fill_elem.append(newArrayFill(CLUSTER_ARRAY_LEN, i))
+            # All clusters use the same flat TD
+            appendTD(None, fill_elem)
+    pass
+
+
+def addLinkObjects(root, count):
+    """ Adds VI To Lib link objects to the VI dependencies list
+    """
+    livi_elem = blockSection(root, "LIvi")
+    list_elem = livi_elem.find("LVIN")
+    if list_elem is None:
+        raise AttributeError("Template has no LVIN list in LIvi block")
+    for i in range(count):
+        lib_name = "Stress Lib {:d}.lvlib".format(i)
+        lnkobj_elem = ET.SubElement(list_elem, "VILB")
+        lnkobj_elem.set("LinkSaveFlag", "0")
+        subelem = ET.SubElement(lnkobj_elem, "LinkSaveQualName")
+        ET.SubElement(subelem, "String").text = lib_name
+        subelem = ET.SubElement(lnkobj_elem, "LinkSavePathRef")
+        subelem.set("Ident", "PTH0")
+        subelem.set("TpVal", "1")
+        ET.SubElement(subelem, "String").text = "stress"
+        ET.SubElement(subelem, "String").text = lib_name
+    pass
+
+
+def createRSRCFromXML(root, xml_fname, rsrc_fname, textcp="mac_roman"):
+    """ Creates RSRC file from XML tree, using the standard XML import path
+    """
+    ET.pretty_element_tree_heap(root)
+    with open(xml_fname, "wb") as xml_fh:
+        ET.ElementTree(root).write(xml_fh, encoding='utf-8', xml_declaration=True)
+    po = newOptions(rsrc_fname, xml_fname, textcp=textcp)
+    tree = ET.parse(xml_fname)
+    vi = VI(po, xml_root=tree.getroot(), text_encoding=textcp)
+    with open(rsrc_fname, "wb") as rsrc_fh:
+        vi.saveRSRC(rsrc_fh)
+    pass
+
+
+def generateVI(rsrc_fname, work_dir, heap_nodes=0, type_descs=0, array_len=0, \
+      cluster_fills=0, link_objs=0, template=DEFAULT_TEMPLATE, textcp="mac_roman"):
+    """ Creates synthetic VI file, scaled up from template by given amounts
+    """
+    fbase = os.path.splitext(os.path.basename(rsrc_fname))[0]
+    xml_fname = os.path.join(work_dir, fbase + ".xml")
+    root = exportTemplate(template, xml_fname, textcp=textcp)
+
+    if heap_nodes > 0:
+        heap_elem = blockSection(root, "FPHb")
+        if heap_elem.get("Format") != "xml":
+            raise AttributeError("Template FPHb heap is not exported as separate XML")
+        heap_fname = os.path.join(work_dir, heap_elem.get("File"))
+        muid_elem = blockSection(root, "MUID")
+        last_uid = addHeapNodes(heap_fname, heap_nodes, int(muid_elem.get("Value"), 0))
+        muid_elem.set("Value", "{:d}".format(last_uid))
+    if type_descs > 0 or array_len > 0 or cluster_fills > 0:
+        addTypeDescs(root, type_descs, array_len, cluster_fills=cluster_fills)
+    if link_objs > 0:
+        addLinkObjects(root, link_objs)
+
+    createRSRCFromXML(root, xml_fname, rsrc_fname, textcp=textcp)
+    pass
+
+
+def generateLLB(rsrc_fname, work_dir, member_fnames, textcp="mac_roman"):
+    """ Creates LLB file with given files as members
+    """
+    fbase = os.path.splitext(os.path.basename(rsrc_fname))[0]
+    xml_fname = os.path.join(work_dir, fbase + ".xml")
+    root = ET.Element("RSRC")
+    root.set("Type", "LVAR")
+    root.set("Encoding", textcp)
+    block_elem = ET.SubElement(root, "UCRF")
+    for i, member_fname in enumerate(member_fnames):
+        section_elem = ET.SubElement(block_elem, "Section")
+        section_elem.set("Index", "{:d}".format(i))
+        section_elem.set("Name", os.path.basename(member_fname))
+        section_elem.set("Format", "bin")
+        section_elem.set("File", os.path.relpath(member_fname, work_dir))
+    createRSRCFromXML(root, xml_fname, rsrc_fname, textcp=textcp)
+    pass
+
+
+def generateStressFile(po, rsrc_fname, work_dir):
+    """ Creates VI or LLB file according to given options
+    """
+    params = dict(heap_nodes=po.heap_nodes, type_descs=po.type_descs, array_len=po.array_len, \
+      cluster_fills=po.cluster_fills, link_objs=po.link_objs, template=po.template, textcp=po.textcp)
+    if po.llb_members > 0:
+        fbase = os.path.splitext(os.path.basename(rsrc_fname))[0]
+        member_fnames = []
+        for i in range(po.llb_members):
+            member_fname = os.path.join(work_dir, "{:s}_member{:d}.vi".format(fbase,i))
+            member_dir = tempfile.mkdtemp(prefix="member{:d}_".format(i), dir=work_dir)
+            generateVI(member_fname, member_dir, **params)
+            member_fnames.append(member_fname)
+        generateLLB(rsrc_fname, work_dir, member_fnames, textcp=po.textcp)
+    else:
+        generateVI(rsrc_fname, work_dir, **params)
+    pass
+
+
+def checkStressFile(rsrc_fname, work_dir, textcp="mac_roman"):
+    """ Verifies that generated file loads, and re-creates from its XML identically
+    """
+    fbase = os.path.splitext(os.path.basename(rsrc_fname))[0]
+    xml_fname = os.path.join(work_dir, fbase + "_check.xml")
+    new_fname = os.path.join(work_dir, fbase + "_check" + os.path.splitext(rsrc_fname)[1])
+    root = exportTemplate(rsrc_fname, xml_fname, textcp=textcp)
+    createRSRCFromXML(root, xml_fname, new_fname, textcp=textcp)
+    with open(rsrc_fname, "rb") as rsrc_fh_a, open(new_fname, "rb") as rsrc_fh_b:
+        return rsrc_fh_a.read() == rsrc_fh_b.read()
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('-o', '--output', type=str, required=True,
+            help="name of the RSRC file to create")
+
+    parser.add_argument('-T', '--template', default=DEFAULT_TEMPLATE, type=str,
+            help="VI file to use as template (default is \"%(default)s\")")
+
+    parser.add_argument('-n', '--heap-nodes', default=0, type=int,
+            help="amount of label nodes to add to front panel heap")
+
+    parser.add_argument('-m', '--type-descs', default=0, type=int,
+            help="amount of labelled Type Descriptors with default data to add")
+
+    parser.add_argument('-a', '--array-len', default=0, type=int,
+            help="amount of items in default data array to add")
+
+    parser.add_argument('-c', '--cluster-fills', default=0, type=int,
+            help="amount of clusters with default data, each containing an array, to add")
+
+    parser.add_argument('-l', '--link-objs', default=0, type=int,
+            help="amount of link objects to add to VI dependencies")
+
+    parser.add_argument('-k', '--llb-members', default=0, type=int,
+            help="create LLB with given amount of generated VIs as members")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used in created RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('--check', action='store_true',
+            help="verify that the created file loads and re-creates identically")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="lvstress_") as work_dir:
+        generateStressFile(po, po.output, work_dir)
+        print("{:s}: Created, {:d} bytes".format(po.output, os.path.getsize(po.output)))
+        if po.check:
+            if not checkStressFile(po.output, work_dir, textcp=po.textcp):
+                raise RuntimeError("Re-created file differs from '{:s}'".format(po.output))
+            print("{:s}: Re-created identically".format(po.output))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC files compiled code indexer.
+
+Builds SQLite database of compiled code from VICD blocks of RSRC files,
+and of LLB members within them, with content hashes and rolling-hash chunk fingerprints of the code, and
+answers which files share identical or partly identical compiled code.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import sys
+import os
+import argparse
+import hashlib
+
+from LVrsrcontainer import *
+from LVmisc import eprint
+
+import indexDeps
+import readRSRC
+
+
+# Blocks which need parsing for the index; VICD parsing depends on file version
+INDEX_PARSE_BLOCKS = (b'VICD', b'LVSR', b'vers',)
+
+# Content-defined chunking of the code: chunk ends where the rolling hash has
+# all masked bits zeroed, which happens every 2^CHUNK_AVG_BITS bytes on average
+CHUNK_MIN_SIZE = 64
+CHUNK_MAX_SIZE = 4096
+CHUNK_AVG_BITS = 9
+CHUNK_MASK = ((1 << CHUNK_AVG_BITS) - 1) << (32 - CHUNK_AVG_BITS)
+
+# Random values for rolling "gear" hash; derived from a hash, so that they are the same in all runs
+CHUNK_GEAR = tuple(int.from_bytes(hashlib.md5(bytes([i])).digest()[:4], byteorder='big') for i in range(256))
+
+INDEX_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    name TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS code (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    member TEXT NOT NULL,
+    name TEXT NOT NULL,
+    section INTEGER NOT NULL,
+    arch TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    code_size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    code_id INTEGER NOT NULL REFERENCES code(id) ON DELETE CASCADE,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    fingerprint INTEGER NOT NULL
+);
+CREATE VIEW IF NOT EXISTS code_src AS
+    SELECT k.id, k.file_id, k.section, k.arch, k.size, k.code_size, k.sha256, k.name,
+      CASE k.member WHEN '' THEN f.path ELSE f.path || ':' || k.member END AS path,
+      f.path AS file_path, f.name AS file_name
+    FROM code k JOIN files f ON f.id = k.file_id;
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS code_file_id ON code(file_id);
+CREATE INDEX IF NOT EXISTS code_name ON code(name);
+CREATE INDEX IF NOT EXISTS code_sha256 ON code(sha256);
+CREATE INDEX IF NOT EXISTS chunks_code_id ON chunks(code_id);
+CREATE INDEX IF NOT EXISTS chunks_fingerprint ON chunks(fingerprint);
+"""
+
+
+def codeChunks(data_buf):
+    """ Splits data into content-defined chunks, returns list of (offset, size) tuples
+
+    Boundaries depend only on the last 32 bytes before them, so code which
+    differs in some places still has the same chunks in the other places,
+    even if they are moved.
+    """
+    chunks = []
+    gear = CHUNK_GEAR
+    data_len = len(data_buf)
+    start = 0
+    while start < data_len:
+        end = min(start + CHUNK_MAX_SIZE, data_len)
+        pos = start + CHUNK_MIN_SIZE
+        # Bytes within minimal size only need to be in the hash window
+        h = 0
+        for b in data_buf[max(start, pos - 32):min(pos, end)]:
+            h = ((h << 1) + gear[b]) & 0xffffffff
+        while pos < end:
+            if (h & CHUNK_MASK) == 0:
+                break
+            h = ((h << 1) + gear[data_buf[pos]]) & 0xffffffff
+            pos += 1
+        pos = min(pos, end)
+        chunks.append( (start, pos - start,) )
+        start = pos
+    return chunks
+
+
+def chunkFingerprint(chunk):
+    """ Returns 64-bit signed integer fingerprint of given data, as stored in SQLite
+    """
+    return int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), byteorder='big', signed=True)
+
+
+def readFileCode(fname, textcp):
+    """ Loads VICD blocks from RSRC file and its LLB members, returns list of code sections
+
+    Returns list of code tuples (member, section, arch, size, code_size, sha256,
+    chunks), where member is empty for the file itself, and chunks is a list of
+    (offset, size, fingerprint) tuples; and error message (or None).
+    """
+    po = readRSRC.prepareDefaultOptions(rsrc=fname, textcp=textcp)
+    codes = []
+    try:
+        with open(fname, "rb") as rsrc_fh:
+            vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp, parse_blocks=INDEX_PARSE_BLOCKS)
+            for member_name, member in vi.memberSources(parse_blocks=INDEX_PARSE_BLOCKS):
+                VICD = member.get('VICD')
+                if VICD is None:
+                    continue
+                for snum in VICD.sections:
+                    VICD.parseData(section_num=snum)
+                    section = VICD.sections[snum]
+                    size = len(VICD.getData(section_num=snum).getbuffer())
+                    code = bytes(section.content)
+                    chunks = [(offset, chunk_len, chunkFingerprint(code[offset:offset+chunk_len]),) \
+                      for offset, chunk_len in codeChunks(code)]
+                    codes.append( (member_name, snum, getPrettyStrFromRsrcType(section.codeID), size, len(code), \
+                      hashlib.sha256(code).hexdigest(), chunks,) )
+    except Exception as e:
+        return codes, "{}: {}".format(type(e).__name__, str(e))
+    return codes, None
+
+
+def readFileCodeTask(args):
+    fname, size, mtime, sha256, textcp = args
+    codes, error = readFileCode(fname, textcp)
+    return fname, size, mtime, sha256, codes, error
+
+
+class CodeIndex(indexDeps.RsrcFileIndex):
+    """ SQLite database of compiled code within RSRC files
+
+    Entries are code sections of VICD block, with fingerprints of their chunks.
+    Code of LLB members is stored with 'container:member' path.
+    """
+    DB_SCHEMA = INDEX_DB_SCHEMA
+    ITEMS_NAME = "code sections"
+    readFileTask = readFileCodeTask
+
+    def storeFile(self, fname, size, mtime, sha256, codes, error):
+        name = os.path.basename(fname)
+        cur = self.db.execute("SELECT id FROM files WHERE path = ?", (fname,))
+        row = cur.fetchone()
+        if row is not None:
+            file_id = row[0]
+            self.db.execute("DELETE FROM code WHERE file_id = ?", (file_id,))
+            self.db.execute("UPDATE files SET size = ?, mtime = ?, sha256 = ?, name = ?, error = ? WHERE id = ?", \
+              (size, mtime, sha256, name, error, file_id,))
+        else:
+            cur = self.db.execute("INSERT INTO files (path, size, mtime, sha256, name, error) VALUES (?, ?, ?, ?, ?, ?)", \
+              (fname, size, mtime, sha256, name, error,))
+            file_id = cur.lastrowid
+        for member, snum, arch, code_size_all, code_size, code_sha256, chunks in codes:
+            code_name = member.split(":")[-1] if len(member) > 0 else name
+            cur = self.db.execute("INSERT INTO code (file_id, member, name, section, arch, size, code_size, sha256) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", \
+              (file_id, member, code_name, snum, arch, code_size_all, code_size, code_sha256,))
+            code_id = cur.lastrowid
+            self.db.executemany("INSERT INTO chunks (code_id, offset, size, fingerprint) VALUES (?, ?, ?, ?)", \
+              [(code_id,) + chunk for chunk in chunks])
+
+    def indexedContent(self, file_id):
+        codes = []
+        for code_id, member, snum, arch, code_size_all, code_size, code_sha256 in self.db.execute(\
+          "SELECT id, member, section, arch, size, code_size, sha256 FROM code WHERE file_id = ?", (file_id,)).fetchall():
+            chunks = self.db.execute("SELECT offset, size, fingerprint FROM chunks WHERE code_id = ? ORDER BY offset", \
+              (code_id,)).fetchall()
+            codes.append( (member, snum, arch, code_size_all, code_size, code_sha256, chunks,) )
+        return codes
+
+    def hasFile(self, name):
+        """ Returns whether the index has a file or LLB member matching given name or path
+        """
+        if self.db.execute("SELECT 1 FROM files WHERE name = :n OR path = :n LIMIT 1", {'n': name}).fetchone() is not None:
+            return True
+        return self.db.execute("SELECT 1 FROM code_src WHERE name = :n OR path = :n LIMIT 1", {'n': name}).fetchone() is not None
+
+    def codeOfFile(self, name):
+        """ Returns list of code sections within files matching given name or path
+        """
+        return self.db.execute("""
+            SELECT c.path, c.section, c.arch, c.size, c.code_size, c.sha256
+            FROM code_src c
+            WHERE :n IN (c.name, c.path, c.file_name, c.file_path)
+            ORDER BY c.path, c.section""", {'n': name}).fetchall()
+
+    def filesWithCode(self, sha256):
+        """ Returns list of code sections with compiled code of given hash
+        """
+        return self.db.execute("""
+            SELECT c.path, c.section, c.arch, c.size, c.code_size, c.sha256
+            FROM code_src c
+            WHERE c.sha256 = :h
+            ORDER BY c.path, c.section""", {'h': sha256}).fetchall()
+
+    def sameCode(self, name):
+        """ Returns list of other files with compiled code identical to code of files matching given name
+        """
+        return self.db.execute("""
+            WITH src(path, sha256) AS (
+                SELECT c.path, c.sha256 FROM code_src c
+                WHERE :n IN (c.name, c.path, c.file_name, c.file_path)
+            )
+            SELECT DISTINCT c2.path, c2.section, c2.arch, c2.size, c2.code_size, c2.sha256
+            FROM src JOIN code_src c2 ON c2.sha256 = src.sha256
+            WHERE c2.path NOT IN (SELECT path FROM src)
+            ORDER BY c2.path, c2.section""", {'n': name}).fetchall()
+
+    def similarCode(self, name, limit=None):
+        """ Returns list of other files sharing chunks of compiled code with files matching given name
+
+        Each entry has amount of bytes within chunks shared with the code,
+        and amount of bytes of the whole code; most similar entries are first.
+        """
+        query = """
+            WITH src_code(id, path) AS (
+                SELECT c.id, c.path FROM code_src c
+                WHERE :n IN (c.name, c.path, c.file_name, c.file_path)
+            ), src(fingerprint) AS (
+                SELECT DISTINCT ch.fingerprint FROM src_code s
+                  JOIN chunks ch ON ch.code_id = s.id
+            )
+            SELECT c2.path, c2.section, c2.arch, SUM(ch2.size) AS shared, c2.code_size
+            FROM src JOIN chunks ch2 ON ch2.fingerprint = src.fingerprint
+              JOIN code_src c2 ON c2.id = ch2.code_id
+            WHERE c2.path NOT IN (SELECT path FROM src_code)
+            GROUP BY c2.id
+            ORDER BY shared DESC, c2.path"""
+        if limit is not None:
+            query += " LIMIT {:d}".format(limit)
+        return self.db.execute(query, {'n': name}).fetchall()
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('-b', '--db', default="lvcode.sqlite", type=str,
+            help="name of the SQLite index database (default is \"%(default)s\")")
+
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+            help="increases verbosity level; max level is set by -vv")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+            help="amount of processes parsing files while updating the index")
+
+    parser.add_argument('--prune', action='store_true',
+            help="remove files which no longer exist from the index (works with --update command)")
+
+    parser.add_argument('--limit', default=None, type=int,
+            help="max amount of listed files (works with --similar command)")
+
+    subparser = parser.add_mutually_exclusive_group(required=True)
+
+    subparser.add_argument('-u', '--update', nargs='+', metavar='PATH',
+            help="index new and changed RSRC files within given folders")
+
+    subparser.add_argument('-l', '--list', metavar='NAME', type=str,
+            help="list compiled code sections of file with given name or path")
+
+    subparser.add_argument('-s', '--same', metavar='NAME', type=str,
+            help="list files with compiled code identical to code of file with given name or path")
+
+    subparser.add_argument('-m', '--similar', metavar='NAME', type=str,
+            help="list files sharing chunks of compiled code with file with given name or path")
+
+    subparser.add_argument('--hash', metavar='SHA256', type=str,
+            help="list files with compiled code of given SHA-256 hash")
+
+    subparser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    index = CodeIndex(po.db, po)
+
+    if po.update is not None:
+
+        stats = index.update(po.update, jobs=po.jobs, prune=po.prune)
+        print("{:s}: parsed {:d}, copied {:d}, unchanged {:d}, removed {:d}, errors {:d}"\
+          .format(po.db, stats['parsed'], stats['copied'], stats['unchanged'], stats['removed'], stats['errors']))
+
+    elif po.list is not None or po.same is not None or po.hash is not None:
+
+        name = po.list if po.list is not None else po.same
+        if name is not None and not index.hasFile(name):
+            raise LookupError("File '{:s}' not in index {:s}".format(name, po.db))
+
+        if po.list is not None:
+            rows = index.codeOfFile(po.list)
+        elif po.same is not None:
+            rows = index.sameCode(po.same)
+        else:
+            rows = index.filesWithCode(po.hash.lower())
+        for path, snum, arch, size, code_size, sha256 in rows:
+            print("{}\t{}\t{}\t{}\t{}\t{}".format(path, snum, arch, size, code_size, sha256))
+
+    elif po.similar is not None:
+
+        if not index.hasFile(po.similar):
+            raise LookupError("File '{:s}' not in index {:s}".format(po.similar, po.db))
+
+        for path, snum, arch, shared, code_size in index.similarCode(po.similar, limit=po.limit):
+            print("{}\t{}\t{}\t{}\t{}\t{:.1f}%".format(path, snum, arch, shared, code_size, \
+              100.0 * shared / code_size if code_size > 0 else 0.0))
+
+    else:
+
+        raise NotImplementedError('Unsupported command.')
+
+    index.close()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC files dependency indexer.
+
+Builds SQLite database of dependencies between RSRC files, from link-info
+blocks, and answers reverse-dependency and transitive-closure queries.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import sys
+import os
+import argparse
+import sqlite3
+import hashlib
+import multiprocessing
+
+from LVrsrcontainer import *
+from LVmisc import eprint
+
+import readRSRC
+
+
+# Blocks storing LinkObjects of the VI
+LINK_BLOCK_IDENTS = (b'LIvi', b'LIfp', b'LIbd', b'LIds',)
+
+# Blocks which need parsing for the index; other blocks, including heaps and DFDS, are skipped
+INDEX_PARSE_BLOCKS = LINK_BLOCK_IDENTS + (b'LIBN', b'LVSR', b'vers',)
+
+# Separator of Qualified Name elements, as shown by LabVIEW
+QUALIFIED_NAME_SEP = ":"
+
+INDEX_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    name TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS deps (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    block TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target_name TEXT NOT NULL,
+    target_qualname TEXT NOT NULL,
+    target_path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS files_qualname ON files(qualname);
+CREATE INDEX IF NOT EXISTS deps_file_id ON deps(file_id);
+CREATE INDEX IF NOT EXISTS deps_target_name ON deps(target_name);
+CREATE INDEX IF NOT EXISTS deps_target_qualname ON deps(target_qualname);
+"""
+
+
+def getIndexedExtensions():
+    """ Returns set of file extensions of RSRC files which can have dependencies
+    """
+    exts = set("." + getFileExtByType(ftype) for ftype in FILE_FMT_TYPE if ftype != FILE_FMT_TYPE.NONE)
+    exts.update([".vim", ".rsrc",])
+    return exts
+
+
+def fileContentHash(fname):
+    hasher = hashlib.sha256()
+    with open(fname, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024*1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def readFileDeps(fname, textcp):
+    """ Loads link-info blocks from RSRC file and returns list of its dependencies
+
+    Returns tuple of library names containing the file, list of dependency
+    tuples (block, kind, target_name, target_qualname, target_path),
+    and error message (or None).
+    """
+    po = readRSRC.prepareDefaultOptions(rsrc=fname, textcp=textcp)
+    libs = []
+    deps = []
+    try:
+        with open(fname, "rb") as rsrc_fh:
+            vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=textcp, parse_blocks=INDEX_PARSE_BLOCKS)
+            LIBN = vi.get('LIBN')
+            if LIBN is not None:
+                LIBN.parseData()
+                libs = [name.decode(textcp) for name in LIBN.getContent()]
+            for ident in LINK_BLOCK_IDENTS:
+                block = vi.get(ident)
+                if block is None:
+                    continue
+                block_name = getPrettyStrFromRsrcType(ident)
+                for snum in block.sections:
+                    block.parseData(section_num=snum)
+                    for client in block.sections[snum].content:
+                        qualName = [name.decode(textcp) for name in client.getTargetQualName()]
+                        pathRef = client.getTargetPathRef()
+                        if pathRef is not None:
+                            path = "/".join(name.decode(textcp) for name in pathRef.content)
+                        else:
+                            path = ""
+                        if len(qualName) > 0:
+                            name = qualName[-1]
+                        else:
+                            name = path.split("/")[-1]
+                        deps.append( (block_name, getPrettyStrFromRsrcType(client.ident), \
+                          name, QUALIFIED_NAME_SEP.join(qualName), path,) )
+    except Exception as e:
+        return libs, deps, "{}: {}".format(type(e).__name__, str(e))
+    return libs, deps, None
+
+
+def readFileDepsTask(args):
+    fname, size, mtime, sha256, textcp = args
+    libs, deps, error = readFileDeps(fname, textcp)
+    return fname, size, mtime, sha256, (libs, deps,), error
+
+
+class RsrcFileIndex:
+    """ Base of SQLite databases with data read from RSRC files
+
+    Files are identified by path, and re-read only if their size, modification
+    time and content hash changed. Files with content identical to already
+    indexed ones get their entries copied instead of being parsed.
+    Inheriting classes provide the schema, which must include 'files' table,
+    task reading entries of a file, and storing and loading of the entries.
+    """
+    # Schema of the database, with 'files' table of (id, path, size, mtime, sha256, error, ...)
+    DB_SCHEMA = None
+    # Name of the entries read from each file, for messages
+    ITEMS_NAME = "entries"
+    # Module level function which reads entries of one file, in worker process; gets tuple
+    # (fname, size, mtime, sha256, textcp), returns (fname, size, mtime, sha256, content, error)
+    readFileTask = None
+
+    def __init__(self, db_fname, po):
+        self.po = po
+        self.db = sqlite3.connect(db_fname)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(self.DB_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def storeFile(self, fname, size, mtime, sha256, content, error):
+        """ Stores file with given entries, replacing previous entries of that path
+        """
+        raise NotImplementedError("Index does not define storing of files")
+
+    def indexedContent(self, file_id):
+        """ Returns entries of already indexed file, in the form given to storeFile()
+        """
+        raise NotImplementedError("Index does not define loading of files")
+
+    def contentCount(self, content):
+        return len(content)
+
+    def listFiles(self, paths):
+        exts = getIndexedExtensions()
+        for path in paths:
+            if os.path.isfile(path):
+                yield os.path.abspath(path)
+                continue
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for fname in sorted(filenames):
+                    if os.path.splitext(fname)[1].lower() not in exts:
+                        continue
+                    fname = os.path.abspath(os.path.join(dirpath, fname))
+                    if isRSRCFile(fname):
+                        yield fname
+
+    def copyFile(self, fname, size, mtime, sha256):
+        """ Stores file using entries of already indexed file with identical content
+        """
+        cur = self.db.execute("SELECT id FROM files WHERE sha256 = ? AND path != ? AND error IS NULL LIMIT 1", \
+          (sha256, fname,))
+        row = cur.fetchone()
+        if row is None:
+            return False
+        self.storeFile(fname, size, mtime, sha256, self.indexedContent(row[0]), None)
+        return True
+
+    def update(self, paths, jobs=1, prune=False):
+        """ Indexes new and changed RSRC files within given paths
+
+        Returns dict with amounts of files which were parsed, copied, unchanged and removed.
+        """
+        stats = { 'parsed': 0, 'copied': 0, 'unchanged': 0, 'removed': 0, 'errors': 0 }
+        known = {}
+        for file_id, path, size, mtime, sha256 in self.db.execute("SELECT id, path, size, mtime, sha256 FROM files"):
+            known[path] = (file_id, size, mtime, sha256,)
+        seen = set()
+        tasks = []
+        for fname in self.listFiles(paths):
+            seen.add(fname)
+            st = os.stat(fname)
+            prev = known.get(fname)
+            if prev is not None and prev[1] == st.st_size and prev[2] == st.st_mtime:
+                stats['unchanged'] += 1
+                continue
+            # Each changed file is hashed once; the hash is passed on with the task
+            sha256 = fileContentHash(fname)
+            if prev is not None and prev[1] == st.st_size and sha256 == prev[3]:
+                # Touched but not modified
+                self.db.execute("UPDATE files SET mtime = ? WHERE id = ?", (st.st_mtime, prev[0],))
+                stats['unchanged'] += 1
+                continue
+            tasks.append( (fname, st.st_size, st.st_mtime, sha256, self.po.textcp,) )
+
+        # Files with content already in the index do not need parsing
+        to_parse = []
+        for task in tasks:
+            fname, size, mtime, sha256, textcp = task
+            if self.copyFile(fname, size, mtime, sha256):
+                stats['copied'] += 1
+            else:
+                to_parse.append(task)
+
+        readFileTask = type(self).readFileTask
+        if jobs > 1 and len(to_parse) > 1:
+            with multiprocessing.Pool(jobs) as pool:
+                results = pool.imap_unordered(readFileTask, to_parse, chunksize=8)
+                self.storeResults(results, stats)
+        else:
+            self.storeResults(map(readFileTask, to_parse), stats)
+
+        if prune:
+            for path, (file_id, size, mtime, sha256) in known.items():
+                if path in seen:
+                    continue
+                if not any(path == p or path.startswith(os.path.join(os.path.abspath(p), "")) for p in paths):
+                    continue
+                self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                stats['removed'] += 1
+        self.db.commit()
+        return stats
+
+    def storeResults(self, results, stats):
+        for fname, size, mtime, sha256, content, error in results:
+            if error is not None:
+                stats['errors'] += 1
+                if (self.po.verbose > 0):
+                    eprint("{:s}: Warning: {:s} not indexed; {:s}".format(fname, self.ITEMS_NAME.capitalize(), error))
+            if (self.po.verbose > 1):
+                print("{:s}: Indexed {:d} {:s}".format(fname, self.contentCount(content), self.ITEMS_NAME))
+            self.storeFile(fname, size, mtime, sha256, content, error)
+            stats['parsed'] += 1
+
+
+class DependencyIndex(RsrcFileIndex):
+    """ SQLite database of dependencies between RSRC files
+
+    Entries are link-info items, with names of libraries containing the file.
+    """
+    DB_SCHEMA = INDEX_DB_SCHEMA
+    ITEMS_NAME = "dependencies"
+    readFileTask = readFileDepsTask
+
+    def contentCount(self, content):
+        libs, deps = content
+        return len(deps)
+
+    def storeFile(self, fname, size, mtime, sha256, content, error):
+        libs, deps = content
+        name = os.path.basename(fname)
+        qualname = QUALIFIED_NAME_SEP.join(libs + [name])
+        cur = self.db.execute("SELECT id FROM files WHERE path = ?", (fname,))
+        row = cur.fetchone()
+        if row is not None:
+            file_id = row[0]
+            self.db.execute("DELETE FROM deps WHERE file_id = ?", (file_id,))
+            self.db.execute("UPDATE files SET size = ?, mtime = ?, sha256 = ?, name = ?, qualname = ?, error = ? WHERE id = ?", \
+              (size, mtime, sha256, name, qualname, error, file_id,))
+        else:
+            cur = self.db.execute("INSERT INTO files (path, size, mtime, sha256, name, qualname, error) VALUES (?, ?, ?, ?, ?, ?, ?)", \
+              (fname, size, mtime, sha256, name, qualname, error,))
+            file_id = cur.lastrowid
+        self.db.executemany("INSERT INTO deps (file_id, block, kind, target_name, target_qualname, target_path) VALUES (?, ?, ?, ?, ?, ?)", \
+          [(file_id,) + dep for dep in deps])
+
+    def indexedContent(self, file_id):
+        qualname, = self.db.execute("SELECT qualname FROM files WHERE id = ?", (file_id,)).fetchone()
+        libs = qualname.split(QUALIFIED_NAME_SEP)[:-1]
+        deps = self.db.execute("SELECT block, kind, target_name, target_qualname, target_path FROM deps WHERE file_id = ?", \
+          (file_id,)).fetchall()
+        return (libs, deps,)
+
+    def dependencies(self, name):
+        """ Returns list of items which files matching given name directly depend on
+        """
+        return self.db.execute("""
+            SELECT DISTINCT f.path, d.block, d.kind, d.target_qualname, d.target_path
+            FROM files f JOIN deps d ON d.file_id = f.id
+            WHERE f.qualname = :n OR f.name = :n OR f.path = :n
+            ORDER BY f.path, d.target_qualname""", {'n': name}).fetchall()
+
+    def reverseDependencies(self, name):
+        """ Returns list of files which directly depend on item with given name
+        """
+        return self.db.execute("""
+            SELECT DISTINCT f.path, d.block, d.kind, d.target_qualname
+            FROM deps d JOIN files f ON f.id = d.file_id
+            WHERE d.target_qualname = :n OR d.target_name = :n
+            ORDER BY f.path""", {'n': name}).fetchall()
+
+    def dependenciesClosure(self, name):
+        """ Returns list of indexed files which files matching given name depend on, directly or not
+        """
+        return [row[0] for row in self.db.execute("""
+            WITH RECURSIVE used(id) AS (
+                SELECT t.id FROM files f
+                  JOIN deps d ON d.file_id = f.id
+                  JOIN files t ON t.qualname = d.target_qualname
+                WHERE f.qualname = :n OR f.name = :n OR f.path = :n
+              UNION
+                SELECT t.id FROM used u
+                  JOIN deps d ON d.file_id = u.id
+                  JOIN files t ON t.qualname = d.target_qualname
+            )
+            SELECT path FROM files WHERE id IN used ORDER BY path""", {'n': name})]
+
+    def reverseDependenciesClosure(self, name):
+        """ Returns list of files which depend on item with given name, directly or not
+        """
+        return [row[0] for row in self.db.execute("""
+            WITH RECURSIVE users(id) AS (
+                SELECT d.file_id FROM deps d
+                WHERE d.target_qualname = :n OR d.target_name = :n
+              UNION
+                SELECT d.file_id FROM users u
+                  JOIN files f ON f.id = u.id
+                  JOIN deps d ON d.target_qualname = f.qualname
+            )
+            SELECT path FROM files WHERE id IN users ORDER BY path""", {'n': name})]
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('-b', '--db', default="lvdeps.sqlite", type=str,
+            help="name of the SQLite index database (default is \"%(default)s\")")
+
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+            help="increases verbosity level; max level is set by -vv")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+            help="amount of processes parsing files while updating the index")
+
+    parser.add_argument('--transitive', action='store_true',
+            help="list also indirect dependencies (works with --deps and --rdeps commands)")
+
+    parser.add_argument('--prune', action='store_true',
+            help="remove files which no longer exist from the index (works with --update command)")
+
+    subparser = parser.add_mutually_exclusive_group(required=True)
+
+    subparser.add_argument('-u', '--update', nargs='+', metavar='PATH',
+            help="index new and changed RSRC files within given folders")
+
+    subparser.add_argument('-d', '--deps', metavar='NAME', type=str,
+            help="list dependencies of file with given name, qualified name or path")
+
+    subparser.add_argument('-r', '--rdeps', metavar='NAME', type=str,
+            help="list files which depend on item with given name or qualified name")
+
+    subparser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    index = DependencyIndex(po.db, po)
+
+    if po.update is not None:
+
+        stats = index.update(po.update, jobs=po.jobs, prune=po.prune)
+        print("{:s}: parsed {:d}, copied {:d}, unchanged {:d}, removed {:d}, errors {:d}"\
+          .format(po.db, stats['parsed'], stats['copied'], stats['unchanged'], stats['removed'], stats['errors']))
+
+    elif po.deps is not None:
+
+        if po.transitive:
+            for path in index.dependenciesClosure(po.deps):
+                print(path)
+        else:
+            for path, block, kind, target_qualname, target_path in index.dependencies(po.deps):
+                print("{}\t{}\t{}\t{}\t{}".format(path, block, kind, target_qualname, target_path))
+
+    elif po.rdeps is not None:
+
+        if po.transitive:
+            for path in index.reverseDependenciesClosure(po.rdeps):
+                print(path)
+        else:
+            for path, block, kind, target_qualname in index.reverseDependencies(po.rdeps):
+                print("{}\t{}\t{}\t{}".format(path, block, kind, target_qualname))
+
+    else:
+
+        raise NotImplementedError('Unsupported command.')
+
+    index.close()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)
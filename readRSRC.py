@@ -19,22 +19,77 @@ __license__ = "MIT"
 import sys
 import re
 import os
+import io
+import stat
+import json
+import signal
+import socket
 import argparse
+import traceback
+import contextlib
+import multiprocessing
 
 import LVxml as ET
 import LVblock
 import LVdatatype
 from LVrsrcontainer import *
-from LVmisc import eprint
+from LVmisc import eprint, lazyImport
 
+LVheapquery = lazyImport('LVheapquery')
 
-def main():
-    """ Main executable function.
 
-    Its task is to parse command line options and call a function which performs requested command.
+def heapQueryFile(args):
+    """ Runs heap query on one RSRC file, returning printable lines with matches
+
+    Only blocks needed to get file version are parsed, heaps are searched raw.
     """
-    # Parse command line options
+    po, query, fname = args
+    lines = []
+    try:
+        with open(fname, "rb") as rsrc_fh:
+            vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=po.textcp, parse_blocks=(b'LVSR', b'vers',))
+            matches = vi.queryHeaps(query, limit=po.query_limit)
+        for match in matches:
+            content = match.getContentText()
+            if content is None:
+                content = ""
+            lines.append("{}\t{}\t{:d}\t{:d}\t{}\t{}\t{}".format(fname, match.block_ident.decode('ascii'), \
+              match.section_num, match.index, "/".join(match.path), match.getAttribsText(), content))
+    except Exception as ex:
+        return fname, lines, str(ex)
+    return fname, lines, None
+
+
+def writeXMLDataset(po, root):
+    """ Writes main XML file of extracted dataset
+    """
+    if (po.verbose > 0):
+        print("{}: Writing binding XML".format(po.xml))
+    tree = ET.ElementTree(root)
+    with open(po.xml, "wb") as xml_fh:
+        tree.write(xml_fh, encoding='utf-8', xml_declaration=True)
+
+
+def writeBinDataset(po, vi, simple_bin=False):
+    """ Writes extracted dataset as compact binary file
+    """
+    if (po.verbose > 0):
+        print("{}: Writing compact binary file".format(po.xml))
+    with open(po.xml, "wb") as bin_fh:
+        vi.exportBin(bin_fh, simple_bin=simple_bin)
+
+
+def jsonDefault(val):
+    """ Converts values which JSON does not support, for --json command
+    """
+    if isinstance(val, (bytes, bytearray, memoryview,)):
+        return bytes(val).hex()
+    return str(val)
+
 
+def prepareArgParser():
+    """ Creates parser of command line options
+    """
     parser = argparse.ArgumentParser(description=__doc__)
 
     parser.add_argument('-i', '--rsrc', '--vi', default="", type=str,
@@ -61,6 +116,45 @@ def main():
             help="extract files to names indicated by RSRC content" \
             " (works with --extract and --dump commands; useful for LLBs)")
 
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+            help="amount of processes searching files in parallel" \
+            " (works with --heap-query command)")
+
+    parser.add_argument('--query-limit', default=None, type=int,
+            help="stop searching a file after given amount of matches" \
+            " (works with --heap-query command)")
+
+    parser.add_argument('--td-cache', default=None, type=str,
+            help="folder for on-disk cache of parsed Type Descriptors, shared" \
+            " between runs; speeds up batch processing of files with the same typedefs;" \
+            " the folder must be private to current user")
+
+    parser.add_argument('--td-cache-entries', default=None, type=int,
+            help="amount of parsed Type Descriptors kept in memory cache; enables the" \
+            " cache without storing it on disk, unless --td-cache is also given" \
+            " (default is 4096 with --td-cache, otherwise disabled)")
+
+    parser.add_argument('--store', default=None, type=str,
+            help="folder for content-addressed store of extracted files; files are named" \
+            " by hash and shared between all VIs extracted with the same store" \
+            " (works with --extract, --dump and --create commands)")
+
+    parser.add_argument('--single-file', action='store_true',
+            help="embed all extracted files within the main XML, instead of writing them" \
+            " separately; heap XMLs are embedded as subtrees, binaries as base64" \
+            " (works with --extract and --dump commands)")
+
+    parser.add_argument('--binary', action='store_true',
+            help="store extracted dataset as single compact binary file instead of XML;" \
+            " Type Descriptors, Default Fills and heap nodes are kept as separate records" \
+            " in their RSRC form, which makes extraction and re-creation much faster, but" \
+            " the file is not editable (works with --extract, --dump and --create)")
+
+    parser.add_argument('--xml-backend', default="auto", choices=ET.XML_BACKENDS, type=str,
+            help="library used for writing and parsing XML files; both produce the same" \
+            " files, \"lxml\" writes and parses them faster; \"auto\" uses lxml if it" \
+            " is installed (default is \"%(default)s\")")
+
     subparser = parser.add_mutually_exclusive_group(required=True)
 
     subparser.add_argument('-l', '--list', action='store_true',
@@ -74,30 +168,91 @@ def main():
             help="extract content of RSRC file into XMLs, parsing all blocks" \
             " which structure is known")
 
+    subparser.add_argument('--json', action='store_true',
+            help="print content of RSRC file as JSON, with all blocks parsed;" \
+            " no other files are written, binary data is given as hex strings")
+
     subparser.add_argument('-c', '--create', action='store_true',
             help="create RSRC file using information from XMLs")
 
+    subparser.add_argument('--pack-llb', default=None, type=str, metavar='DIR',
+            help="create LLB file containing all RSRC files from given folder; files" \
+            " are copied into the output one by one, without loading them to memory")
+
     subparser.add_argument('-n', '--info', action='store_true',
             help="print general information about RSRC file")
 
+    subparser.add_argument('-g', '--icons', action='store_true',
+            help="extract all icons from RSRC file into single sprite sheet PNG" \
+            " (one column per icon type, one row per section)")
+
     subparser.add_argument('-p', '--password', default=None, type=str,
             help="change password and re-compute checksums within RSRC file;" \
             " save changes in-place, to the RSRC file")
 
+    subparser.add_argument('-q', '--heap-query', default=None, type=str,
+            help="search Front Panel and Block Diagram heaps of RSRC files for entries" \
+            " matching XPath-like query, ie. \"//SL__arrayElement[@class='label']/textRec/text\"")
+
+    subparser.add_argument('--diff', action='store_true',
+            help="compare two RSRC files and list differences in blocks, heap nodes," \
+            " type descriptors and default data; files are given by -i and FILE")
+
+    subparser.add_argument('--serve', default=None, type=str, metavar='SOCKET',
+            help="keep running and execute commands received through given Unix socket;" \
+            " use readRSRCClient.py to send commands")
+
     subparser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
               .format(version=__version__,author=__author__),
             help="display version information and exit")
 
-    po = parser.parse_args()
+    parser.add_argument('rsrc_list', nargs='*', metavar='FILE',
+            help="further RSRC files to process (works with --heap-query and --diff commands)")
+
+    return parser
+
+
+def prepareDefaultOptions(**kwargs):
+    """ Creates options for VI objects, with defaults of all command line options
+
+    Given keyword arguments replace the defaults. Tools which create VI objects
+    without parsing command line should get their options here.
+    """
+    po = argparse.Namespace(filebase="", connector_list_limit=4095, array_data_limit=(2**30)-1)
+    parser = prepareArgParser()
+    for action in parser._actions:
+        if action.default is argparse.SUPPRESS:
+            continue
+        setattr(po, action.dest, action.default)
+    if len(kwargs.get('xml', "")) > 0:
+        po.filebase = os.path.splitext(os.path.basename(kwargs['xml']))[0]
+    for name, val in kwargs.items():
+        setattr(po, name, val)
+    return po
+
+
+def processCommand(po):
+    """ Performs command requested by given command line options
+
+    Returns exit status of the command.
+    """
+    po = prepareDefaultOptions(**vars(po))
+
+    if po.td_cache is not None or po.td_cache_entries is not None:
+        max_entries = po.td_cache_entries if po.td_cache_entries is not None else 4096
+        LVdatatype.typeDescCache.configure(max_entries=max_entries, store_path=po.td_cache)
 
-    po.connector_list_limit = 4095
-    po.array_data_limit = (2**30) - 1
+    ET.setBackend(po.xml_backend)
 
     # Store base name - without path and extension
     if len(po.xml) > 0:
         po.filebase = os.path.splitext(os.path.basename(po.xml))[0]
     elif len(po.rsrc) > 0:
         po.filebase = os.path.splitext(os.path.basename(po.rsrc))[0]
+    elif len(po.rsrc_list) > 0:
+        po.filebase = os.path.splitext(os.path.basename(po.rsrc_list[0]))[0]
+    elif po.pack_llb is not None:
+        po.filebase = os.path.basename(os.path.abspath(po.pack_llb))
     else:
         raise FileNotFoundError("Input file was not provided neither as RSRC or XML.")
 
@@ -119,7 +274,7 @@ def main():
     elif po.dump:
 
         if len(po.xml) == 0:
-            po.xml = po.filebase + ".xml"
+            po.xml = po.filebase + (".lvbx" if po.binary else ".xml")
         if len(po.rsrc) == 0:
             po.rsrc = getExistingRSRCFileWithBase(po.filebase)
         if len(po.rsrc) == 0:
@@ -130,18 +285,16 @@ def main():
         with open(po.rsrc, "rb") as rsrc_fh:
             vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=po.textcp)
 
-            root = vi.exportBinBlocksXMLTree()
-
-        if (po.verbose > 0):
-            print("{}: Writing binding XML".format(po.xml))
-        tree = ET.ElementTree(root)
-        with open(po.xml, "wb") as xml_fh:
-            tree.write(xml_fh, encoding='utf-8', xml_declaration=True)
+            if po.binary:
+                writeBinDataset(po, vi, simple_bin=True)
+            else:
+                root = vi.exportBinBlocksXMLTree()
+                writeXMLDataset(po, root)
 
     elif po.extract:
 
         if len(po.xml) == 0:
-            po.xml = po.filebase + ".xml"
+            po.xml = po.filebase + (".lvbx" if po.binary else ".xml")
         if len(po.rsrc) == 0:
             po.rsrc = getExistingRSRCFileWithBase(po.filebase)
         if len(po.rsrc) == 0:
@@ -152,26 +305,45 @@ def main():
         with open(po.rsrc, "rb") as rsrc_fh:
             vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=po.textcp)
 
-            root = vi.exportXMLTree()
+            if po.binary:
+                writeBinDataset(po, vi)
+            else:
+                root = vi.exportXMLTree()
+                writeXMLDataset(po, root)
 
             if po.file_map:
                 vi.printRSRCMap()
 
+    elif po.json:
+
+        if len(po.rsrc) == 0:
+            po.rsrc = getExistingRSRCFileWithBase(po.filebase)
+        if len(po.rsrc) == 0:
+            raise FileNotFoundError("No supported RSRC file was found despite checking all extensions.")
+
         if (po.verbose > 0):
-            print("{}: Writing binding XML".format(po.xml))
-        tree = ET.ElementTree(root)
-        with open(po.xml, "wb") as xml_fh:
-            tree.write(xml_fh, encoding='utf-8', xml_declaration=True)
+            print("{}: Starting file parse for JSON export".format(po.rsrc))
+        with open(po.rsrc, "rb") as rsrc_fh:
+            vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=po.textcp)
+
+            vi_dict = vi.to_dict()
+
+        json.dump(vi_dict, sys.stdout, indent=1, default=jsonDefault)
+        print("")
 
     elif po.create:
 
         if len(po.xml) == 0:
-            po.xml = po.filebase + ".xml"
+            po.xml = po.filebase + (".lvbx" if po.binary else ".xml")
 
         if (po.verbose > 0):
             print("{}: Starting file parse for RSRC creation".format(po.rsrc))
-        tree = ET.parse(po.xml)
-        vi = VI(po, xml_root=tree.getroot(), text_encoding=po.textcp)
+        if po.binary:
+            with open(po.xml, "rb") as bin_fh:
+                vi = VI(po, bin_fh=bin_fh, text_encoding=po.textcp)
+        else:
+            tree = ET.parse(po.xml)
+            vi = VI(po, xml_root=tree.getroot(), text_encoding=po.textcp)
 
         if len(po.rsrc) == 0:
             po.rsrc = po.filebase + "." + getFileExtByType(vi.ftype)
@@ -179,6 +351,93 @@ def main():
         with open(po.rsrc, "wb") as rsrc_fh:
             vi.saveRSRC(rsrc_fh)
 
+    elif po.pack_llb is not None:
+
+        if len(po.rsrc) == 0:
+            po.rsrc = po.filebase + "." + getFileExtByType(FILE_FMT_TYPE.LLB)
+
+        member_fnames = []
+        for fname in sorted(os.listdir(po.pack_llb)):
+            fname = os.path.join(po.pack_llb, fname)
+            if not os.path.isfile(fname) or os.path.abspath(fname) == os.path.abspath(po.rsrc):
+                continue
+            if not isRSRCFile(fname):
+                eprint("{:s}: Warning: Not a RSRC file, skipping".format(fname))
+                continue
+            member_fnames.append(fname)
+        if len(member_fnames) < 1:
+            raise FileNotFoundError("No RSRC files found in folder '{}' to pack into LLB.".format(po.pack_llb))
+
+        if (po.verbose > 0):
+            print("{}: Starting LLB creation from {:d} files".format(po.rsrc,len(member_fnames)))
+        vi = VI(po, text_encoding=po.textcp)
+        with open(po.rsrc, "wb") as rsrc_fh:
+            vi.saveLLBFromFiles(rsrc_fh, member_fnames)
+
+    elif po.icons:
+
+        if len(po.rsrc) == 0:
+            po.rsrc = getExistingRSRCFileWithBase(po.filebase)
+        if len(po.rsrc) == 0:
+            raise FileNotFoundError("No supported RSRC file was found despite checking all extensions.")
+
+        if len(po.xml) == 0:
+            po.xml = po.filebase + ".xml"
+        # The sheet is placed where the XML would be
+        sheet_fname = os.path.join(os.path.dirname(po.xml), po.filebase + "_icons.png")
+
+        if (po.verbose > 0):
+            print("{}: Starting file parse for icons extraction".format(po.rsrc))
+        with open(po.rsrc, "rb") as rsrc_fh:
+            vi = VI(po, rsrc_fh=rsrc_fh, text_encoding=po.textcp)
+
+            placement = vi.exportIconsSheet(sheet_fname)
+
+        if len(placement) < 1:
+            eprint("{}: Error: No icons found in the file nor in its LLB members".format(po.rsrc))
+            return 1
+        if (po.verbose > 0):
+            print("{}: Written {:d} icons".format(sheet_fname,len(placement)))
+
+    elif po.heap_query is not None:
+
+        rsrc_list = ([po.rsrc] if len(po.rsrc) > 0 else []) + po.rsrc_list
+        query = LVheapquery.HeapQuery(po.heap_query)
+        tasks = [(po, query, fname,) for fname in rsrc_list]
+        if po.jobs > 1 and len(tasks) > 1:
+            with multiprocessing.Pool(po.jobs) as pool:
+                results = list(pool.imap(heapQueryFile, tasks))
+        else:
+            results = map(heapQueryFile, tasks)
+        for fname, lines, error in results:
+            if error is not None:
+                eprint("{:s}: Warning: Heap query failed; {:s}".format(fname, error))
+            for line in lines:
+                print(line)
+
+    elif po.diff:
+
+        rsrc_list = ([po.rsrc] if len(po.rsrc) > 0 else []) + po.rsrc_list
+        if len(rsrc_list) != 2:
+            raise FileNotFoundError("Comparing requires exactly two RSRC files.")
+
+        with open(rsrc_list[0], "rb") as rsrc_fh_a, open(rsrc_list[1], "rb") as rsrc_fh_b:
+            if os.fstat(rsrc_fh_a.fileno()).st_size == os.fstat(rsrc_fh_b.fileno()).st_size and \
+              rsrc_fh_a.read() == rsrc_fh_b.read():
+                diffs = []
+            else:
+                if (po.verbose > 0):
+                    print("{}: Starting file parse for comparison with {}".format(rsrc_list[0],rsrc_list[1]))
+                # Blocks are only parsed when comparison reaches them
+                vi_a = VI(po, rsrc_fh=rsrc_fh_a, text_encoding=po.textcp, parse_blocks=())
+                vi_b = VI(po, rsrc_fh=rsrc_fh_b, text_encoding=po.textcp, parse_blocks=())
+                diffs = vi_a.diff(vi_b)
+
+        for entry in diffs:
+            print(str(entry))
+        if (po.verbose > 0):
+            print("{}: Found {:d} differences with {}".format(rsrc_list[0],len(diffs),rsrc_list[1]))
+
     elif po.password is not None:
 
         if len(po.rsrc) == 0:
@@ -212,6 +471,112 @@ def main():
 
         raise NotImplementedError('Unsupported command.')
 
+    if (po.verbose > 0) and LVdatatype.typeDescCache.isEnabled():
+        print(LVdatatype.typeDescCache.statsText())
+    return 0
+
+
+def serveRequest(parser, conn):
+    """ Executes one command received through socket, and sends back its result
+
+    Request is a line with JSON object containing command line arguments and
+    working folder of the client. Response is a line with JSON object containing
+    exit status, and text which the command printed to stdout and stderr.
+    """
+    with conn.makefile("rb") as conn_fh:
+        request = json.loads(conn_fh.readline().decode('utf-8'))
+    out_text, err_text = io.StringIO(), io.StringIO()
+    status = 0
+    prev_cwd = os.getcwd()
+    # Options of one command must not affect the next ones
+    prev_td_cache = LVdatatype.typeDescCache.getConfig()
+    prev_xml_backend = ET.backend
+    try:
+        os.chdir(request['cwd'])
+        with contextlib.redirect_stdout(out_text), contextlib.redirect_stderr(err_text):
+            # Only argparse may exit here; SystemExit from anywhere else, ie. SIGTERM, stops the server
+            try:
+                po = parser.parse_args(request['argv'])
+                if po.serve is not None:
+                    parser.error("argument --serve: not allowed in a served command")
+            except SystemExit as ex:
+                # Raised by argparse, ie. on --help or invalid arguments
+                po = None
+                if ex.code is None:
+                    status = 0
+                elif isinstance(ex.code, int):
+                    status = ex.code
+                else:
+                    eprint(ex.code)
+                    status = 1
+            if po is not None:
+                try:
+                    status = processCommand(po)
+                except Exception as ex:
+                    # Same output as when the exception leaves main() of one-shot run
+                    eprint("Error: "+str(ex))
+                    traceback.print_exc()
+                    status = 1
+    finally:
+        os.chdir(prev_cwd)
+        LVdatatype.typeDescCache.setConfig(prev_td_cache)
+        ET.setBackend(prev_xml_backend)
+    response = { 'status': status, 'stdout': out_text.getvalue(), 'stderr': err_text.getvalue() }
+    conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def serveRequests(parser, po):
+    """ Executes commands received through Unix socket, until interrupted
+
+    Modules stay imported and caches stay filled between the commands, which
+    removes the startup cost from processing of each file.
+    """
+    # Remove socket left by previous server, but never any other file
+    if os.path.lexists(po.serve):
+        if not stat.S_ISSOCK(os.lstat(po.serve).st_mode):
+            raise FileExistsError("Path '{}' exists and is not a socket; refusing to replace it".format(po.serve))
+        os.unlink(po.serve)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Terminate on SIGTERM the same way as on Ctrl+C, removing the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.bind(po.serve)
+        server.listen(16)
+        if (po.verbose > 0):
+            print("{}: Waiting for commands".format(po.serve))
+        while True:
+            conn, addr = server.accept()
+            with conn:
+                try:
+                    serveRequest(parser, conn)
+                except (OSError, ValueError, KeyError) as ex:
+                    eprint("{}: Warning: Request failed; {}".format(po.serve,str(ex)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.lexists(po.serve) and stat.S_ISSOCK(os.lstat(po.serve).st_mode):
+            os.unlink(po.serve)
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = prepareArgParser()
+
+    po = parser.parse_args()
+
+    if po.serve is not None:
+        serveRequests(parser, po)
+    else:
+        status = processCommand(po)
+        if status != 0:
+            sys.exit(status)
+
 if __name__ == "__main__":
     try:
         main()
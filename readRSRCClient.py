@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC files reader client.
+
+Sends command to readRSRC.py started with --serve, and prints its result.
+Arguments after socket name are the same as for readRSRC.py.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import sys
+import os
+import json
+import socket
+
+
+def sendCommand(sock_fname, argv, cwd=None):
+    """ Executes readRSRC command within server listening at given socket
+
+    Returns exit status, and text printed to stdout and stderr.
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+    request = { 'argv': list(argv), 'cwd': cwd }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(sock_fname)
+        conn.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with conn.makefile("rb") as conn_fh:
+            line = conn_fh.readline()
+    if len(line) < 1:
+        raise ConnectionError("Server closed connection without response.")
+    response = json.loads(line.decode('utf-8'))
+    return response['status'], response['stdout'], response['stderr']
+
+
+def main():
+    """ Main executable function.
+
+    Sends the command and returns with exit status of the command.
+    """
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help',):
+        print("usage: {} SOCKET [readRSRC arguments...]".format(os.path.basename(sys.argv[0])))
+        print(__doc__.strip())
+        return 0
+    status, out_text, err_text = sendCommand(sys.argv[1], sys.argv[2:])
+    sys.stdout.write(out_text)
+    sys.stderr.write(err_text)
+    return status
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as ex:
+        print("Error: "+str(ex), file=sys.stderr)
+        sys.exit(10)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+""" LabView RSRC files round-trip verifier.
+
+Extracts every RSRC file of a corpus to XML, re-creates it, and compares
+the binaries; writes a machine-readable report with timings and failures.
+"""
+
+# Copyright (C) 2019-2020 Mefistotelis <mefistotelis@gmail.com>
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+__version__ = "0.1.0"
+__author__ = "Mefistotelis"
+__license__ = "MIT"
+
+import sys
+import os
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+import LVxml as ET
+from LVrsrcontainer import *
+from LVmisc import eprint
+
+import readRSRC
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Amount of differences stored in report for each mismatching file
+REPORT_DIFF_LIMIT = 32
+
+
+def listCorpusFiles(paths):
+    """ Lists RSRC files within given files and folders, recognized by header
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for fname in sorted(filenames):
+                fname = os.path.join(dirpath, fname)
+                if isRSRCFile(fname):
+                    yield fname
+
+
+def peakMemoryKiB():
+    """ Returns peak resident memory of current process, in KiB, or None if unknown
+
+    The value is a maximum over the whole process lifetime.
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        maxrss //= 1024 # bytes on macOS, KiB elsewhere
+    return maxrss
+
+
+def newOptions(po, rsrc_fname, xml_fname):
+    """ Prepares options for VI object, as readRSRC.py would set them
+    """
+    return readRSRC.prepareDefaultOptions(verbose=po.verbose, textcp=po.textcp, \
+      rsrc=rsrc_fname, xml=xml_fname)
+
+def roundTripFile(args):
+    """ Extracts single RSRC file to XML and re-creates it; returns report entry
+    """
+    po, fname, work_dir = args
+    entry = { 'file': fname, 'size': os.path.getsize(fname), 'status': "error", 'stage': None, \
+      'times': {}, 'peak_rss_kib': None, 'failed_blocks': [], 'diffs': [], 'error': None }
+    fbase = os.path.splitext(os.path.basename(fname))[0]
+    file_dir = tempfile.mkdtemp(prefix=fbase+"_", dir=work_dir)
+    xml_fname = os.path.join(file_dir, fbase + ".xml")
+    new_fname = os.path.join(file_dir, "new_" + os.path.basename(fname))
+    try:
+        entry['stage'] = "extract"
+        tm_start = time.perf_counter()
+        vi_po = newOptions(po, fname, xml_fname)
+        with open(fname, "rb") as rsrc_fh:
+            vi = VI(vi_po, rsrc_fh=rsrc_fh, text_encoding=po.textcp)
+            root = vi.exportXMLTree()
+        with open(xml_fname, "wb") as xml_fh:
+            ET.ElementTree(root).write(xml_fh, encoding='utf-8', xml_declaration=True)
+        entry['times']['extract'] = time.perf_counter() - tm_start
+
+        entry['stage'] = "create"
+        tm_start = time.perf_counter()
+        vi_po = newOptions(po, new_fname, xml_fname)
+        tree = ET.parse(xml_fname)
+        vi = VI(vi_po, xml_root=tree.getroot(), text_encoding=po.textcp)
+        with open(new_fname, "wb") as rsrc_fh:
+            vi.saveRSRC(rsrc_fh)
+        entry['times']['create'] = time.perf_counter() - tm_start
+
+        entry['stage'] = "compare"
+        tm_start = time.perf_counter()
+        with open(fname, "rb") as rsrc_fh_a, open(new_fname, "rb") as rsrc_fh_b:
+            same = (rsrc_fh_a.read() == rsrc_fh_b.read())
+            if not same:
+                # Find which blocks did not survive the round-trip
+                rsrc_fh_a.seek(0)
+                rsrc_fh_b.seek(0)
+                vi_a = VI(newOptions(po, fname, xml_fname), rsrc_fh=rsrc_fh_a, text_encoding=po.textcp, parse_blocks=())
+                vi_b = VI(newOptions(po, new_fname, xml_fname), rsrc_fh=rsrc_fh_b, text_encoding=po.textcp, parse_blocks=())
+                diffs = vi_a.diff(vi_b)
+                entry['failed_blocks'] = sorted(set(getPrettyStrFromRsrcType(d.ident) for d in diffs))
+                entry['diffs'] = [str(d) for d in diffs[:REPORT_DIFF_LIMIT]]
+                if len(diffs) < 1:
+                    entry['diffs'] = ["Blocks content identical, RSRC file layout differs"]
+        entry['times']['compare'] = time.perf_counter() - tm_start
+        entry['status'] = "same" if same else "differs"
+        entry['stage'] = None
+    except Exception as ex:
+        entry['error'] = "{}: {}".format(type(ex).__name__, str(ex))
+    entry['peak_rss_kib'] = peakMemoryKiB()
+    if not po.keep:
+        shutil.rmtree(file_dir, ignore_errors=True)
+    return entry
+
+
+def verifyCorpus(po, fnames, work_dir):
+    """ Runs round-trip on all given files, returns report dict
+    """
+    tasks = [(po, fname, work_dir,) for fname in fnames]
+    tm_start = time.perf_counter()
+    # Peak memory of a process covers its whole lifetime, so each file is verified
+    # in a new process, even with single job; that keeps the measurement specific to a file
+    with multiprocessing.Pool(max(po.jobs, 1), maxtasksperchild=1) as pool:
+        entries = list(pool.imap(roundTripFile, tasks))
+    wall_time = time.perf_counter() - tm_start
+
+    total_size = sum(entry['size'] for entry in entries)
+    summary = { 'files': len(entries), 'bytes': total_size, 'wall_time': wall_time, 'jobs': po.jobs }
+    for status in ("same", "differs", "error",):
+        summary[status] = sum(1 for entry in entries if entry['status'] == status)
+    for stage in ("extract", "create", "compare",):
+        summary[stage+'_time'] = sum(entry['times'].get(stage, 0.0) for entry in entries)
+    if wall_time > 0:
+        summary['files_per_sec'] = len(entries) / wall_time
+        summary['mib_per_sec'] = total_size / wall_time / (1024*1024)
+    rss = [entry['peak_rss_kib'] for entry in entries if entry['peak_rss_kib'] is not None]
+    summary['max_peak_rss_kib'] = max(rss) if len(rss) > 0 else None
+
+    return { 'tool': "verifyRoundTrip", 'version': __version__, \
+      'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'textcp': po.textcp, \
+      'summary': summary, 'files': entries }
+
+
+def main():
+    """ Main executable function.
+
+    Its task is to parse command line options and call a function which performs requested command.
+    """
+    # Parse command line options
+
+    parser = argparse.ArgumentParser(description=__doc__)
+
+    parser.add_argument('corpus', nargs='+', metavar='PATH',
+            help="RSRC files, or folders searched for RSRC files")
+
+    parser.add_argument('-o', '--report', default="", type=str,
+            help="name of the JSON report file; if not given, report is written to stdout")
+
+    parser.add_argument('-w', '--work-dir', default=None, type=str,
+            help="folder for extracted and re-created files; temporary folder by default")
+
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+            help="amount of processes verifying files in parallel")
+
+    parser.add_argument('-t', '--textcp', default="mac_roman", type=str,
+            help="Text encoding used while loading RSRC files (default is \"%(default)s\")")
+
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+            help="increases verbosity level; max level is set by -vvv")
+
+    parser.add_argument('--keep', action='store_true',
+            help="do not remove extracted and re-created files")
+
+    parser.add_argument('--version', action='version', version="%(prog)s {version} by {author}"
+              .format(version=__version__,author=__author__),
+            help="display version information and exit")
+
+    po = parser.parse_args()
+
+    fnames = list(listCorpusFiles(po.corpus))
+    if len(fnames) < 1:
+        raise FileNotFoundError("No RSRC files found within given paths.")
+
+    if po.work_dir is not None:
+        os.makedirs(po.work_dir, exist_ok=True)
+        report = verifyCorpus(po, fnames, po.work_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="lvroundtrip_") as work_dir:
+            report = verifyCorpus(po, fnames, work_dir)
+
+    summary = report['summary']
+    if len(po.report) > 0:
+        with open(po.report, "w") as report_fh:
+            json.dump(report, report_fh, indent=2)
+        print("{:s}: {:d} files, {:d} same, {:d} differ, {:d} failed; {:.2f} files/s"\
+          .format(po.report, summary['files'], summary['same'], summary['differs'], summary['error'], \
+          summary.get('files_per_sec', 0.0)))
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print("")
+
+    if summary['same'] != summary['files']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as ex:
+        eprint("Error: "+str(ex))
+        #raise
+        sys.exit(10)